@@ -17,3 +17,11 @@ DEFAULT_FROM_EMAIL = "no-reply@mail.foresyn.tech"
 
 STATIC_ROOT = "/var/www/static/"
 # if you are just testing, set it to None is ok.
+
+MODEL_STORE_DIR = None
+# Directory to store SBML of models sent to computation workers, which must be able to read it as well.
+# If it is None, backend/model_store is used, which is also the default of the workers.
+
+LOAD_SEARCH_INDEXES = False
+# If it is True, the fuzzy search indexes of BiGG are loaded in the background when the server starts,
+# so no search waits for them. Otherwise each index is loaded by the first search using it.
@@ -49,9 +49,9 @@ INSTALLED_APPS = [
     'data_wrapper',
     'cobra_wrapper.apps.CobraWrapperConfig',
     'share',
-    'bigg_database',
+    'bigg_database.apps.BiggDatabaseConfig',
     'accounts',
-    'search'
+    'search.apps.SearchConfig'
 ]
 
 MIDDLEWARE = [
@@ -171,6 +171,15 @@ EMAIL_HOST_USER = config.EMAIL_HOST_USER
 EMAIL_HOST_PASSWORD = config.EMAIL_HOST_PASSWORD
 DEFAULT_FROM_EMAIL = config.DEFAULT_FROM_EMAIL
 
+# Directory shared with the computation workers, models are sent to them by the digest of their SBML
+COBRA_MODEL_STORE_DIR = getattr(config, 'MODEL_STORE_DIR', None) or os.path.join(BASE_DIR, 'model_store')
+
+# Cached .npz files of the stoichiometric matrices of BiGG models
+BIGG_MATRIX_STORE_DIR = getattr(config, 'MATRIX_STORE_DIR', None) or os.path.join(BASE_DIR, 'matrix_store')
+
+# Load the fuzzy search indexes of the BiGG tables when the app is ready, instead of on the first search
+BIGG_LOAD_SEARCH_INDEXES = getattr(config, 'LOAD_SEARCH_INDEXES', False)
+
 CELERY_RESULT_BACKEND = 'rpc://'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_ROUTES = {
@@ -182,6 +191,14 @@ CELERY_TASK_ROUTES = {
         'queue': 'cobra_results',
         'routing_key': 'cobra_result.fba',
     },
+    'cobra_computation.tasks.cobra_rge_fba': {
+        'queue': 'cobra_feeds',
+        'routing_key': 'cobra_feed.rge_fba',
+    },
+    'cobra_wrapper.tasks.cobra_rge_fba_save': {
+        'queue': 'cobra_results',
+        'routing_key': 'cobra_result.rge_fba',
+    },
     'cobra_computation.tasks.cobra_fva': {
         'queue': 'cobra_feeds',
         'routing_key': 'cobra_feed.fva',
@@ -190,16 +207,27 @@ CELERY_TASK_ROUTES = {
         'queue': 'cobra_results',
         'routing_key': 'cobra_result.fva',
     },
-    'regulation.tasks.gene_regulation': {
-        'queue': 'cobra_locals',
-        'routing_key': 'cobra_local.regulation',
+    'cobra_computation.tasks.cobra_fva_chunk': {
+        'queue': 'cobra_feeds',
+        'routing_key': 'cobra_feed.fva_chunk',
+    },
+    'cobra_wrapper.tasks.cobra_fva_chunk_save': {
+        'queue': 'cobra_results',
+        'routing_key': 'cobra_result.fva_chunk',
+    },
+    'cobra_computation.tasks.cobra_knockout': {
+        'queue': 'cobra_feeds',
+        'routing_key': 'cobra_feed.knockout',
+    },
+    'cobra_wrapper.tasks.cobra_knockout_save': {
+        'queue': 'cobra_results',
+        'routing_key': 'cobra_result.knockout',
     },
 }
 CELERY_TASK_QUEUES = (
     Queue('default', routing_key='task.#'),
     Queue('cobra_feeds', routing_key='cobra_feed.#'),
     Queue('cobra_results', routing_key='cobra_result.#'),
-    Queue('cobra_locals', routing_key='cobra_local.#'),
 )
 CELERY_TASK_DEFAULT_EXCHANGE = 'tasks'
 CELERY_TASK_DEFAULT_EXCHANGE_TYPE = 'topic'
@@ -1,32 +1,44 @@
 import json
+from typing import Iterator, List
 
 import django.core.exceptions
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
 from django.forms.models import model_to_dict
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext as _
 from django.views.generic import View
 
+from .fuzzy_index import get_search_index
+from .http_cache import bigg_api_view
 from .models import (Gene, Metabolite, Model, ModelMetabolite, ModelReaction,
                      Reaction, ReactionGene, ReactionMetabolite)
+from .stoichiometry import get_s_matrix_file
+from .utils import get_relationship_count, get_relationship_extra_info
 
-MATCH_RATIO = 80
+# Most instances returned by a search, the best matches are kept
+SEARCH_RESULT_LIMIT = 100
 
 
-def fuzzy_search(query_set, request_name, request_data):
-    raise RuntimeError('fuzzy_search unavailable now')
+def fuzzy_search(query_set, request_name, request_data, limit=SEARCH_RESULT_LIMIT):
+    """Instances of query_set whose field request_name matches request_data, best first"""
+    results = get_search_index(query_set.model).search(request_name, request_data, limit)
+    instances = query_set.in_bulk([pk for pk, score in results])
+    return [instances[pk] for pk, score in results if pk in instances]
 
 
 def custom_model_to_dict(instance, fields=None, count_number_fields=None, exclude=None):
     ret_dict = model_to_dict(instance, fields=fields, exclude=exclude)
     if count_number_fields:
         ret_dict.update({
-            field + '_count': getattr(instance, field).count()
+            field + '_count': get_relationship_count(instance, field)
             for field in count_number_fields
         })
     return ret_dict
 
 
+@method_decorator(bigg_api_view, name='dispatch')
 class SearchApiView(View):
     http_method_names = ['get']
     model = None
@@ -88,6 +100,7 @@ class GeneSearchApiView(SearchApiView):
     count_number_fields = ['reactions', 'models']
 
 
+@method_decorator(bigg_api_view, name='dispatch')
 class CustomDetailApiView(View):
     http_method_names = ['get']
     fields = None  # Don't include foreign key in this. Override get_context_data instead.
@@ -115,8 +128,8 @@ class ModelDetailApiView(CustomDetailApiView):
 
     def get_context_data(self, pk):
         context = super().get_context_data(pk)
-        context['reaction_count'] = self.context_object.reaction_set.count()
-        context['metabolite_count'] = self.context_object.metabolite_set.count()
+        context['reaction_count'] = get_relationship_count(self.context_object, 'reaction_set')
+        context['metabolite_count'] = get_relationship_count(self.context_object, 'metabolite_set')
         return context
 
 
@@ -126,8 +139,8 @@ class MetaboliteDetailApiView(CustomDetailApiView):
 
     def get_context_data(self, pk):
         context = super().get_context_data(pk)
-        context['reaction_count'] = self.context_object.reactions.count()
-        context['model_count'] = self.context_object.models.count()
+        context['reaction_count'] = get_relationship_count(self.context_object, 'reactions')
+        context['model_count'] = get_relationship_count(self.context_object, 'models')
         return context
 
 
@@ -137,8 +150,8 @@ class ReactionDetailApiView(CustomDetailApiView):
 
     def get_context_data(self, pk):
         context = super().get_context_data(pk)
-        context['model_count'] = self.context_object.models.count()
-        context['metabolite_count'] = self.context_object.metabolite_set.count()
+        context['model_count'] = get_relationship_count(self.context_object, 'models')
+        context['metabolite_count'] = get_relationship_count(self.context_object, 'metabolite_set')
         return context
 
 
@@ -151,11 +164,28 @@ class GeneDetailApiView(CustomDetailApiView):
 
     def get_context_data(self, pk):
         context = super().get_context_data(pk)
-        context['model_count'] = self.context_object.models.count()
-        context['reaction_count'] = self.context_object.reactions.count()
+        context['model_count'] = get_relationship_count(self.context_object, 'models')
+        context['reaction_count'] = get_relationship_count(self.context_object, 'reactions')
         return context
 
 
+@method_decorator(bigg_api_view, name='dispatch')
+class ModelSMatrixApiView(View):
+    """
+    Sparse stoichiometric matrix of a model as an .npz download, see stoichiometry.build_s_matrix for its arrays
+    """
+    http_method_names = ['get']
+
+    def get(self, request, pk):
+        try:
+            model = Model.objects.get(pk=pk)
+        except ObjectDoesNotExist:
+            return JsonResponse({}, status=404)
+        return FileResponse(open(get_s_matrix_file(model), 'rb'), as_attachment=True,
+                            filename=model.bigg_id + '.npz', content_type='application/octet-stream')
+
+
+@method_decorator(bigg_api_view, name='dispatch')
 class CustomListApiView(View):
     """
     A custom ListView
@@ -167,14 +197,32 @@ class CustomListApiView(View):
     get the list to be returned.
     So, be careful about whether to add '_set' as the suffix to the 'to_model'
     variable
+    Large lists can be paged with ?limit=&after=, where after is the 'next' cursor of the previous page,
+    or streamed whole with ?stream=ndjson for one object per line, or ?stream=json for the usual document.
     """
     fields = None
     from_model = None
     to_model = None
+    # Fields of the through model added to every object, fetched in one query for the whole list.
+    # from_field and to_field are the foreign keys of the through model to from_model and to_model
+    through_model = None
+    from_field = None
+    to_field = None
+    extra_fields = []
+    # Objects fetched by one query while streaming
+    stream_chunk_size = 500
+    # Most objects in one page
+    max_page_size = 1000
 
     def get_context_data(self, instance, fields):
         return model_to_dict(instance, fields=fields)
 
+    def get_objects_extra_info(self, instances):
+        if self.through_model is None:
+            return {}
+        return get_relationship_extra_info(self.through_model, self.from_field, self.from_model_instance,
+                                           self.to_field, instances, self.extra_fields)
+
     def get_query_set(self):
         # In order to reuse this view in 'reverse lookup' views,
         # delete the '_set'. To use 'forward lookup' views, please
@@ -188,17 +236,59 @@ class CustomListApiView(View):
         if not self.fields or not self.from_model or not self.to_model:
             raise RuntimeError('"fileds" and "from_model" needs to be set')
 
+    def get_objects_data(self, instances) -> List[dict]:
+        extra_info = self.get_objects_extra_info(instances)
+        return [dict(self.get_context_data(instance, fields=self.fields), **extra_info.get(instance.pk, {}))
+                for instance in instances]
+
+    def iter_objects_data(self, query_set) -> Iterator[dict]:
+        """Data of every object, the objects are fetched and dropped by chunks"""
+        chunk = []
+        for instance in query_set.iterator(chunk_size=self.stream_chunk_size):
+            chunk.append(instance)
+            if len(chunk) >= self.stream_chunk_size:
+                yield from self.get_objects_data(chunk)
+                chunk = []
+        yield from self.get_objects_data(chunk)
+
+    def stream_ndjson(self, query_set) -> Iterator[str]:
+        for data in self.iter_objects_data(query_set):
+            yield json.dumps(data, cls=DjangoJSONEncoder) + '\n'
+
+    def stream_json(self, query_set) -> Iterator[str]:
+        """The same document as the one JsonResponse, written object by object"""
+        yield '{"result": ['
+        for i, data in enumerate(self.iter_objects_data(query_set)):
+            yield (', ' if i else '') + json.dumps(data, cls=DjangoJSONEncoder)
+        yield ']}'
+
+    def get_page(self, query_set, after, limit):
+        """Objects with pk larger than after, and the cursor of the next page, None if it is the last page"""
+        instances = list(query_set.order_by('pk').filter(pk__gt=after)[:limit + 1])
+        next_cursor = instances[limit - 1].pk if len(instances) > limit else None
+        return JsonResponse({'result': self.get_objects_data(instances[:limit]), 'next': next_cursor})
+
     def get(self, request, pk):
         try:
             self.from_model_instance = self.from_model.objects.get(id=pk)
         except ObjectDoesNotExist:
             return JsonResponse({}, status=404)
-        return JsonResponse({
-            'result': [
-                self.get_context_data(instance, fields=self.fields)
-                for instance in self.get_query_set()
-            ]
-        })
+        query_set = self.get_query_set()
+        stream = request.GET.get('stream')
+        if stream == 'ndjson':
+            return StreamingHttpResponse(self.stream_ndjson(query_set), content_type='application/x-ndjson')
+        elif stream == 'json':
+            return StreamingHttpResponse(self.stream_json(query_set), content_type='application/json')
+        elif 'after' in request.GET or 'limit' in request.GET:
+            try:
+                after = int(request.GET.get('after', 0))
+                limit = min(int(request.GET.get('limit', self.max_page_size)), self.max_page_size)
+            except ValueError:
+                return JsonResponse({}, status=400)
+            if limit <= 0:
+                return JsonResponse({}, status=400)
+            return self.get_page(query_set, after, limit)
+        return JsonResponse({'result': self.get_objects_data(query_set)})
 
 
 class GenesInModel(CustomListApiView):
@@ -220,12 +310,10 @@ class MetabolitesInModelApiView(CustomListApiView):
     fields = ['id', 'bigg_id', 'name', 'formulae', 'charges', 'database_links']
     from_model = Model
     to_model = 'metabolite_set'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        mm = ModelMetabolite.objects.get(model=self.from_model_instance, metabolite=instance)
-        context['organism'] = mm.organism
-        return context
+    through_model = ModelMetabolite
+    from_field = 'model'
+    to_field = 'metabolite'
+    extra_fields = ['organism']
 
 
 class ReactionsInModelApiView(CustomListApiView):
@@ -235,16 +323,10 @@ class ReactionsInModelApiView(CustomListApiView):
     fields = ['id', 'bigg_id', 'name', 'reaction_string', 'pseudoreaction', 'database_links']
     from_model = Model
     to_model = 'reaction_set'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        mr = ModelReaction.objects.get(model=self.from_model_instance, reaction=instance)
-        context['organism'] = mr.organism
-        context['lower_bound'] = mr.lower_bound
-        context['upper_bound'] = mr.upper_bound
-        context['subsystem'] = mr.subsystem
-        context['gene_reaction_rule'] = mr.gene_reaction_rule
-        return context
+    through_model = ModelReaction
+    from_field = 'model'
+    to_field = 'reaction'
+    extra_fields = ['organism', 'lower_bound', 'upper_bound', 'subsystem', 'gene_reaction_rule']
 
 
 class MetabolitesInReactionApiView(CustomListApiView):
@@ -254,12 +336,10 @@ class MetabolitesInReactionApiView(CustomListApiView):
     fields = ['id', 'bigg_id', 'name', 'formulae', 'charges', 'database_links']
     from_model = Reaction
     to_model = 'metabolite_set'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        rm = ReactionMetabolite.objects.get(metabolite=instance, reaction=self.from_model_instance)
-        context['stoichiometry'] = rm.stoichiometry
-        return context
+    through_model = ReactionMetabolite
+    from_field = 'reaction'
+    to_field = 'metabolite'
+    extra_fields = ['stoichiometry']
 
 
 class GenesInReactionApiView(CustomListApiView):
@@ -272,13 +352,10 @@ class GenesInReactionApiView(CustomListApiView):
               'database_links', 'id', 'bigg_id', 'name']
     from_model = Reaction
     to_model = 'gene_set'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        rg = ReactionGene.objects.get(gene=instance, reaction=self.from_model_instance)
-        context['gene_reaction_rule'] = rg.gene_reaction_rule
-
-        return context
+    through_model = ReactionGene
+    from_field = 'reaction'
+    to_field = 'gene'
+    extra_fields = ['gene_reaction_rule']
 
 
 class GeneFromModelsApiView(CustomListApiView):
@@ -297,12 +374,10 @@ class MetaboliteFromModelsApiView(CustomListApiView):
     fields = ['bigg_id', 'compartments', 'id']
     from_model = Metabolite
     to_model = 'models'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        mm = ModelMetabolite.objects.get(model=instance, metabolite=self.from_model_instance)
-        context['organism'] = mm.organism
-        return context
+    through_model = ModelMetabolite
+    from_field = 'metabolite'
+    to_field = 'model'
+    extra_fields = ['organism']
 
 
 class ReactionFromModelsApiView(CustomListApiView):
@@ -312,16 +387,10 @@ class ReactionFromModelsApiView(CustomListApiView):
     fields = ['bigg_id', 'compartments', 'id']
     from_model = Reaction
     to_model = 'models'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        mr = ModelReaction.objects.get(model=instance, reaction=self.from_model_instance)
-        context['organism'] = mr.organism
-        context['lower_bound'] = mr.lower_bound
-        context['upper_bound'] = mr.upper_bound
-        context['subsystem'] = mr.subsystem
-        context['gene_reaction_rule'] = mr.gene_reaction_rule
-        return context
+    through_model = ModelReaction
+    from_field = 'reaction'
+    to_field = 'model'
+    extra_fields = ['organism', 'lower_bound', 'upper_bound', 'subsystem', 'gene_reaction_rule']
 
 
 class GeneFromReactionsApiView(CustomListApiView):
@@ -331,13 +400,10 @@ class GeneFromReactionsApiView(CustomListApiView):
     fields = ['id', 'bigg_id', 'name', 'reaction_string', 'pseudoreaction', 'database_links']
     from_model = Gene
     to_model = 'reactions'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        rg = ReactionGene.objects.get(gene=self.from_model_instance, reaction=instance)
-        context['gene_reaction_rule'] = rg.gene_reaction_rule
-
-        return context
+    through_model = ReactionGene
+    from_field = 'gene'
+    to_field = 'reaction'
+    extra_fields = ['gene_reaction_rule']
 
 
 class MetaboliteFromReactionsApiView(CustomListApiView):
@@ -347,9 +413,7 @@ class MetaboliteFromReactionsApiView(CustomListApiView):
     fields = ['id', 'bigg_id', 'name', 'reaction_string', 'pseudoreaction', 'database_links']
     from_model = Metabolite
     to_model = 'reactions'
-
-    def get_context_data(self, instance, fields):
-        context = super().get_context_data(instance, fields)
-        rm = ReactionMetabolite.objects.get(metabolite=self.from_model_instance, reaction=instance)
-        context['stoichiometry'] = rm.stoichiometry
-        return context
+    through_model = ReactionMetabolite
+    from_field = 'metabolite'
+    to_field = 'reaction'
+    extra_fields = ['stoichiometry']
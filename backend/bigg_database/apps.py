@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 
 class BiggDatabaseConfig(AppConfig):
     name = 'bigg_database'
+
+    def ready(self):
+        from .http_cache import bump_data_version_on_change
+        from .models import DataVersion, Gene, ImportedFile
+        for model_class in list(self.get_models()) + [Gene.models.through]:
+            if model_class in (DataVersion, ImportedFile):
+                continue
+            label = model_class._meta.label
+            post_save.connect(bump_data_version_on_change, sender=model_class,
+                              dispatch_uid='bump_data_version_on_save_' + label)
+            post_delete.connect(bump_data_version_on_change, sender=model_class,
+                                dispatch_uid='bump_data_version_on_delete_' + label)
+        if settings.BIGG_LOAD_SEARCH_INDEXES:
+            from .fuzzy_index import start_loading_search_indexes
+            start_loading_search_indexes()
@@ -0,0 +1,186 @@
+"""
+In-process fuzzy search over bigg_id and name of the BiGG models.
+Every process loads the (pk, field) pairs of a model once into compact arrays and a bigram index, and scores
+queries by partial ratio, i.e. the best similarity of the shorter string to a window of the longer one.
+An object reaching min_score keeps most bigrams of the shorter string, so only the objects sharing enough
+bigrams with the query are scored, which returns the same objects as scoring all of them. Queries too short
+for the bigram bound are scored against the objects sharing a character with them.
+Indexes are loaded when the app is ready and reloaded when the data version changes, which every import and
+every saved row bumps.
+"""
+import logging
+import math
+import threading
+from array import array
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import DatabaseError
+
+from .http_cache import get_data_version
+from .models import Gene, Metabolite, Model, Reaction
+
+logger = logging.getLogger(__name__)
+
+MIN_SCORE = 80
+SEARCHED_MODELS = [Model, Reaction, Metabolite, Gene]
+
+
+def get_bigrams(text: str) -> List[str]:
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+def partial_ratio(short: str, long: str) -> float:
+    """Best similarity in 0..100 of short to a window of long of the same length, the strings may be swapped"""
+    if len(short) > len(long):
+        short, long = long, short
+    if not short:
+        return 0.0
+    best = 0.0
+    for block in SequenceMatcher(None, short, long, autojunk=False).get_matching_blocks():
+        # Windows are kept inside long, so that each one has as many characters as short
+        start = min(max(block[1] - block[0], 0), len(long) - len(short))
+        window = long[start:start + len(short)]
+        ratio = SequenceMatcher(None, short, window, autojunk=False).ratio()
+        if ratio > best:
+            best = ratio
+            if best == 1.0:
+                break
+    return best * 100
+
+
+def get_min_shared(length: int, distinct_bigrams: int, min_score: float) -> int:
+    """
+    Distinct bigrams of a string of length characters which are still in a window reaching min_score.
+    At most length * (1 - min_score) characters are unmatched, each of which breaks two bigrams, and each break
+    between two matching blocks caused by extra characters in the window breaks one more.
+    """
+    unmatched = math.floor(length * (1 - (min_score - 0.5) / 100))
+    return (length - 1) - 3 * unmatched - ((length - 1) - distinct_bigrams)
+
+
+class FieldIndex:
+    """Values of one field of a model, with the positions of the values holding each bigram"""
+
+    def __init__(self, min_score: float):
+        self.min_score = min_score
+        self.pks = array('l')
+        self.values = []
+        self.min_shared = array('l')
+        self.bigrams = {}  # type: Dict[str, array]
+        self.chars = {}  # type: Dict[str, array]
+        # Values so short that a window reaching min_score may share no bigram with them
+        self.unprunable = array('l')
+
+    def add(self, pk: int, value: Optional[str]):
+        if not value:
+            return
+        value = value.lower()
+        position = len(self.pks)
+        bigrams = set(get_bigrams(value))
+        min_shared = get_min_shared(len(value), len(bigrams), self.min_score)
+        self.pks.append(pk)
+        self.values.append(value)
+        self.min_shared.append(min_shared)
+        for bigram in bigrams:
+            self.bigrams.setdefault(bigram, array('l')).append(position)
+        for char in set(value):
+            self.chars.setdefault(char, array('l')).append(position)
+        if min_shared <= 0:
+            self.unprunable.append(position)
+
+    def get_candidates(self, query: str) -> Iterable[int]:
+        bigrams = set(get_bigrams(query))
+        query_min_shared = get_min_shared(len(query), len(bigrams), self.min_score)
+        if query_min_shared <= 0:
+            # Any value reaching min_score matches at least one character of the query
+            return sorted({position for char in set(query) for position in self.chars.get(char, ())})
+        shared = {}
+        for bigram in bigrams:
+            for position in self.bigrams.get(bigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        candidates = set(self.unprunable)
+        for position, count in shared.items():
+            # The bound of the shorter string of the two applies
+            min_shared = query_min_shared if len(self.values[position]) >= len(query) else \
+                self.min_shared[position]
+            if count >= min_shared:
+                candidates.add(position)
+        return sorted(candidates)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(pk, score) of the values reaching min_score, best first"""
+        query = query.lower()
+        if not query:
+            return []
+        results = []
+        for position in self.get_candidates(query):
+            score = partial_ratio(query, self.values[position])
+            if round(score) >= self.min_score:
+                results.append((self.pks[position], score))
+        results.sort(key=lambda result: (-result[1], result[0]))
+        return results[:limit] if limit else results
+
+
+class FuzzySearchIndex:
+    """Field indexes of one model, loaded for a data version and swapped for new ones when it changes"""
+
+    def __init__(self, model_class, fields: List[str], min_score: float):
+        self.model_class = model_class
+        self.fields = fields
+        self.min_score = min_score
+        self.field_indexes = None  # type: Optional[Dict[str, FieldIndex]]
+        self.data_version = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, FieldIndex]:
+        field_indexes = {field: FieldIndex(self.min_score) for field in self.fields}
+        rows = self.model_class.objects.order_by('pk').values_list('pk', *self.fields)
+        for pk, *values in rows.iterator():
+            for field, value in zip(self.fields, values):
+                field_indexes[field].add(pk, value)
+        return field_indexes
+
+    def refresh(self):
+        # The data version is cached for a few seconds, so this costs no query on most searches
+        data_version = get_data_version()
+        if self.field_indexes is not None and data_version == self.data_version:
+            return
+        with self._lock:
+            if self.field_indexes is not None and data_version == self.data_version:
+                return
+            # Searches hold the old indexes until the new ones are swapped in
+            self.field_indexes = self.load()
+            self.data_version = data_version
+
+    def search(self, field: str, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        if field not in self.fields:
+            raise ValueError('{} is not indexed for {}'.format(field, self.model_class.__name__))
+        self.refresh()
+        return self.field_indexes[field].search(query, limit)
+
+
+_search_indexes = {}  # type: Dict[type, FuzzySearchIndex]
+_search_indexes_lock = threading.Lock()
+
+
+def get_search_index(model_class) -> FuzzySearchIndex:
+    with _search_indexes_lock:
+        if model_class not in _search_indexes:
+            fields = ['bigg_id', 'name'] if hasattr(model_class, 'name') else ['bigg_id']
+            _search_indexes[model_class] = FuzzySearchIndex(model_class, fields, MIN_SCORE)
+        return _search_indexes[model_class]
+
+
+def load_search_indexes():
+    """Load the indexes of every searched model, so that no search waits for it"""
+    try:
+        for model_class in SEARCHED_MODELS:
+            get_search_index(model_class).refresh()
+    except DatabaseError:
+        # e.g. the tables are not migrated yet, the indexes are loaded by the first search instead
+        logger.warning('Fuzzy search indexes are not loaded', exc_info=True)
+
+
+def start_loading_search_indexes():
+    threading.Thread(target=load_search_indexes, name='load_search_indexes', daemon=True).start()
@@ -0,0 +1,92 @@
+"""
+HTTP caching of the BiGG views. The BiGG tables only change on import, and every import bumps DataVersion,
+so a response is identified by the version it was rendered at: the version is the ETag, its time is
+Last-Modified, and JSON responses are cached on the server under a key holding the version.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+
+# Seconds a process trusts the data version it read, imports are seen by all processes after this
+DATA_VERSION_CACHE_TIMEOUT = 10
+# Seconds a rendered JSON response is cached, a new data version makes it unreachable before
+VIEW_CACHE_TIMEOUT = 60 * 60
+
+DATA_VERSION_CACHE_KEY = 'bigg_data_version'
+
+
+def get_data_version() -> Tuple[int, Optional[datetime]]:
+    data_version = cache.get(DATA_VERSION_CACHE_KEY)
+    if data_version is None:
+        data_version = DataVersion.objects.values_list('version', 'updated_time').first() or (0, None)
+        cache.set(DATA_VERSION_CACHE_KEY, data_version, DATA_VERSION_CACHE_TIMEOUT)
+    return data_version
+
+
+def bump_data_version():
+    """Mark that the BiGG tables changed, which lets the clients and caches drop what they hold"""
+    now = timezone.now()
+    if not DataVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_time=now):
+        DataVersion.objects.get_or_create(pk=1, defaults={'version': 1, 'updated_time': now})
+    cache.delete(DATA_VERSION_CACHE_KEY)
+
+
+def bump_data_version_on_change(sender, raw=False, **kwargs):
+    """Bump the data version when a BiGG row is saved or deleted one by one, e.g. in the admin"""
+    if not raw:
+        bump_data_version()
+
+
+def get_etag(request, *args, **kwargs) -> str:
+    return 'bigg-{}'.format(get_data_version()[0])
+
+
+def get_last_modified(request, *args, **kwargs):
+    return get_data_version()[1]
+
+
+def cache_by_data_version(view_func):
+    """Cache successful non-streaming GET responses under the full path and the data version"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view_func(request, *args, **kwargs)
+        key = 'bigg_view:{}:{}'.format(get_data_version()[0],
+                                       hashlib.sha1(request.get_full_path().encode('utf-8')).hexdigest())
+        cached = cache.get(key)
+        if cached is not None:
+            content_type, content = cached
+            return HttpResponse(content, content_type=content_type)
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response['Content-Type'], response.content), VIEW_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+def bigg_api_view(view_func):
+    """Conditional GET and server side caching for the JSON views, which are the same for every user"""
+    return condition(etag_func=get_etag, last_modified_func=get_last_modified)(cache_by_data_version(view_func))
+
+
+def bigg_page_view(view_func):
+    """Conditional GET for the pages, only for anonymous users as the pages of the others show their own data"""
+    conditional_view = condition(etag_func=get_etag, last_modified_func=get_last_modified)(view_func)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        return conditional_view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,369 @@
+"""
+Shared pipeline of the BiGG import commands.
+JSON files are decoded by a process pool, which sends back only the fields picked by the extract function
+of each command, foreign keys are resolved with bigg_id -> pk maps loaded once,
+and rows are written with bulk_create in batches, each of which is committed in its own transaction.
+With --sync, files whose checksum matches the ImportedFile manifest are skipped, rows of changed files are
+inserted or updated, and rows which are no longer in the files are deleted.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+
+from bigg_database.http_cache import bump_data_version
+from bigg_database.models import ImportedFile
+from bigg_database.utils import RELATIONSHIP_COUNTS, refresh_relationship_counts
+from search.index import INDEXED_MODELS, is_indexed, refresh_objects
+from .commands.progressbar import print_progressbar
+
+CONFLICT_CHOICES = ('skip', 'ignore', 'fail')
+
+
+def add_bulk_arguments(parser):
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows written by one bulk insert')
+    parser.add_argument('--on-conflict', choices=CONFLICT_CHOICES, default='skip',
+                        help='skip: leave out rows whose keys are already imported, '
+                             'ignore: let the database drop conflicting rows, '
+                             'fail: stop at the first conflicting row')
+    parser.add_argument('--workers', type=int, default=1, help='Processes decoding json files')
+    parser.add_argument('--sync', action='store_true',
+                        help='Only apply the changes of the files changed since the last import, '
+                             'an interrupted sync continues from its last committed batch when run again')
+
+
+def load_id_map(model_class) -> Dict[str, int]:
+    return dict(model_class.objects.values_list('bigg_id', 'pk'))
+
+
+def list_json_files(path: str) -> List[str]:
+    return [os.path.join(path, file)
+            for file in os.listdir(path)
+            if not os.path.isdir(os.path.join(path, file))]
+
+
+def parse_json_files(files: List[str], extract: Optional[Callable] = None,
+                     known_checksums: Optional[Dict[str, str]] = None) -> List[Tuple[str, str, Any, Optional[str]]]:
+    """
+    Decode files and pick their fields, errors are returned as text to be reported by the caller.
+    Files whose checksum is the same as in known_checksums are not decoded.
+    """
+    results = []
+    for file in files:
+        checksum = None
+        try:
+            with open(file, 'rb') as f:
+                raw_content = f.read()
+            checksum = hashlib.sha256(raw_content).hexdigest()
+            if known_checksums and known_checksums.get(file) == checksum:
+                results.append((file, checksum, None, None))
+                continue
+            content = json.loads(raw_content.decode('utf-8'))
+            results.append((file, checksum, extract(content) if extract else content, None))
+        except (ValueError, KeyError, AttributeError) as e:
+            results.append((file, checksum, None, str(e)))
+    return results
+
+
+def iter_json_files(path: str, extract: Optional[Callable] = None, workers: int = 1, files_per_task: int = 16,
+                    writer: Optional['BulkWriter'] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (file path, extract(content)) of every json file in path in order, files which can not be decoded
+    or miss a field are reported and skipped.
+    extract should be a module level function so that it can be sent to the worker processes. Only a few
+    tasks per worker are in flight at a time, so memory stays bounded however slow the consumer is.
+    If the writer syncs, unchanged files are skipped and the writer is told which file the rows come from.
+    """
+    files_list = list_json_files(path)
+    total_len = len(files_list)
+    syncing = writer is not None and writer.sync_command is not None
+    known_checksums = writer.get_checksums(files_list) if syncing else {}
+    tasks = []
+    for i in range(0, total_len, files_per_task):
+        files = files_list[i:i + files_per_task]
+        tasks.append((files, extract, {file: known_checksums[file] for file in files if file in known_checksums}))
+    cnt = 0
+    for results in map_tasks(parse_json_files, tasks, workers):
+        for file, checksum, content, error in results:
+            cnt += 1
+            print_progressbar(cnt, total_len)
+            if error is not None:
+                print(error, file)
+                continue
+            if syncing:
+                if known_checksums.get(file) == checksum:
+                    continue
+                writer.begin_file(file, checksum)
+            yield file, content
+    if syncing:
+        writer.end_file()
+        writer.remove_missing_files(files_list)
+
+
+def map_tasks(func: Callable, tasks: List[Tuple], workers: int) -> Iterator[Any]:
+    """Yield func(*args) for every args in tasks in order, computed by a process pool if workers > 1"""
+    if workers <= 1:
+        for args in tasks:
+            yield func(*args)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for args in tasks:
+            pending.append(pool.apply_async(func, args))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+class BulkWriter:
+    """
+    Collects unsaved instances and writes them by bulk_create.
+    key_fields identify a row, e.g. ('bigg_id',) or ('model_id', 'reaction_id'). With on_conflict 'skip',
+    keys already in the table or already added are left out before writing. If a batch still breaks a
+    constraint, it is written again row by row so that only the bad rows are dropped, unless on_conflict
+    is 'fail'.
+    With sync_command, rows whose keys exist are updated instead. The ImportedFile record of a file is saved
+    in the same transaction as the last batch holding its rows, so an interrupted sync which is run again
+    skips exactly the files whose rows were all committed.
+    """
+
+    def __init__(self, model_class, key_fields: Tuple[str, ...], batch_size: int = 1000,
+                 on_conflict: str = 'skip', sync_command: Optional[str] = None):
+        if on_conflict not in CONFLICT_CHOICES:
+            raise ValueError('on_conflict should be one of {}'.format(', '.join(CONFLICT_CHOICES)))
+        self.model_class = model_class
+        self.key_fields = key_fields
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.sync_command = sync_command
+        self.seen_keys = set()
+        if sync_command is not None:
+            self.existing_pks = {tuple(row[:-1]): row[-1]
+                                 for row in model_class.objects.values_list(*key_fields, 'pk')}
+            self.update_fields = [field.name for field in model_class._meta.concrete_fields
+                                  if not field.primary_key and field.attname not in key_fields]
+            self.imported_files = {imported_file.name: imported_file
+                                   for imported_file in ImportedFile.objects.filter(command=sync_command)}
+            # Names of the files providing each key, a row is only deleted once no file provides it
+            self.key_files = {}  # type: Dict[Tuple, set]
+            for name, imported_file in self.imported_files.items():
+                for key in imported_file.keys:
+                    self.key_files.setdefault(tuple(key), set()).add(name)
+        elif on_conflict == 'skip':
+            self.seen_keys = set(model_class.objects.values_list(*key_fields))
+        self.current_file = None
+        self.batch = []
+        self.update_batch = []
+        self.delete_keys = []
+        self.finished_files = []
+        # Rows written and deleted, whose search index entries are refreshed on close as bulk writes send no signals
+        self.written_keys = []
+        self.deleted_pks = []
+        self.written = 0
+        self.updated = 0
+        self.deleted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.missing = 0
+        # Objects missing from the file being read, reported once the file is done
+        self.missing_file = None
+        self.file_missing = []
+        self.start_time = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def get_key(self, instance) -> Tuple:
+        return tuple(getattr(instance, field) for field in self.key_fields)
+
+    def get_checksums(self, files: List[str]) -> Dict[str, str]:
+        return {file: self.imported_files[os.path.basename(file)].checksum
+                for file in files if os.path.basename(file) in self.imported_files}
+
+    def begin_file(self, file: str, checksum: str):
+        self.end_file()
+        self.current_file = (os.path.basename(file), checksum, set())
+
+    def mark_file_incomplete(self):
+        """
+        Keep the current file out of the manifest, e.g. if it refers to rows not imported yet,
+        so that the next sync reads it again
+        """
+        if self.current_file is not None:
+            self.current_file = (self.current_file[0], None, self.current_file[2])
+
+    def add_missing(self, file: str, description: str, incomplete: bool = True):
+        """
+        Count a row left out as it refers to an object which is not imported, e.g. 'reaction ACALD'.
+        If incomplete, the file is kept out of the manifest, so that the next sync reads it again.
+        """
+        if incomplete:
+            self.mark_file_incomplete()
+        if file != self.missing_file:
+            self.report_missing()
+            self.missing_file = file
+        self.file_missing.append(description)
+        self.missing += 1
+
+    def report_missing(self, examples: int = 5):
+        if self.file_missing:
+            print('{}: {} rows refer to missing objects: {}{}'.format(
+                os.path.basename(self.missing_file), len(self.file_missing),
+                ', '.join(self.file_missing[:examples]), ', ...' if len(self.file_missing) > examples else ''))
+        self.file_missing = []
+
+    def end_file(self):
+        if self.current_file is None:
+            return
+        name, checksum, keys = self.current_file
+        self.current_file = None
+        if checksum is None:
+            return
+        if name in self.imported_files:
+            self.drop_file_keys(name, set(map(tuple, self.imported_files[name].keys)) - keys)
+        for key in keys:
+            self.key_files.setdefault(key, set()).add(name)
+        self.finished_files.append((name, checksum, sorted(keys)))
+
+    def drop_file_keys(self, name: str, keys: Iterable[Tuple]):
+        for key in keys:
+            files = self.key_files.get(key, set())
+            files.discard(name)
+            if not files:
+                self.delete_keys.append(key)
+
+    def remove_missing_files(self, files: List[str]):
+        """Delete the rows of the files which were imported before but are no longer in the source"""
+        names = set(os.path.basename(file) for file in files)
+        for name, imported_file in self.imported_files.items():
+            if name not in names:
+                self.drop_file_keys(name, map(tuple, imported_file.keys))
+                self.finished_files.append((name, None, None))
+
+    def add(self, instance):
+        key = self.get_key(instance)
+        if self.sync_command is not None and self.current_file is not None:
+            # Keys provided by several files are recorded under each of them
+            self.current_file[2].add(key)
+        if self.sync_command is None and self.on_conflict != 'skip':
+            self.batch.append(instance)
+        elif key in self.seen_keys:
+            self.skipped += 1
+            return
+        else:
+            self.seen_keys.add(key)
+            if self.sync_command is None:
+                self.batch.append(instance)
+            else:
+                if key not in self.existing_pks:
+                    self.batch.append(instance)
+                elif self.update_fields:
+                    instance.pk = self.existing_pks[key]
+                    self.update_batch.append(instance)
+        if len(self.batch) + len(self.update_batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        update_batch, self.update_batch = self.update_batch, []
+        try:
+            with transaction.atomic():
+                if batch:
+                    self.model_class.objects.bulk_create(batch, ignore_conflicts=self.on_conflict == 'ignore')
+                if update_batch:
+                    self.model_class.objects.bulk_update(update_batch, self.update_fields)
+                deletions = self.save_finished_files()
+            self.record_deletions(*deletions)
+            self.written += len(batch)
+            self.updated += len(update_batch)
+            self.written_keys.extend(self.get_key(instance) for instance in batch + update_batch)
+        except IntegrityError:
+            if self.on_conflict == 'fail':
+                raise
+            for instance in batch + update_batch:
+                try:
+                    with transaction.atomic():
+                        if instance.pk is None:
+                            self.model_class.objects.bulk_create([instance])
+                            self.written += 1
+                        else:
+                            self.model_class.objects.bulk_update([instance], self.update_fields)
+                            self.updated += 1
+                    self.written_keys.append(self.get_key(instance))
+                except IntegrityError as e:
+                    self.failed += 1
+                    print(e, *self.get_key(instance))
+            with transaction.atomic():
+                deletions = self.save_finished_files()
+            self.record_deletions(*deletions)
+
+    def save_finished_files(self) -> Tuple[List[Tuple], int]:
+        """
+        Delete the rows which disappeared from the finished files, and record the files as imported.
+        Returns the keys and the number of the deleted rows, which are recorded once the transaction commits.
+        """
+        delete_keys = [key for key in set(self.delete_keys)
+                       if key not in self.seen_keys and not self.key_files.get(key) and key in self.existing_pks]
+        deleted = 0
+        if delete_keys:
+            deleted = self.model_class.objects.filter(pk__in=[self.existing_pks[key] for key in delete_keys]) \
+                .delete()[1].get(self.model_class._meta.label, 0)
+        for name, checksum, keys in self.finished_files:
+            if keys is None:
+                ImportedFile.objects.filter(command=self.sync_command, name=name).delete()
+            else:
+                ImportedFile.objects.update_or_create(command=self.sync_command, name=name,
+                                                      defaults={'checksum': checksum, 'keys': keys})
+        return delete_keys, deleted
+
+    def record_deletions(self, delete_keys: List[Tuple], deleted: int):
+        self.deleted_pks.extend(self.existing_pks.pop(key) for key in delete_keys)
+        self.deleted += deleted
+        self.delete_keys = []
+        self.finished_files = []
+
+    def close(self):
+        self.end_file()
+        self.flush()
+        self.report_missing()
+        if self.written or self.updated or self.deleted:
+            self.refresh_search_index()
+            self.refresh_relationship_counts()
+            bump_data_version()
+        print(self.report())
+
+    def refresh_relationship_counts(self):
+        if any(relation_model is self.model_class for _, _, relation_model, _ in RELATIONSHIP_COUNTS):
+            # Rows of a through model are what the counts of the models at both ends count
+            refresh_relationship_counts(self.model_class)
+        elif self.updated or self.deleted:
+            # Updated rows lost their counts, deleted rows took their relationships with them
+            refresh_relationship_counts()
+
+    def refresh_search_index(self, batch_size: int = 500):
+        if self.model_class not in INDEXED_MODELS or not is_indexed(self.model_class):
+            return
+        # Indexed models are identified by bigg_id, inserted rows get their pks by it
+        key_field, = self.key_fields
+        keys = sorted(set(key for key, in self.written_keys))
+        pks = list(self.deleted_pks)
+        for i in range(0, len(keys), batch_size):
+            pks.extend(self.model_class.objects.filter(**{key_field + '__in': keys[i:i + batch_size]})
+                       .values_list('pk', flat=True))
+        refresh_objects(self.model_class, pks)
+
+    def report(self) -> str:
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        return '{}: {} rows written, {} updated, {} deleted, {} skipped, {} failed, {} missing in {:.1f}s ' \
+            '({:.0f} rows/s)'.format(self.model_class.__name__, self.written, self.updated, self.deleted, self.skipped,
+                                     self.failed, self.missing, elapsed, (self.written + self.updated) / elapsed)
@@ -1,42 +1,31 @@
-
-import json
-import os
-
-import django
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Gene, Model
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files, load_id_map
 
-from .progressbar import print_progressbar
 
+def extract_model_genes(content):
+    return content['id'], [gene['id'] for gene in content['genes']]
 
-def main(model_path):
-    files_list = [os.path.join(model_path, file)
-                  for file in os.listdir(model_path)
-                  if not os.path.isdir(os.path.join(model_path, file))]
-    total_len = len(files_list)
 
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(e, file)
+def main(model_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    model_ids = load_id_map(Model)
+    gene_ids = load_id_map(Gene)
+    GeneModel = Gene.models.through
 
-            try:
-                model_bigg_id = content['id']
-                model_instance = Model.objects.get(bigg_id=model_bigg_id)
-            except KeyError as e:
-                print(e, file)
+    with BulkWriter(GeneModel, ('gene_id', 'model_id'), batch_size, on_conflict,
+                    'link_model_gene' if sync else None) as writer:
+        for file, (model_bigg_id, gene_bigg_ids) in iter_json_files(
+                model_path, extract_model_genes, workers, writer=writer):
+            if model_bigg_id not in model_ids:
+                writer.add_missing(file, 'model ' + model_bigg_id)
                 continue
 
-            for gene in content['genes']:
-                gene_bigg_id = gene['id']
-
-                gene_instance = Gene.objects.get(bigg_id=gene_bigg_id)
-                gene_instance.models.add(model_instance)
-                gene_instance.save()
+            for gene_bigg_id in gene_bigg_ids:
+                if gene_bigg_id not in gene_ids:
+                    writer.add_missing(file, 'gene ' + gene_bigg_id)
+                    continue
+                writer.add(GeneModel(gene_id=gene_ids[gene_bigg_id], model_id=model_ids[model_bigg_id]))
 
 
 class Command(BaseCommand):
@@ -44,6 +33,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('model_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['model_path'])
+        main(kwargs['model_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
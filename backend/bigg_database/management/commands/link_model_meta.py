@@ -1,48 +1,29 @@
-import json
-import os
-
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Metabolite, Model, ModelMetabolite
-from .progressbar import print_progressbar
-
-
-def main(meta_path):
-    files_list = [os.path.join(meta_path, file)
-                  for file in os.listdir(meta_path)
-                  if not os.path.isdir(os.path.join(meta_path, file))]
-
-    file_cnt = len(files_list)
-    print_progressbar(0, file_cnt)
-    for count, file in enumerate(files_list):
-        print_progressbar(count + 1, file_cnt)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(e, file)
-
-            try:
-                meta_bigg_id_without_compartments = content['bigg_id']
-            except KeyError as e:
-                print(e, file)
-                continue
-
-            for compartment in content['compartments_in_models']:
-                meta_bigg_id = meta_bigg_id_without_compartments + '_' + \
-                    compartment['bigg_id']
-                meta_instance = Metabolite.objects.get(bigg_id=meta_bigg_id)
-                model_instance = Model.objects.get(
-                    bigg_id=compartment['model_bigg_id'])
-
-                try:
-                    mm = ModelMetabolite.objects.create(
-                        metabolite=meta_instance, model=model_instance)
-
-                    mm.organism = compartment['organism']
-                    mm.save()
-                except Exception as e:
-                    print(e, meta_bigg_id, compartment['model_bigg_id'])
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files, load_id_map
+
+
+def extract_metabolite_models(content):
+    return [
+        (content['bigg_id'] + '_' + compartment['bigg_id'], compartment['model_bigg_id'], compartment['organism'])
+        for compartment in content['compartments_in_models']
+    ]
+
+
+def main(meta_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    model_ids = load_id_map(Model)
+    meta_ids = load_id_map(Metabolite)
+
+    with BulkWriter(ModelMetabolite, ('model_id', 'metabolite_id'), batch_size, on_conflict,
+                    'link_model_meta' if sync else None) as writer:
+        for file, links in iter_json_files(meta_path, extract_metabolite_models, workers, writer=writer):
+            for meta_bigg_id, model_bigg_id, organism in links:
+                if meta_bigg_id not in meta_ids or model_bigg_id not in model_ids:
+                    writer.add_missing(file, 'metabolite {} in model {}'.format(meta_bigg_id, model_bigg_id))
+                    continue
+                writer.add(ModelMetabolite(metabolite_id=meta_ids[meta_bigg_id], model_id=model_ids[model_bigg_id],
+                                           organism=organism))
 
 
 class Command(BaseCommand):
@@ -50,6 +31,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('meta_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['meta_path'])
+        main(kwargs['meta_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
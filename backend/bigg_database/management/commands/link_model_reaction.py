@@ -1,103 +1,68 @@
-import json
 import os
 
-import django
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Model, ModelReaction, Reaction
-
-from .progressbar import print_progressbar
-
-
-def parse_all_files_in_dir(path):
-    objects = {}
-    print('Processing', path)
-
-    for root, _, files in os.walk(path):
-        total_len = len(files)
-        for cnt, file in enumerate(files):
-            print_progressbar(cnt + 1, total_len)
-            with open(os.path.join(root, file), 'r') as json_file:
-                try:
-                    objects[file[:-5]] = json.load(json_file)
-                except json.decoder.JSONDecodeError as e:
-                    print(e, file)
-    print('')
-    return objects
-
-
-def link(model, reaction, reaction_info):
-    model = Model.objects.get(bigg_id=model)
-    reaction = Reaction.objects.get(bigg_id=reaction)
-
-    organism = reaction_info['organism']
-    lower_bound = reaction_info['lower_bound']
-    upper_bound = reaction_info['upper_bound']
-    subsystem = reaction_info.get('subsystem')
-
-    gene_reaction_rule = reaction_info['gene_reaction_rule']
-
-    try:
-        ModelReaction.objects.create(model=model,
-                                     reaction=reaction,
-                                     organism=organism,
-                                     lower_bound=lower_bound,
-                                     upper_bound=upper_bound,
-                                     subsystem=subsystem,
-                                     gene_reaction_rule=gene_reaction_rule)
-    except Exception as e:
-        print(e, model.id, reaction.id)
-
-
-def organism_lookup(reaction, model, reactions):
-    child_models = reactions[reaction]['models_containing_reaction']
-    try:
-        result_model = next(m for m in child_models if m['bigg_id'] == model)
-    except StopIteration:
-        print(reaction, model)
-        exit()
-
-    return result_model['organism']
-
-
-def main(models_dirname, reactions_dirname):
-    model_jsons = parse_all_files_in_dir(models_dirname)
-    reaction_jsons = parse_all_files_in_dir(reactions_dirname)
-    total_len = len(model_jsons)
-    cnt = 0
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files, load_id_map
+
+
+def extract_reaction_organisms(content):
+    """The organisms of the models containing a reaction, the only part of a reaction json needed"""
+    return {model['bigg_id']: model['organism'] for model in content['models_containing_reaction']}
+
+
+def extract_model_reactions(content):
+    return [
+        {
+            'id': reaction['id'],
+            'lower_bound': reaction['lower_bound'],
+            'upper_bound': reaction['upper_bound'],
+            'subsystem': reaction.get('subsystem'),
+            'gene_reaction_rule': reaction['gene_reaction_rule'],
+        } for reaction in content['reactions']
+    ]
+
+
+def main(models_dirname, reactions_dirname, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    print('Processing', reactions_dirname)
+    reaction_organisms = {
+        os.path.basename(file)[:-5]: organisms
+        for file, organisms in iter_json_files(reactions_dirname, extract_reaction_organisms, workers)
+    }
+    model_ids = load_id_map(Model)
+    reaction_ids = load_id_map(Reaction)
     print('Linking')
-    for model_id, model in model_jsons.items():
-        cnt += 1
-        print_progressbar(cnt, total_len)
-
-        reactions = model['reactions']
-
-        for reaction in reactions:
-            if reaction['id'] not in reaction_jsons:
-                """
-                try:
-                    reaction['id'] = next(original_id
-                                          for original_id in reaction['notes']['original_bigg_ids']
-                                          if original_id in reaction_jsons)
-                except StopIteration:
-                    id_rmcopy = reaction['id'][:-6]
-                    if id_rmcopy in reaction_jsons:
-                        reaction['id'] = id_rmcopy
-                    else:
-                        print('No such reaction named ' + reaction['id'])
-                        exit()
-                """
-                id_rmcopy = reaction['id'][:-6]
-                if id_rmcopy in reaction_jsons:
-                    reaction['id'] = id_rmcopy
-                else:
-                    print('No such reaction named ' + reaction['id'])
-                    # exit()
+
+    with BulkWriter(ModelReaction, ('model_id', 'reaction_id'), batch_size, on_conflict,
+                    'link_model_reaction' if sync else None) as writer:
+        for file, reactions in iter_json_files(models_dirname, extract_model_reactions, workers, writer=writer):
+            model_bigg_id = os.path.basename(file)[:-5]
+            if model_bigg_id not in model_ids:
+                writer.add_missing(file, 'model ' + model_bigg_id)
+                continue
+
+            for reaction in reactions:
+                reaction_bigg_id = reaction['id']
+                if reaction_bigg_id not in reaction_organisms:
+                    # Reactions copied in a model are suffixed like _copy1
+                    reaction_bigg_id = reaction_bigg_id[:-6]
+                    if reaction_bigg_id not in reaction_organisms:
+                        # Not in the reaction files either, reading the file again would not find it
+                        writer.add_missing(file, 'reaction ' + reaction['id'], incomplete=False)
+                        continue
+
+                organism = reaction_organisms[reaction_bigg_id].get(model_bigg_id)
+                if organism is None or reaction_bigg_id not in reaction_ids:
+                    writer.add_missing(file, 'reaction {} in model {}'.format(reaction_bigg_id, model_bigg_id))
                     continue
 
-            reaction['organism'] = organism_lookup(
-                reaction['id'], model_id, reaction_jsons)
-            link(model_id, reaction['id'], reaction)
+                writer.add(ModelReaction(model_id=model_ids[model_bigg_id],
+                                         reaction_id=reaction_ids[reaction_bigg_id],
+                                         organism=organism,
+                                         lower_bound=reaction['lower_bound'],
+                                         upper_bound=reaction['upper_bound'],
+                                         subsystem=reaction['subsystem'],
+                                         gene_reaction_rule=reaction['gene_reaction_rule']))
 
 
 class Command(BaseCommand):
@@ -106,6 +71,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('model_path', type=str)
         parser.add_argument('reaction_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['model_path'], kwargs['reaction_path'])
+        main(kwargs['model_path'], kwargs['reaction_path'], kwargs['batch_size'], kwargs['on_conflict'],
+             kwargs['workers'], kwargs['sync'])
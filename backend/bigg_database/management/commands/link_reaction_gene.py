@@ -1,45 +1,32 @@
-import json
-import os
-
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Gene, Reaction, ReactionGene
-
-from .progressbar import print_progressbar
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files, load_id_map
 
 
-def main(gene_path):
-    files_list = [os.path.join(gene_path, file)
-                  for file in os.listdir(gene_path)
-                  if not os.path.isdir(os.path.join(gene_path, file))
-                  ]
-    total_len = len(files_list)
+def extract_gene_reactions(content):
+    return content['bigg_id'], [(reaction['bigg_id'], reaction['gene_reaction_rule'])
+                                for reaction in content['reactions']]
 
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(e, file)
 
-            try:
-                gene_bigg_id = content['bigg_id']
-            except KeyError as e:
-                print(e, file)
+def main(gene_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    gene_ids = load_id_map(Gene)
+    reaction_ids = load_id_map(Reaction)
 
-            gene_instance = Gene.objects.get(bigg_id=gene_bigg_id)
+    with BulkWriter(ReactionGene, ('reaction_id', 'gene_id'), batch_size, on_conflict,
+                    'link_reaction_gene' if sync else None) as writer:
+        for file, (gene_bigg_id, reactions) in iter_json_files(
+                gene_path, extract_gene_reactions, workers, writer=writer):
+            if gene_bigg_id not in gene_ids:
+                writer.add_missing(file, 'gene ' + gene_bigg_id)
+                continue
 
-            for reaction in content['reactions']:
-                reaction_bigg_id = reaction['bigg_id']
-                reaction_instance = Reaction.objects.get(
-                    bigg_id=reaction_bigg_id)
-                try:
-                    ReactionGene.objects.create(
-                        reaction=reaction_instance, gene=gene_instance,
-                        gene_reaction_rule=reaction['gene_reaction_rule'])
-                except Exception as e:
-                    print(e, file)
+            for reaction_bigg_id, gene_reaction_rule in reactions:
+                if reaction_bigg_id not in reaction_ids:
+                    writer.add_missing(file, 'reaction ' + reaction_bigg_id)
+                    continue
+                writer.add(ReactionGene(reaction_id=reaction_ids[reaction_bigg_id], gene_id=gene_ids[gene_bigg_id],
+                                        gene_reaction_rule=gene_reaction_rule))
 
 
 class Command(BaseCommand):
@@ -47,6 +34,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('gene_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['gene_path'])
+        main(kwargs['gene_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
@@ -1,43 +1,32 @@
-import json
-import os
-
-import django
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Metabolite, Reaction, ReactionMetabolite
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files, load_id_map
 
-from .progressbar import print_progressbar
-
-
-def main(reaction_path):
-    files_list = [os.path.join(reaction_path, file)
-                  for file in os.listdir(reaction_path)
-                  if not os.path.isdir(os.path.join(reaction_path, file))
-                  ]
-    total_len = len(files_list)
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(e, file)
-                continue
 
-            try:
-                reaction_bigg_id = content['bigg_id']
-            except KeyError as e:
-                print(e, file)
+def extract_reaction_metabolites(content):
+    return content['bigg_id'], [(meta['bigg_id'] + '_' + meta['compartment_bigg_id'], meta['stoichiometry'])
+                                for meta in content['metabolites']]
+
+
+def main(reaction_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    reaction_ids = load_id_map(Reaction)
+    meta_ids = load_id_map(Metabolite)
+
+    with BulkWriter(ReactionMetabolite, ('reaction_id', 'metabolite_id'), batch_size, on_conflict,
+                    'link_reaction_meta' if sync else None) as writer:
+        for file, (reaction_bigg_id, metabolites) in iter_json_files(
+                reaction_path, extract_reaction_metabolites, workers, writer=writer):
+            if reaction_bigg_id not in reaction_ids:
+                writer.add_missing(file, 'reaction ' + reaction_bigg_id)
                 continue
 
-            reaction_instance = Reaction.objects.get(bigg_id=reaction_bigg_id)
-            for meta in content['metabolites']:
-                meta_bigg_id = meta['bigg_id'] + \
-                    '_' + meta['compartment_bigg_id']
-                meta_stoichiometry = meta['stoichiometry']
-                meta_instance = Metabolite.objects.get(bigg_id=meta_bigg_id)
-                ReactionMetabolite.objects.create(
-                    reaction=reaction_instance, metabolite=meta_instance, stoichiometry=meta_stoichiometry)
+            for meta_bigg_id, meta_stoichiometry in metabolites:
+                if meta_bigg_id not in meta_ids:
+                    writer.add_missing(file, 'metabolite ' + meta_bigg_id)
+                    continue
+                writer.add(ReactionMetabolite(reaction_id=reaction_ids[reaction_bigg_id],
+                                              metabolite_id=meta_ids[meta_bigg_id], stoichiometry=meta_stoichiometry))
 
 
 class Command(BaseCommand):
@@ -45,6 +34,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('reaction_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['reaction_path'])
+        main(kwargs['reaction_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
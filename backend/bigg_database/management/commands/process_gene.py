@@ -1,13 +1,7 @@
-
-import asyncio
-import json
-import os
-
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Gene
-
-from .progressbar import print_progressbar
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files
 
 
 def get_from_content(content, *argv):
@@ -31,39 +25,25 @@ def avoid_null(stuff, val_type, *argv):
     return stuff
 
 
-def main(gene_path):
-    files_list = [os.path.join(gene_path, file)
-                  for file in os.listdir(gene_path)
-                  if not os.path.isdir(os.path.join(gene_path, file))]
-    total_len = len(files_list)
+def extract_gene(content):
+    stuff = get_from_content(content,
+                             'rightpos', 'name', 'chromosome_ncbi_accession',
+                             'mapped_to_genbank', 'leftpos', 'database_links',
+                             'strand', 'protein_sequence', 'genome_name',
+                             'dna_sequence', 'bigg_id', 'genome_ref_string')
+    stuff = avoid_null(stuff, 'int', 'rightpos', 'leftpos')
+    stuff = avoid_null(stuff, 'bool', 'mapped_to_genbank')
+    stuff = avoid_null(stuff, 'str', 'name', 'dna_sequence',
+                       'genome_ref_string', 'protein_sequence', 'genome_name',
+                       'chromosome_ncbi_accession', 'strand')
+    return stuff
 
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except Exception as e:
-                print(e, file)
-                continue
 
-            try:
-                stuff = get_from_content(content,
-                                         'rightpos', 'name', 'chromosome_ncbi_accession',
-                                         'mapped_to_genbank', 'leftpos', 'database_links',
-                                         'strand', 'protein_sequence', 'genome_name',
-                                         'dna_sequence', 'bigg_id', 'genome_ref_string')
-                stuff = avoid_null(stuff, 'int', 'rightpos', 'leftpos')
-                stuff = avoid_null(stuff, 'bool', 'mapped_to_genbank')
-                stuff = avoid_null(stuff, 'str', 'name', 'dna_sequence',
-                                   'genome_ref_string', 'protein_sequence', 'genome_name',
-                                   'chromosome_ncbi_accession', 'strand')
-            except AttributeError as e:
-                print(e, file)
-                continue
-            try:
-                Gene.objects.create(**stuff)
-            except Exception as e:
-                print(e, file)
+def main(gene_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    with BulkWriter(Gene, ('bigg_id',), batch_size, on_conflict,
+                    'process_gene' if sync else None) as writer:
+        for file, stuff in iter_json_files(gene_path, extract_gene, workers, writer=writer):
+            writer.add(Gene(**stuff))
 
 
 class Command(BaseCommand):
@@ -71,6 +51,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('gene_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['gene_path'])
+        main(kwargs['gene_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
@@ -1,52 +1,33 @@
-
-import json
-import os
-
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Metabolite
-
-from .progressbar import print_progressbar
-
-
-def main(meta_path):
-    files_list = [os.path.join(meta_path, file)
-                  for file in os.listdir(meta_path)
-                  if not os.path.isdir(os.path.join(meta_path, file))
-                  ]
-    total_len = len(files_list)
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(e, file)
-                continue
-
-            try:
-                bigg_id_without_compartment = content['bigg_id']
-                name = content['name'] or ''
-                formulae = content['formulae']
-            except KeyError as e:
-                print(e, file)
-                continue
-            try:
-                charges = content['charges'][0]
-            # except IndexError as e:
-            except IndexError:
-                charges = None
-            database_links = content['database_links']
-
-            for compartment_id in set([compartment['bigg_id'] for compartment in content['compartments_in_models']]):
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files
+
+
+def extract_metabolite(content):
+    try:
+        charges = content['charges'][0]
+    except IndexError:
+        charges = None
+    fields = {
+        'name': content['name'] or '',
+        'formulae': content['formulae'],
+        'charges': charges,
+        'database_links': content['database_links'],
+    }
+    compartment_ids = set([compartment['bigg_id'] for compartment in content['compartments_in_models']])
+    return content['bigg_id'], fields, compartment_ids
+
+
+def main(meta_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    with BulkWriter(Metabolite, ('bigg_id',), batch_size, on_conflict,
+                    'process_metabolite' if sync else None) as writer:
+        for file, (bigg_id_without_compartment, fields, compartment_ids) in iter_json_files(
+                meta_path, extract_metabolite, workers, writer=writer):
+            for compartment_id in compartment_ids:
                 bigg_id = bigg_id_without_compartment + \
                     '_' + compartment_id
-                try:
-                    Metabolite.objects.create(
-                        bigg_id=bigg_id, name=name, formulae=formulae,
-                        charges=charges, database_links=database_links)
-                except Exception as e:
-                    print(e)
+                writer.add(Metabolite(bigg_id=bigg_id, **fields))
 
 
 class Command(BaseCommand):
@@ -54,6 +35,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('meta_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['meta_path'])
+        main(kwargs['meta_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
@@ -1,29 +1,22 @@
-import json
-import os
-
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Model
-from .progressbar import print_progressbar
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files
 
 
-def main(model_path):
-    files_list = [os.path.join(model_path, file)
-                  for file in os.listdir(model_path)
-                  if not os.path.isdir(os.path.join(model_path, file))
-                  ]
-    total_len = len(files_list)
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            content = json.loads(f.read())
+def extract_model(content):
+    return {
+        'bigg_id': content['id'],
+        'compartments': [key for key in content['compartments'].keys()],
+        'version': content['version'],
+    }
 
-            bigg_id = content['id']
-            compartments = [key for key in content['compartments'].keys()]
 
-            version = content['version']
-            Model.objects.create(
-                bigg_id=bigg_id, compartments=compartments, version=version)
+def main(model_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    with BulkWriter(Model, ('bigg_id',), batch_size, on_conflict,
+                    'process_model' if sync else None) as writer:
+        for file, fields in iter_json_files(model_path, extract_model, workers, writer=writer):
+            writer.add(Model(**fields))
 
 
 class Command(BaseCommand):
@@ -31,6 +24,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('model_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['model_path'])
+        main(kwargs['model_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
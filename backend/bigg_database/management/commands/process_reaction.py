@@ -1,44 +1,24 @@
-import json
-import os
-
-import django
 from django.core.management.base import BaseCommand
 
 from bigg_database.models import Reaction
+from ..bulk_loader import BulkWriter, add_bulk_arguments, iter_json_files
+
+
+def extract_reaction(content):
+    return {
+        'bigg_id': content['bigg_id'],
+        'name': content['name'] or '',
+        'database_links': content['database_links'],
+        'pseudoreaction': content['pseudoreaction'],
+        'reaction_string': content['reaction_string'],
+    }
+
 
-from .progressbar import print_progressbar
-
-
-def main(reaction_path):
-    files_list = [os.path.join(reaction_path, file)
-                  for file in os.listdir(reaction_path)
-                  if not os.path.isdir(os.path.join(reaction_path, file))]
-    total_len = len(files_list)
-    for cnt, file in enumerate(files_list):
-        print_progressbar(cnt + 1, total_len)
-        with open(file, 'r', encoding='utf-8') as f:
-            try:
-                content = json.loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(e, file)
-                continue
-            try:
-                bigg_id = content['bigg_id']
-                name = content['name'] or ''
-
-                database_links = content['database_links']
-                pseudoreaction = content['pseudoreaction']
-                reaction_string = content['reaction_string']
-                # print(reaction_string)
-            except KeyError as e:
-                print(e, file)
-                continue
-
-            try:
-                Reaction.objects.create(bigg_id=bigg_id, name=name, reaction_string=reaction_string,
-                                        pseudoreaction=pseudoreaction, database_links=database_links)
-            except Exception as e:
-                print(e, file)
+def main(reaction_path, batch_size=1000, on_conflict='skip', workers=1, sync=False):
+    with BulkWriter(Reaction, ('bigg_id',), batch_size, on_conflict,
+                    'process_reaction' if sync else None) as writer:
+        for file, fields in iter_json_files(reaction_path, extract_reaction, workers, writer=writer):
+            writer.add(Reaction(**fields))
 
 
 class Command(BaseCommand):
@@ -46,6 +26,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('reaction_path', type=str)
+        add_bulk_arguments(parser)
 
     def handle(self, **kwargs):
-        main(kwargs['reaction_path'])
+        main(kwargs['reaction_path'], kwargs['batch_size'], kwargs['on_conflict'], kwargs['workers'],
+             kwargs['sync'])
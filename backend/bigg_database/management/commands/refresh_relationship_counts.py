@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from bigg_database.utils import refresh_relationship_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the relationship counts of models, reactions, metabolites and genes, e.g. after loaddata'
+
+    def handle(self, **kwargs):
+        refresh_relationship_counts()
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:45
+
+import bigg_database.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bigg_database', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.CharField(max_length=63)),
+                ('name', models.CharField(max_length=255)),
+                ('checksum', models.CharField(max_length=64)),
+                ('keys', bigg_database.fields.JSONField()),
+                ('imported_time', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('command', 'name')},
+            },
+        ),
+    ]
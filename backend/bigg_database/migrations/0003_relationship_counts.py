@@ -0,0 +1,63 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bigg_database', '0002_importedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gene',
+            name='model_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gene',
+            name='reaction_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metabolite',
+            name='model_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metabolite',
+            name='reaction_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='model',
+            name='gene_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='model',
+            name='metabolite_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='model',
+            name='reaction_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reaction',
+            name='gene_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reaction',
+            name='metabolite_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reaction',
+            name='model_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
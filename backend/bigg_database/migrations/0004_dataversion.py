@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:01
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_data_version(apps, schema_editor):
+    apps.get_model('bigg_database', 'DataVersion').objects.create(pk=1, version=0, updated_time=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bigg_database', '0003_relationship_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_time', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_data_version, migrations.RunPython.noop),
+    ]
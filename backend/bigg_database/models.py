@@ -30,6 +30,11 @@ class Model(_models.Model):
     compartments = JSONField()
     version = _models.CharField(max_length=127)
 
+    # Relationship counts refreshed by the link commands, None until they are computed
+    reaction_count = _models.IntegerField(null=True, blank=True)
+    metabolite_count = _models.IntegerField(null=True, blank=True)
+    gene_count = _models.IntegerField(null=True, blank=True)
+
     class Meta:
         verbose_name = 'Model'
 
@@ -45,6 +50,10 @@ class Reaction(_models.Model):
 
     database_links = JSONField()
 
+    model_count = _models.IntegerField(null=True, blank=True)
+    metabolite_count = _models.IntegerField(null=True, blank=True)
+    gene_count = _models.IntegerField(null=True, blank=True)
+
     class Meta:
         verbose_name = 'Reaction'
 
@@ -63,6 +72,9 @@ class Metabolite(_models.Model):
 
     database_links = JSONField()
 
+    reaction_count = _models.IntegerField(null=True, blank=True)
+    model_count = _models.IntegerField(null=True, blank=True)
+
     class Meta:
         verbose_name = 'Metabolite'
 
@@ -88,6 +100,9 @@ class Gene(_models.Model):
         Reaction, through='ReactionGene', through_fields=('gene', 'reaction'))
     models = _models.ManyToManyField(Model)
 
+    reaction_count = _models.IntegerField(null=True, blank=True)
+    model_count = _models.IntegerField(null=True, blank=True)
+
     class Meta:
         constraints = [
             _models.CheckConstraint(check=_models.Q(rightpos__gte=_models.F('leftpos')),
@@ -146,3 +161,22 @@ class ModelReaction(_models.Model):
             _models.CheckConstraint(check=_models.Q(upper_bound__gte=_models.F('lower_bound')),
                                     name='upper_gte_lower')
         ]
+
+
+class ImportedFile(_models.Model):
+    """A json file imported by an import command, which lets a later sync skip it if it is unchanged"""
+    command = _models.CharField(max_length=63)
+    name = _models.CharField(max_length=255)
+    checksum = _models.CharField(max_length=64)
+    # Keys of the rows made from the file, rows whose keys disappear from the file are deleted by a sync
+    keys = JSONField()
+    imported_time = _models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('command', 'name')
+
+
+class DataVersion(_models.Model):
+    """Single row counting the changes of the BiGG tables, which stamps the cached responses of the BiGG views"""
+    version = _models.PositiveIntegerField(default=0)
+    updated_time = _models.DateTimeField()
@@ -0,0 +1,92 @@
+"""
+Sparse stoichiometric matrices of BiGG models.
+The matrix of a model is built from the ModelReaction and ReactionMetabolite rows in two queries and a few
+numpy operations, and saved as an .npz file holding the CSR arrays, the bounds and the ids.
+Files are named by the model and the data version, so they are rebuilt after every import, like the ETags,
+and the files of older versions are deleted then.
+"""
+import io
+import os
+from typing import Dict
+
+import numpy as np
+from django.conf import settings
+
+from .http_cache import get_data_version
+from .models import ModelReaction, ReactionMetabolite
+
+
+def build_s_matrix(model) -> Dict[str, np.ndarray]:
+    """
+    Arrays of the S-matrix of a model in CSR format, rows are metabolites and columns are reactions,
+    both sorted by bigg_id. S can be rebuilt by scipy.sparse.csr_matrix((data, indices, indptr), shape).
+    """
+    reaction_rows = list(ModelReaction.objects.filter(model=model).order_by('reaction__bigg_id').values_list(
+        'reaction_id', 'reaction__bigg_id', 'lower_bound', 'upper_bound'))
+    reaction_pks = np.array([row[0] for row in reaction_rows], dtype=np.int64)
+    reaction_ids = np.array([row[1] for row in reaction_rows], dtype=np.str_)
+    lower_bounds = np.array([row[2] for row in reaction_rows], dtype=np.float64)
+    upper_bounds = np.array([row[3] for row in reaction_rows], dtype=np.float64)
+
+    coefficient_rows = list(ReactionMetabolite.objects.filter(reaction__modelreaction__model=model).values_list(
+        'reaction_id', 'metabolite__bigg_id', 'stoichiometry'))
+    coefficient_reactions = np.array([row[0] for row in coefficient_rows], dtype=np.int64)
+    metabolite_ids, rows = np.unique(np.array([row[1] for row in coefficient_rows], dtype=np.str_),
+                                     return_inverse=True)
+    data = np.array([row[2] for row in coefficient_rows], dtype=np.float64)
+
+    # Column of every coefficient by the position of its reaction pk in the model
+    order = np.argsort(reaction_pks)
+    columns = order[np.searchsorted(reaction_pks, coefficient_reactions, sorter=order)]
+
+    # Sort the coefficients by row then column, and count the coefficients of each row for indptr
+    coo_order = np.lexsort((columns, rows))
+    rows, columns, data = rows[coo_order], columns[coo_order], data[coo_order]
+    indptr = np.zeros(len(metabolite_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(metabolite_ids)), out=indptr[1:])
+
+    return {
+        'data': data,
+        'indices': columns.astype(np.int64),
+        'indptr': indptr,
+        'shape': np.array([len(metabolite_ids), len(reaction_ids)], dtype=np.int64),
+        'metabolite_ids': metabolite_ids,
+        'reaction_ids': reaction_ids,
+        'lower_bounds': lower_bounds,
+        'upper_bounds': upper_bounds,
+    }
+
+
+def get_s_matrix_file_name(model, version: int) -> str:
+    return '{}_{}.npz'.format(model.bigg_id, version)
+
+
+def delete_old_s_matrix_files(model, store_dir: str, version: int):
+    """Delete the files of the model built at data versions older than version"""
+    for file_name in os.listdir(store_dir):
+        bigg_id, _, file_version = file_name[:-len('.npz')].rpartition('_')
+        if file_name.endswith('.npz') and bigg_id == model.bigg_id and file_version.isdigit() and \
+                int(file_version) < version:
+            try:
+                os.remove(os.path.join(store_dir, file_name))
+            except FileNotFoundError:
+                # Deleted by another request at the same time
+                pass
+
+
+def get_s_matrix_file(model) -> str:
+    """Path of the .npz file of the S-matrix of a model, which is built if it is not cached yet"""
+    store_dir = settings.BIGG_MATRIX_STORE_DIR
+    version = get_data_version()[0]
+    path = os.path.join(store_dir, get_s_matrix_file_name(model, version))
+    if not os.path.exists(path):
+        os.makedirs(store_dir, exist_ok=True)
+        content = io.BytesIO()
+        np.savez_compressed(content, **build_s_matrix(model))
+        # Write to a temporary file first, so that no request reads a half written file
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            f.write(content.getvalue())
+        os.replace(temp_path, path)
+        delete_old_s_matrix_files(model, store_dir, version)
+    return path
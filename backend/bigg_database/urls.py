@@ -69,6 +69,8 @@ urlpatterns = [
          name='api_metabolite_detail'),
     path('api/gene/<int:pk>', api_views.GeneDetailApiView.as_view(),
          name='api_gene_detail'),
+    path('api/model/<int:pk>/s_matrix', api_views.ModelSMatrixApiView.as_view(),
+         name='api_model_s_matrix'),
     path('api/model/<int:pk>/genes', api_views.GenesInModel.as_view(),
          name='api_genes_in_model'),
     path('api/model/<int:pk>/metabolites', api_views.MetabolitesInModelApiView.as_view(),
@@ -0,0 +1,66 @@
+from typing import Any, Dict, Iterable, List
+
+from django.db.models import Count, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from .http_cache import bump_data_version
+from .models import Gene, Metabolite, Model, ModelMetabolite, ModelReaction, Reaction, ReactionGene, ReactionMetabolite
+
+
+def get_relationship_extra_info(through_model, from_field: str, from_instance, to_field: str,
+                                to_instances: Iterable, extra_fields: List[str]) -> Dict[int, Dict[str, Any]]:
+    """
+    Fields of the through table rows between from_instance and every instance in to_instances,
+    fetched by one query and keyed by the pk of the to_instance
+    """
+    if isinstance(to_instances, QuerySet) and to_instances.query.can_filter():
+        # Whole lists are selected by a subquery, a list of their pks may exceed the parameter limit of SQLite.
+        # Sliced querysets are pages, MySQL can not limit a subquery in IN
+        to_pks = to_instances.values('pk')
+    else:
+        to_pks = [instance.pk for instance in to_instances]
+    rows = through_model.objects.filter(**{
+        from_field: from_instance,
+        to_field + '__in': to_pks,
+    }).values(to_field, *extra_fields)
+    return {row.pop(to_field): row for row in rows}
+
+
+# (model, count field, through model, foreign key of the through model to the model)
+RELATIONSHIP_COUNTS = [
+    (Model, 'reaction_count', ModelReaction, 'model'),
+    (Model, 'metabolite_count', ModelMetabolite, 'model'),
+    (Model, 'gene_count', Gene.models.through, 'model'),
+    (Reaction, 'model_count', ModelReaction, 'reaction'),
+    (Reaction, 'metabolite_count', ReactionMetabolite, 'reaction'),
+    (Reaction, 'gene_count', ReactionGene, 'reaction'),
+    (Metabolite, 'reaction_count', ReactionMetabolite, 'metabolite'),
+    (Metabolite, 'model_count', ModelMetabolite, 'metabolite'),
+    (Gene, 'reaction_count', ReactionGene, 'gene'),
+    (Gene, 'model_count', Gene.models.through, 'gene'),
+]
+
+
+def get_count_field(relation: str) -> str:
+    """Count field of a relation, e.g. reaction_set -> reaction_count, models -> model_count"""
+    name = relation[:-len('_set')] if relation.endswith('_set') else relation.rstrip('s')
+    return name + '_count'
+
+
+def get_relationship_count(instance, relation: str) -> int:
+    """Count of the related objects, from the count field if it has been refreshed"""
+    count = getattr(instance, get_count_field(relation), None)
+    if count is None:
+        count = getattr(instance, relation).count()
+    return count
+
+
+def refresh_relationship_counts(through_model=None):
+    """Recompute the count fields, only the ones counting the rows of through_model if given"""
+    for model_class, count_field, relation_model, fk_name in RELATIONSHIP_COUNTS:
+        if through_model is not None and relation_model is not through_model:
+            continue
+        counts = relation_model.objects.filter(**{fk_name: OuterRef('pk')}).order_by() \
+            .values(fk_name).annotate(count=Count('pk')).values('count')
+        model_class.objects.update(**{count_field: Coalesce(Subquery(counts), 0)})
+    bump_data_version()
@@ -8,6 +8,7 @@ from django.core.paginator import Paginator
 from django.forms.models import model_to_dict
 from django.http import JsonResponse
 from django.shortcuts import Http404, redirect, render, reverse
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext as _
 from django.views.generic import DetailView, ListView, View
 from django.views.generic.detail import SingleObjectMixin
@@ -15,19 +16,25 @@ from django.views.generic.detail import SingleObjectMixin
 from .models import (Gene, Metabolite, Model, ModelMetabolite, ModelReaction,
                      Reaction, ReactionGene, ReactionMetabolite)
 
+from .http_cache import bigg_page_view
+from .utils import get_relationship_extra_info
+
 from cobra_wrapper.models import CobraModel
 
 
+@method_decorator(bigg_page_view, name='dispatch')
 class ModelDetailView(DetailView):
     model = Model
     context_object_name = 'model'
 
 
+@method_decorator(bigg_page_view, name='dispatch')
 class MetaboliteDetailView(DetailView):
     model = Metabolite
     context_object_name = 'meta'
 
 
+@method_decorator(bigg_page_view, name='dispatch')
 class ReactionDetailView(DetailView):
     model = Reaction
     context_object_name = 'reaction'
@@ -41,11 +48,13 @@ class ReactionDetailView(DetailView):
         return context
 
 
+@method_decorator(bigg_page_view, name='dispatch')
 class GeneDetailView(DetailView):
     model = Gene
     context_object_name = 'gene'
 
 
+@method_decorator(bigg_page_view, name='dispatch')
 class RelationshipLookupView(ListView):
     '''
     This view aims to be the base view of (*)In(*)View
@@ -65,15 +74,25 @@ class RelationshipLookupView(ListView):
     to_model_name = None
     template_name = 'bigg_database/relationship_lookup_list.html'
     context_object_name = 'result_list'
-
-    def get_object_extra_info(self, instance):
-        return {}
+    # Fields of the through model set on every object, fetched in one query for the whole page.
+    # from_field and to_field are the foreign keys of the through model to from_model and the listed model
+    through_model = None
+    from_field = None
+    to_field = None
+    extra_fields = []
+
+    def get_objects_extra_info(self, instances):
+        if self.through_model is None:
+            return {}
+        return get_relationship_extra_info(self.through_model, self.from_field, self.object, self.to_field,
+                                           instances, self.extra_fields)
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
 
+        extra_info = self.get_objects_extra_info(context['result_list'])
         for ins in context['result_list']:
-            for key, value in self.get_object_extra_info(ins).items():
+            for key, value in extra_info.get(ins.pk, {}).items():
                 setattr(ins, key, value)
 
         context['to_model_name'] = self.to_model_name.replace('_set', '')
@@ -113,14 +132,10 @@ class MetabolitesInModel(RelationshipLookupView):
     '''
     from_model = Model
     to_model_name = 'metabolite_set'
-
-    def get_object_extra_info(self, instance):
-        mm = ModelMetabolite.objects.get(model=self.object, metabolite=instance)
-
-        extra_info = {
-            'organism': mm.organism,
-        }
-        return extra_info
+    through_model = ModelMetabolite
+    from_field = 'model'
+    to_field = 'metabolite'
+    extra_fields = ['organism']
 
 
 class ReactionsInModel(RelationshipLookupView):
@@ -129,17 +144,10 @@ class ReactionsInModel(RelationshipLookupView):
     '''
     from_model = Model
     to_model_name = 'reaction_set'
-
-    def get_object_extra_info(self, instance):
-        mr = ModelReaction.objects.get(model=self.object, reaction=instance)
-        extra_info = {
-            'organism': mr.organism,
-            'lower_bound': mr.lower_bound,
-            'upper_bound': mr.upper_bound,
-            'subsystem': mr.subsystem,
-            'gene_reaction_rule': mr.gene_reaction_rule,
-        }
-        return extra_info
+    through_model = ModelReaction
+    from_field = 'model'
+    to_field = 'reaction'
+    extra_fields = ['organism', 'lower_bound', 'upper_bound', 'subsystem', 'gene_reaction_rule']
 
 
 class MetabolitesInReaction(RelationshipLookupView):
@@ -148,13 +156,10 @@ class MetabolitesInReaction(RelationshipLookupView):
     '''
     from_model = Reaction
     to_model_name = 'metabolite_set'
-
-    def get_object_extra_info(self, instance):
-        rm = ReactionMetabolite.objects.get(metabolite=instance, reaction=self.object)
-        extra_info = {
-            'stoichiometry': rm.stoichiometry
-        }
-        return extra_info
+    through_model = ReactionMetabolite
+    from_field = 'reaction'
+    to_field = 'metabolite'
+    extra_fields = ['stoichiometry']
 
 
 class GenesInReaction(RelationshipLookupView):
@@ -163,13 +168,10 @@ class GenesInReaction(RelationshipLookupView):
     '''
     from_model = Reaction
     to_model_name = 'gene_set'
-
-    def get_object_extra_info(self, instance):
-        rg = ReactionGene.objects.get(gene=instance, reaction=self.object)
-        extra_info = {
-            'gene_reaction_rule': rg.gene_reaction_rule
-        }
-        return extra_info
+    through_model = ReactionGene
+    from_field = 'reaction'
+    to_field = 'gene'
+    extra_fields = ['gene_reaction_rule']
 
 
 class GeneFromModels(RelationshipLookupView):
@@ -188,13 +190,10 @@ class MetaboliteFromModels(RelationshipLookupView):
     from_model = Metabolite
     to_model_name = 'models'
     template_name = 'bigg_database/relationship_reverse_lookup_list.html'
-
-    def get_object_extra_info(self, instance):
-        mm = ModelMetabolite.objects.get(model=instance, metabolite=self.object)
-        extra_info = {
-            'organism': mm.organism
-        }
-        return extra_info
+    through_model = ModelMetabolite
+    from_field = 'metabolite'
+    to_field = 'model'
+    extra_fields = ['organism']
 
 
 class ReactionFromModels(RelationshipLookupView):
@@ -204,17 +203,10 @@ class ReactionFromModels(RelationshipLookupView):
     from_model = Reaction
     to_model_name = 'models'
     template_name = 'bigg_database/relationship_reverse_lookup_list.html'
-
-    def get_object_extra_info(self, instance):
-        mr = ModelReaction.objects.get(model=instance, reaction=self.object)
-        extra_info = {
-            'organism': mr.organism,
-            'lower_bound': mr.lower_bound,
-            'upper_bound': mr.upper_bound,
-            'subsystem': mr.subsystem,
-            'gene_reaction_rule': mr.gene_reaction_rule,
-        }
-        return extra_info
+    through_model = ModelReaction
+    from_field = 'reaction'
+    to_field = 'model'
+    extra_fields = ['organism', 'lower_bound', 'upper_bound', 'subsystem', 'gene_reaction_rule']
 
 
 class GeneFromReactions(RelationshipLookupView):
@@ -224,13 +216,10 @@ class GeneFromReactions(RelationshipLookupView):
     from_model = Gene
     to_model_name = 'reactions'
     template_name = 'bigg_database/relationship_reverse_lookup_list.html'
-
-    def get_object_extra_info(self, instance):
-        rg = ReactionGene.objects.get(gene=self.object, reaction=instance)
-        extra_info = {
-            'gene_reaction_rule': rg.gene_reaction_rule
-        }
-        return extra_info
+    through_model = ReactionGene
+    from_field = 'gene'
+    to_field = 'reaction'
+    extra_fields = ['gene_reaction_rule']
 
 
 class MetaboliteFromReactions(RelationshipLookupView):
@@ -241,13 +230,10 @@ class MetaboliteFromReactions(RelationshipLookupView):
     from_model = Metabolite
     to_model_name = 'reactions'
     template_name = 'bigg_database/relationship_reverse_lookup_list.html'
-
-    def get_object_extra_info(self, instance):
-        rm = ReactionMetabolite.objects.get(metabolite=self.object, reaction=instance)
-        extra_info = {
-            'stoichiometry': rm.stoichiometry
-        }
-        return extra_info
+    through_model = ReactionMetabolite
+    from_field = 'metabolite'
+    to_field = 'reaction'
+    extra_fields = ['stoichiometry']
 
 
 # TODO
@@ -1,8 +1,9 @@
 from django.contrib import admin
 
-from .models import CobraModel, CobraFba, CobraFva, CobraModelChange
+from .models import CobraModel, CobraFba, CobraFva, CobraKnockout, CobraModelChange
 
 admin.site.register(CobraModel)
 admin.site.register(CobraFba)
 admin.site.register(CobraFva)
+admin.site.register(CobraKnockout)
 admin.site.register(CobraModelChange)
@@ -2,11 +2,13 @@ import json
 
 from django.views.generic.detail import SingleObjectMixin, View
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from django.core.paginator import Paginator
+from django.contrib.auth.mixins import LoginRequiredMixin
 import cobra
 
 from . import models
-from .utils import is_coenzyme
+from .utils import is_coenzyme, load_comma_separated_str
 
 
 class CobraModelDetailJsonView(SingleObjectMixin, View):
@@ -19,6 +21,24 @@ class CobraModelDetailJsonView(SingleObjectMixin, View):
         return JsonResponse(json.loads(json_content))
 
 
+class CobraModelComponentListJsonView(LoginRequiredMixin, View):
+    """A page of the reactions, metabolites or genes of a model, filtered by a cobra id prefix like ?q=PG"""
+    paginate_by = 100
+
+    def get(self, request, pk, kind):
+        if kind not in models.COMPONENT_KINDS:
+            raise Http404('No component kind {}'.format(kind))
+        model_object = get_object_or_404(models.CobraModel, owner=request.user, pk=pk)
+        page = Paginator(model_object.get_components(kind, request.GET.get('q', '')).values('cobra_id', 'name'),
+                         self.paginate_by).get_page(request.GET.get('page'))
+        return JsonResponse({
+            'count': page.paginator.count,
+            'num_pages': page.paginator.num_pages,
+            'page': page.number,
+            'results': list(page.object_list),
+        })
+
+
 class CobraComputationDetailJsonView(SingleObjectMixin, View):
     model_class = None
     backref_field = None
@@ -29,9 +49,12 @@ class CobraComputationDetailJsonView(SingleObjectMixin, View):
 
     def get_result_dict(self):
         self.object = self.get_object()
-        results = [json.loads(self.object.result)]
+        # Part of the reactions can be requested like ?reactions=PFK,PGI
+        reaction_ids = load_comma_separated_str(self.request.GET['reactions']) \
+            if self.request.GET.get('reactions') else None
+        results = [self.object.get_result(reaction_ids)]
         results.extend([
-            json.loads(fba.result)
+            fba.get_result(reaction_ids)
             for fba in self.model_class.objects.filter(model=self.model_object, ok=True).exclude(pk=self.object.pk)[:1]
         ])
         return {'results': results}
@@ -67,3 +90,21 @@ class CobraRgeFbaDetailJsonView(CobraComputationDetailJsonView):
 class CobraFvaDetailJsonView(CobraComputationDetailJsonView):
     model_class = models.CobraFva
     backref_field = 'fva_list'
+
+
+class CobraKnockoutDetailJsonView(CobraComputationDetailJsonView):
+    """The result of a knockout screen with a page of its gene sets, like ?page=2"""
+    model_class = models.CobraKnockout
+    backref_field = 'knockout_list'
+    paginate_by = 100
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        page = Paginator(self.object.gene_set_results.values_list('gene_set', 'objective_value', 'status'),
+                         self.paginate_by).get_page(request.GET.get('page'))
+        return JsonResponse({
+            'results': [self.object.get_result(gene_set_results=page.object_list)],
+            'count': page.paginator.count,
+            'num_pages': page.paginator.num_pages,
+            'page': page.number,
+        })
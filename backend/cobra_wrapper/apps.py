@@ -6,6 +6,8 @@ class CobraWrapperConfig(AppConfig):
     name = 'cobra_wrapper'
 
     def ready(self):
-        from .signals.revoke_cobra_feeds import revoke_cobra_fba, revoke_cobra_fva
+        from .signals.revoke_cobra_feeds import revoke_cobra_fba, revoke_cobra_fva, revoke_cobra_knockout
         pre_delete.connect(revoke_cobra_fba, sender='cobra_wrapper.CobraFba', dispatch_uid='revoke_cobra_fba')
         pre_delete.connect(revoke_cobra_fva, sender='cobra_wrapper.CobraFva', dispatch_uid='revoke_cobra_fva')
+        pre_delete.connect(revoke_cobra_knockout, sender='cobra_wrapper.CobraKnockout',
+                           dispatch_uid='revoke_cobra_knockout')
@@ -4,8 +4,8 @@ from django import forms
 import cobra
 
 from . import models
-from .utils import dump_sbml, get_reaction_json, clean_comma_separated_str, load_comma_separated_str, \
-    add_reaction_from_string_to_model
+from .utils import get_reaction_json, clean_comma_separated_str, load_comma_separated_str, \
+    add_reaction_from_string_to_model, clean_gene_sets_str, load_gene_sets_str
 from search.internal_api import search_biobricks
 
 
@@ -72,7 +72,7 @@ class CobraModelObjectiveUpdateForm(forms.Form):
         except Exception:
             pass
         else:
-            model.sbml_content = dump_sbml(cobra_model)
+            model.update_sbml(cobra_model)
             model.save()
         return model
 
@@ -85,10 +85,8 @@ class CobraModelReactionDeleteForm(forms.Form):
         cleaned_data = super().clean()
         deleted_reaction_id = load_comma_separated_str(
             clean_comma_separated_str(self, cleaned_data.get('deleted_reaction_id', '')))
-        reactions = [reaction['cobra_id'] for reaction in json.loads(self.model_object.reactions)]
-        for reaction in deleted_reaction_id:
-            if reaction not in reactions:
-                self.add_error('deleted_reaction_id', '{} can not be found in the model'.format(reaction))
+        for reaction in self.model_object.get_missing_components('reaction', deleted_reaction_id):
+            self.add_error('deleted_reaction_id', '{} can not be found in the model'.format(reaction))
         cleaned_data['deleted_reaction_id'] = ','.join(deleted_reaction_id)
         return cleaned_data
 
@@ -106,9 +104,9 @@ class CobraModelReactionDeleteForm(forms.Form):
         models.CobraModelChange.objects.create(change_type=self.cleaned_data['change_type'], model=model,
                                                reaction_info=json.dumps(deleted_reaction_info))
         cobra_model.remove_reactions(deleted_reaction_id_list)
-        model.sbml_content = dump_sbml(cobra_model)
+        model.update_sbml(cobra_model)
         model.save()
-        model.cache(cobra_model)
+        model.patch_cache(cobra_model, removed_reaction_ids=deleted_reaction_id_list)
         return model
 
 
@@ -140,9 +138,9 @@ class CobraModelReactionCreateForm(forms.Form):
                                                reaction_info=json.dumps({
                                                    'reactions': [get_reaction_json(cobra_reaction)],
                                                }))
-        model.sbml_content = dump_sbml(cobra_model)
+        model.update_sbml(cobra_model)
         model.save()
-        model.cache(cobra_model)
+        model.patch_cache(cobra_model, added_reactions=[cobra_reaction])
         keywords = set()
         reaction_dict_list = [
             json.loads(change.reaction_info)
@@ -192,10 +190,8 @@ class CleanDeletedGenesMixin:
         cleaned_data = super().clean()
         deleted_genes = load_comma_separated_str(
             clean_comma_separated_str(self, cleaned_data.get('deleted_genes', '')))
-        genes = [gene['cobra_id'] for gene in json.loads(self.model_object.genes)]
-        for gene in deleted_genes:
-            if gene not in genes:
-                self.add_error('deleted_genes', '{} can not be found in the model'.format(gene))
+        for gene in self.model_object.get_missing_components('gene', deleted_genes):
+            self.add_error('deleted_genes', '{} can not be found in the model'.format(gene))
         cleaned_data['deleted_genes'] = ','.join(deleted_genes)
         return cleaned_data
 
@@ -209,7 +205,7 @@ class CobraFbaForm(CleanDeletedGenesMixin, forms.ModelForm):
 class CobraRgeFbaForm(CleanDeletedGenesMixin, forms.ModelForm):
     class Meta:
         model = models.CobraRgeFba
-        fields = ['desc', 'deleted_genes']
+        fields = ['desc', 'deleted_genes', 'max_iterations']
 
 
 class CobraFvaForm(CleanDeletedGenesMixin, forms.ModelForm):
@@ -221,14 +217,44 @@ class CobraFvaForm(CleanDeletedGenesMixin, forms.ModelForm):
         cleaned_data = super().clean()
         reaction_list = load_comma_separated_str(
             clean_comma_separated_str(self, cleaned_data.get('reaction_list', '')))
-        reactions = [reaction['cobra_id'] for reaction in json.loads(self.model_object.reactions)]
-        for reaction in reaction_list:
-            if reaction not in reactions:
-                self.add_error('reaction_list', '{} can not be found in the model'.format(reaction))
+        for reaction in self.model_object.get_missing_components('reaction', reaction_list):
+            self.add_error('reaction_list', '{} can not be found in the model'.format(reaction))
         cleaned_data['reaction_list'] = ','.join(reaction_list)
         return cleaned_data
 
 
+class CobraKnockoutForm(forms.ModelForm):
+    class Meta:
+        model = models.CobraKnockout
+        fields = ['desc', 'mode', 'gene_sets']
+        help_texts = {
+            'gene_sets': 'Used in custom mode, e.g. "b0008,b0114;b0116" to knock out b0008 and b0114 together '
+                         'and then b0116 alone',
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        gene_sets = load_gene_sets_str(clean_gene_sets_str(self, cleaned_data.get('gene_sets', '')))
+        if cleaned_data.get('mode') == 'custom':
+            if not gene_sets:
+                self.add_error('gene_sets', 'At least one gene set is required in custom mode')
+            for gene in self.model_object.get_missing_components(
+                    'gene', sorted({gene for gene_set in gene_sets for gene in gene_set})):
+                self.add_error('gene_sets', '{} can not be found in the model'.format(gene))
+            if len(gene_sets) > models.MAX_KNOCKOUT_GENE_SETS:
+                self.add_error('gene_sets', 'At most {} gene sets can be screened, {} are given'.format(
+                    models.MAX_KNOCKOUT_GENE_SETS, len(gene_sets)))
+        else:
+            gene_sets = []
+            gene_count = self.model_object.get_components('gene').count()
+            gene_set_count = gene_count if cleaned_data.get('mode') == 'single' else gene_count * (gene_count - 1) // 2
+            if gene_set_count > models.MAX_KNOCKOUT_GENE_SETS:
+                self.add_error('mode', 'At most {} gene sets can be screened, the {} mode of the model has {}'.format(
+                    models.MAX_KNOCKOUT_GENE_SETS, cleaned_data.get('mode'), gene_set_count))
+        cleaned_data['gene_sets'] = ';'.join([','.join(gene_set) for gene_set in gene_sets])
+        return cleaned_data
+
+
 class CobraModelReactionUpdateBoundForm(forms.Form):
     cobra_id = forms.CharField(max_length=600, widget=forms.HiddenInput())
     lower_bound = forms.FloatField(initial=0.0)
@@ -236,8 +262,7 @@ class CobraModelReactionUpdateBoundForm(forms.Form):
 
     def clean(self):
         cleaned_data = super().clean()
-        reactions = [reaction['cobra_id'] for reaction in json.loads(self.model_object.reactions)]
-        if cleaned_data['cobra_id'] not in reactions:
+        if self.model_object.get_missing_components('reaction', [cleaned_data['cobra_id']]):
             self.add_error('cobra_id', '{} can not be found in the model'.format(cleaned_data['cobra_id']))
         return cleaned_data
 
@@ -248,7 +273,7 @@ class CobraModelReactionUpdateBoundForm(forms.Form):
         cobra_reaction: cobra.Reaction = cobra_model.reactions.get_by_id(self.cleaned_data['cobra_id'])
         cobra_reaction.lower_bound = self.cleaned_data['lower_bound']
         cobra_reaction.upper_bound = self.cleaned_data['upper_bound']
-        self.model_object.sbml_content = dump_sbml(cobra_model)
+        self.model_object.update_sbml(cobra_model)
         self.model_object.save()
-        self.model_object.cache(cobra_model)
+        # Bounds are not in the cached lists, so they stay as they are
         return self.model_object
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from cobra_wrapper.utils import clean_model_store
+
+
+class Command(BaseCommand):
+    help = 'Delete the SBML blobs sent to computation workers which no model uses any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24,
+                            help='Hours a blob is kept after it was written, for computations still queued')
+
+    def handle(self, min_age, **kwargs):
+        deleted_paths = clean_model_store(min_age * 3600)
+        self.stdout.write('{} blobs deleted'.format(len(deleted_paths)))
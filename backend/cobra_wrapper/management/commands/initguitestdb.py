@@ -3,7 +3,7 @@ import subprocess
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-import cobra.test
+import cobra.io
 
 from backend.settings import BASE_DIR
 from cobra_wrapper.models import CobraModel
@@ -17,7 +17,7 @@ def main():
         pass
     subprocess.run([os.path.join(BASE_DIR, 'manage.py'), 'migrate'], env=os.environ)
     user = User.objects.create_superuser('test', '', 'test123456')
-    cobra_model = cobra.test.create_test_model()
+    cobra_model = cobra.io.load_model('textbook')
     model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(cobra_model), owner=user)
     model.cache(cobra_model)
 
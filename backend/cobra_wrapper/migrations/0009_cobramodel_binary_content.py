@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0008_cobrabiobrick'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cobramodel',
+            name='binary_content',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
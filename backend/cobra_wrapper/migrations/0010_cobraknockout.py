@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:35
+
+import cobra_wrapper.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0009_cobramodel_binary_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CobraKnockout',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desc', models.CharField(blank=True, max_length=600)),
+                ('mode', models.CharField(choices=[('custom', 'custom'), ('single', 'single'), ('double', 'double')], default='custom', max_length=10)),
+                ('gene_sets', models.TextField(blank=True)),
+                ('start_time', models.DateTimeField(auto_now_add=True)),
+                ('task_id', models.UUIDField(blank=True, default=None, null=True)),
+                ('result', models.TextField(blank=True, validators=[cobra_wrapper.models.validate_json_str_or_blank_str])),
+                ('ok', models.BooleanField(default=False)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='knockout_list', to='cobra_wrapper.CobraModel')),
+            ],
+            options={
+                'verbose_name': 'knockout',
+                'ordering': ['-start_time'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:37
+
+import cobra_wrapper.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0010_cobraknockout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cobrafva',
+            name='chunk_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cobrafva',
+            name='finished_chunks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cobrafva',
+            name='partial_result',
+            field=models.TextField(blank=True, validators=[cobra_wrapper.models.validate_json_str_or_blank_str]),
+        ),
+    ]
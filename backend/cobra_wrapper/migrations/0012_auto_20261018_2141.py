@@ -0,0 +1,66 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0011_auto_20261018_2137'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CobraIdVector',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveIntegerField()),
+                ('ids', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'id vector',
+            },
+        ),
+        migrations.AddField(
+            model_name='cobrafba',
+            name='packed_result',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cobrafva',
+            name='packed_result',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cobrargefba',
+            name='packed_result',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cobrafba',
+            name='metabolite_ids',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cobra_wrapper.CobraIdVector'),
+        ),
+        migrations.AddField(
+            model_name='cobrafba',
+            name='reaction_ids',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cobra_wrapper.CobraIdVector'),
+        ),
+        migrations.AddField(
+            model_name='cobrafva',
+            name='reaction_ids',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cobra_wrapper.CobraIdVector'),
+        ),
+        migrations.AddField(
+            model_name='cobrargefba',
+            name='metabolite_ids',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cobra_wrapper.CobraIdVector'),
+        ),
+        migrations.AddField(
+            model_name='cobrargefba',
+            name='reaction_ids',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cobra_wrapper.CobraIdVector'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:04
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_components(apps, schema_editor):
+    CobraModel = apps.get_model('cobra_wrapper', 'CobraModel')
+    CobraModelComponent = apps.get_model('cobra_wrapper', 'CobraModelComponent')
+    for model in CobraModel.objects.only('pk', 'reactions', 'metabolites', 'genes').iterator():
+        components = {}
+        for kind, field in [('reaction', 'reactions'), ('metabolite', 'metabolites'), ('gene', 'genes')]:
+            for component in json.loads(getattr(model, field) or '[]'):
+                components[(kind, component['cobra_id'])] = component['name']
+        CobraModelComponent.objects.bulk_create([
+            CobraModelComponent(model_id=model.pk, kind=kind, cobra_id=cobra_id, name=name)
+            for (kind, cobra_id), name in components.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0012_auto_20261018_2141'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CobraModelComponent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reaction', 'reaction'), ('metabolite', 'metabolite'), ('gene', 'gene')], max_length=15)),
+                ('cobra_id', models.CharField(max_length=600)),
+                ('name', models.TextField(blank=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='cobra_wrapper.CobraModel')),
+            ],
+            options={
+                'verbose_name': 'model_component',
+                'unique_together': {('model', 'kind', 'cobra_id')},
+            },
+        ),
+        migrations.RunPython(fill_components, migrations.RunPython.noop),
+    ]
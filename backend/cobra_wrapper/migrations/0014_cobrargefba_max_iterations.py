@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:13
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0013_cobramodelcomponent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cobrargefba',
+            name='max_iterations',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(50)]),
+        ),
+    ]
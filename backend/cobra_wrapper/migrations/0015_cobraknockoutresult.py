@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:30
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_results(apps, schema_editor):
+    CobraKnockout = apps.get_model('cobra_wrapper', 'CobraKnockout')
+    CobraKnockoutResult = apps.get_model('cobra_wrapper', 'CobraKnockoutResult')
+    for knockout in CobraKnockout.objects.filter(ok=True).iterator():
+        result = json.loads(knockout.result)
+        CobraKnockoutResult.objects.bulk_create([
+            CobraKnockoutResult(knockout_id=knockout.pk, gene_set=gene_set, objective_value=objective_value,
+                                status=status)
+            for gene_set, objective_value, status in zip(result.pop('gene_sets', []),
+                                                          result.pop('objective_values', []),
+                                                          result.pop('statuses', []))
+        ], batch_size=1000)
+        CobraKnockout.objects.filter(pk=knockout.pk).update(result=json.dumps(result))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0014_cobrargefba_max_iterations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CobraKnockoutResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gene_set', models.TextField()),
+                ('objective_value', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('knockout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gene_set_results', to='cobra_wrapper.CobraKnockout')),
+            ],
+            options={
+                'verbose_name': 'knockout_result',
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.RunPython(split_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cobra_wrapper', '0015_cobraknockoutresult'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='cobramodel',
+            name='genes',
+        ),
+        migrations.RemoveField(
+            model_name='cobramodel',
+            name='metabolites',
+        ),
+        migrations.RemoveField(
+            model_name='cobramodel',
+            name='reactions',
+        ),
+    ]
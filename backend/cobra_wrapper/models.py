@@ -1,24 +1,28 @@
+import hashlib
 import json
+import re
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.shortcuts import reverse
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
 import cobra
 
-from .utils import load_sbml, dump_sbml, restore_reaction_by_json
+from .utils import load_sbml, dump_sbml, load_binary, dump_binary, restore_reaction_by_json, pack_floats, \
+    unpack_floats
 
 
 class CobraModel(models.Model):
     sbml_content = models.TextField()
+    # Pickled cobra model generated from sbml_content, which is much faster to load than SBML
+    binary_content = models.BinaryField(blank=True, null=True)
     name = models.CharField(max_length=200)
     desc = models.CharField(max_length=200, blank=True)
 
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     created_time = models.DateTimeField(auto_now_add=True)
-    reactions = models.TextField(blank=True)
-    metabolites = models.TextField(blank=True)
-    genes = models.TextField(blank=True)
 
     class Meta:
         verbose_name = 'model'
@@ -30,18 +34,126 @@ class CobraModel(models.Model):
     def get_absolute_url(self):
         return reverse('cobra_wrapper:cobramodel_detail', kwargs={'pk': self.pk})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields are not read here, which would cost a query per row.
+        # A deferred binary_content was saved with the loaded sbml_content, build() falls back to SBML otherwise
+        if 'sbml_content' in field_names and ('binary_content' not in field_names or instance.binary_content):
+            instance._binary_sbml_content = instance.sbml_content
+        return instance
+
+    def save(self, *args, **kwargs):
+        # sbml_content may be assigned directly, so regenerate binary_content if they are out of sync.
+        # A deferred sbml_content is not saved, so it stays in sync
+        if 'sbml_content' not in self.get_deferred_fields() and \
+                getattr(self, '_binary_sbml_content', None) != self.sbml_content:
+            self.binary_content = dump_binary(load_sbml(self.sbml_content))
+            self._binary_sbml_content = self.sbml_content
+        super().save(*args, **kwargs)
+
+    def update_sbml(self, cobra_model: cobra.Model):
+        """Set the model content from a changed cobra model without parsing the dumped SBML again"""
+        self.sbml_content = dump_sbml(cobra_model)
+        self.binary_content = dump_binary(cobra_model)
+        self._binary_sbml_content = self.sbml_content
+
     def build(self):
-        cobra_model: cobra.Model = load_sbml(self.sbml_content)
+        cobra_model = None
+        if self.binary_content:
+            try:
+                cobra_model = load_binary(self.binary_content)
+            except Exception:
+                # Pickles may be broken by cobra upgrades, SBML is always the source
+                pass
+        if cobra_model is None:
+            cobra_model = load_sbml(self.sbml_content)
+            self.binary_content = dump_binary(cobra_model)
+            self._binary_sbml_content = self.sbml_content
+            if self.pk is not None:
+                CobraModel.objects.filter(pk=self.pk).update(binary_content=self.binary_content)
         cobra_model.name = self.name
         return cobra_model
 
     def cache(self, cobra_model: cobra.Model):
-        self.reactions = json.dumps([{'cobra_id': reaction.id, 'name': reaction.name}
-                                     for reaction in cobra_model.reactions])
-        self.metabolites = json.dumps([{'cobra_id': metabolite.id, 'name': metabolite.name}
-                                       for metabolite in cobra_model.metabolites])
-        self.genes = json.dumps([{'cobra_id': gene.id, 'name': gene.name} for gene in cobra_model.genes])
-        self.save()
+        """Rebuild the component table from the whole model"""
+        component_lists = {
+            'reaction': cobra_model.reactions,
+            'metabolite': cobra_model.metabolites,
+            'gene': cobra_model.genes,
+        }
+        with transaction.atomic():
+            self.components.all().delete()
+            CobraModelComponent.objects.bulk_create([
+                CobraModelComponent(model=self, kind=kind, cobra_id=component.id, name=component.name)
+                for kind, components in component_lists.items() for component in components
+            ])
+
+    def patch_cache(self, cobra_model: cobra.Model, added_reactions: Iterable[cobra.Reaction] = (),
+                    removed_reaction_ids: Iterable[str] = ()):
+        """
+        Apply added and removed reactions to the component table, instead of rebuilding it.
+        Metabolites and genes of removed reactions stay in the model, as cobra keeps them by default.
+        """
+        if not self.components.exists():
+            self.cache(cobra_model)
+            return
+        added_reactions = list(added_reactions)
+        removed_reaction_ids = set(removed_reaction_ids)
+        added_components = {
+            'reaction': added_reactions,
+            'metabolite': list({metabolite.id: metabolite for reaction in added_reactions
+                                for metabolite in reaction.metabolites}.values()),
+            'gene': list({gene.id: gene for reaction in added_reactions for gene in reaction.genes}.values()),
+        }
+        for kind in COMPONENT_KINDS:
+            known_ids = set(self.components.filter(
+                kind=kind, cobra_id__in=[component.id for component in added_components[kind]],
+            ).values_list('cobra_id', flat=True))
+            if kind == 'reaction':
+                known_ids -= removed_reaction_ids
+            added_components[kind] = [component for component in added_components[kind]
+                                      if component.id not in known_ids]
+
+        with transaction.atomic():
+            if removed_reaction_ids:
+                self.components.filter(kind='reaction', cobra_id__in=removed_reaction_ids).delete()
+            CobraModelComponent.objects.bulk_create([
+                CobraModelComponent(model=self, kind=kind, cobra_id=component.id, name=component.name)
+                for kind, components in added_components.items() for component in components
+            ])
+
+    def get_components(self, kind: str, prefix: str = ''):
+        """
+        Components of the kind ordered by cobra id, which is the order of the (model, kind, cobra_id) index.
+        Cobra ids are case-sensitive, so is the prefix. startswith is case-insensitive on SQLite, regex is
+        case-sensitive on every backend.
+        """
+        components = self.components.filter(kind=kind).order_by('cobra_id')
+        if prefix:
+            components = components.filter(cobra_id__regex='^' + re.escape(prefix))
+        return components
+
+    def get_missing_components(self, kind: str, cobra_ids: Iterable[str]) -> List[str]:
+        """The ids in cobra_ids which are not ids of a component of the kind in the model"""
+        cobra_ids = list(cobra_ids)
+        known_ids = set(self.components.filter(kind=kind, cobra_id__in=cobra_ids).values_list('cobra_id', flat=True))
+        return [cobra_id for cobra_id in cobra_ids if cobra_id not in known_ids]
+
+
+COMPONENT_KINDS = ['reaction', 'metabolite', 'gene']
+
+
+class CobraModelComponent(models.Model):
+    """Reactions, metabolites and genes of a model, indexed by their cobra ids"""
+    model = models.ForeignKey(CobraModel, on_delete=models.CASCADE, related_name='components')
+    kind = models.CharField(max_length=15, choices=[(kind, kind) for kind in COMPONENT_KINDS])
+    cobra_id = models.CharField(max_length=600)
+    name = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'model_component'
+        unique_together = ('model', 'kind', 'cobra_id')
 
 
 def validate_json_str_or_blank_str(value):
@@ -52,7 +164,87 @@ def validate_json_str_or_blank_str(value):
             raise ValidationError('%(value)s is neither a blank str nor a json str', params={'value': value})
 
 
-class CobraFba(models.Model):
+class CobraIdVector(models.Model):
+    """
+    Ordered reaction or metabolite ids of a model. Every result computed on the same model shares one vector,
+    and keeps its values packed in the same order.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    size = models.PositiveIntegerField()
+    ids = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = 'id vector'
+
+    def __str__(self):
+        return '{}[{}]'.format(self.digest[:8], self.size)
+
+    @classmethod
+    def get_or_create_by_ids(cls, ids: List[str]) -> 'CobraIdVector':
+        content = '\n'.join(ids)
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return cls.objects.get_or_create(digest=digest, defaults={'size': len(ids), 'ids': content})[0]
+
+    def get_ids(self) -> List[str]:
+        if not hasattr(self, '_ids'):
+            self._ids = self.ids.split('\n') if self.size else []
+        return self._ids
+
+    def get_positions(self, ids: List[str]) -> List[Tuple[str, int]]:
+        """Positions of the given ids in the vector, ids which are not in the vector are skipped"""
+        if not hasattr(self, '_index'):
+            self._index = {cobra_id: position for position, cobra_id in enumerate(self.get_ids())}
+        return [(cobra_id, self._index[cobra_id]) for cobra_id in ids if cobra_id in self._index]
+
+
+class PackedResultMixin:
+    """
+    Stores the per reaction and per metabolite columns of a result as packed doubles in packed_result, in the
+    order of the id vectors of the model, instead of one json object per item in result.
+    PACKED_COLUMNS lists (column name, id vector field) pairs in the order they are packed.
+    """
+    PACKED_COLUMNS = []
+
+    def pack_result(self, dict_result: Dict[str, Any]):
+        """Move the columns and the ids out of a result sent by a worker, what remains is saved as json"""
+        packed_content = []
+        for column_name, id_field in self.PACKED_COLUMNS:
+            if id_field in dict_result:
+                setattr(self, id_field, CobraIdVector.get_or_create_by_ids(dict_result.pop(id_field)))
+            packed_content.append(pack_floats(dict_result.pop(column_name)))
+        self.packed_result = b''.join(packed_content)
+
+    def get_column(self, column_name: str, ids: Optional[List[str]] = None) -> List[Tuple[str, Optional[float]]]:
+        """
+        (id, value) pairs of a column, only the requested part of packed_result is unpacked.
+        ids selects the items by id, which only applies to columns of reactions.
+        """
+        content = bytes(self.packed_result)
+        offset = 0
+        for name, id_field in self.PACKED_COLUMNS:
+            id_vector = getattr(self, id_field)
+            if name == column_name:
+                if ids is not None and id_field == 'reaction_ids':
+                    return [(cobra_id, unpack_floats(content, offset + position, 1)[0])
+                            for cobra_id, position in id_vector.get_positions(ids)]
+                return list(zip(id_vector.get_ids(), unpack_floats(content, offset, id_vector.size)))
+            offset += id_vector.size
+        raise KeyError(column_name)
+
+    def get_result(self, reaction_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """The result in the json form sent by workers, reaction_ids selects part of the reactions"""
+        result = json.loads(self.result)
+        if self.packed_result is not None:
+            for column_name, _ in self.PACKED_COLUMNS:
+                result[column_name] = [{'name': name, 'value': value}
+                                       for name, value in self.get_column(column_name, reaction_ids)]
+        return result
+
+
+class CobraFba(PackedResultMixin, models.Model):
+    PACKED_COLUMNS = [('fluxes', 'reaction_ids'), ('reduced_costs', 'reaction_ids'),
+                      ('shadow_prices', 'metabolite_ids')]
+
     desc = models.CharField(max_length=600, blank=True)
     deleted_genes = models.TextField(blank=True)
 
@@ -61,6 +253,11 @@ class CobraFba(models.Model):
     task_id = models.UUIDField(null=True, blank=True, default=None)
     result = models.TextField(blank=True, validators=[validate_json_str_or_blank_str])
     ok = models.BooleanField(default=False)
+    reaction_ids = models.ForeignKey(CobraIdVector, on_delete=models.PROTECT, null=True, blank=True,
+                                     related_name='+')
+    metabolite_ids = models.ForeignKey(CobraIdVector, on_delete=models.PROTECT, null=True, blank=True,
+                                       related_name='+')
+    packed_result = models.BinaryField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'fba'
@@ -73,15 +270,30 @@ class CobraFba(models.Model):
         return reverse('cobra_wrapper:cobrafba_detail', kwargs={'model_pk': self.model.pk, 'pk': self.pk})
 
 
-class CobraRgeFba(models.Model):
+MAX_REGULATION_ITERATIONS = 50
+
+
+class CobraRgeFba(PackedResultMixin, models.Model):
+    PACKED_COLUMNS = [('fluxes', 'reaction_ids'), ('reduced_costs', 'reaction_ids'),
+                      ('shadow_prices', 'metabolite_ids')]
+
     desc = models.CharField(max_length=600, blank=True)
     deleted_genes = models.TextField(blank=True)
+    # Regulation passes, each of which knocks out the genes failing their rules and optimizes again,
+    # the passes stop early once the knocked out genes stop changing
+    max_iterations = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1), MaxValueValidator(MAX_REGULATION_ITERATIONS)])
 
     model = models.ForeignKey(CobraModel, on_delete=models.CASCADE, related_name='rgefba_list')
     start_time = models.DateTimeField(auto_now_add=True)
     task_id = models.UUIDField(null=True, blank=True, default=None)
     result = models.TextField(blank=True, validators=[validate_json_str_or_blank_str])
     ok = models.BooleanField(default=False)
+    reaction_ids = models.ForeignKey(CobraIdVector, on_delete=models.PROTECT, null=True, blank=True,
+                                     related_name='+')
+    metabolite_ids = models.ForeignKey(CobraIdVector, on_delete=models.PROTECT, null=True, blank=True,
+                                       related_name='+')
+    packed_result = models.BinaryField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'rge_fba'
@@ -94,7 +306,9 @@ class CobraRgeFba(models.Model):
         return reverse('cobra_wrapper:cobrargefba_detail', kwargs={'model_pk': self.model.pk, 'pk': self.pk})
 
 
-class CobraFva(models.Model):
+class CobraFva(PackedResultMixin, models.Model):
+    PACKED_COLUMNS = [('minimum', 'reaction_ids'), ('maximum', 'reaction_ids')]
+
     desc = models.CharField(max_length=600, blank=True)
     reaction_list = models.TextField()
     loopless = models.BooleanField(default=False)
@@ -107,6 +321,13 @@ class CobraFva(models.Model):
     task_id = models.UUIDField(null=True, blank=True, default=None)
     result = models.TextField(blank=True, validators=[validate_json_str_or_blank_str])
     ok = models.BooleanField(default=False)
+    reaction_ids = models.ForeignKey(CobraIdVector, on_delete=models.PROTECT, null=True, blank=True,
+                                     related_name='+')
+    packed_result = models.BinaryField(null=True, blank=True)
+    # Large FVA is solved in chunks, whose results are kept here by chunk index until all of them finish
+    chunk_count = models.PositiveIntegerField(default=0)
+    finished_chunks = models.PositiveIntegerField(default=0)
+    partial_result = models.TextField(blank=True, validators=[validate_json_str_or_blank_str])
 
     class Meta:
         verbose_name = 'fva'
@@ -118,6 +339,87 @@ class CobraFva(models.Model):
     def get_absolute_url(self):
         return reverse('cobra_wrapper:cobrafva_detail', kwargs={'model_pk': self.model.pk, 'pk': self.pk})
 
+    def get_result(self, reaction_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        result = json.loads(self.result)
+        if self.packed_result is not None:
+            result['components'] = [
+                {'name': name, 'minimum': minimum, 'maximum': maximum}
+                for (name, minimum), (_, maximum) in zip(self.get_column('minimum', reaction_ids),
+                                                         self.get_column('maximum', reaction_ids))
+            ]
+        return result
+
+
+# Most gene sets of one knockout screen, double mode screens grow with the square of the gene count
+MAX_KNOCKOUT_GENE_SETS = 10000
+
+
+class CobraKnockout(models.Model):
+    desc = models.CharField(max_length=600, blank=True)
+    mode = models.CharField(max_length=10, default='custom', choices=[
+        ('custom', 'custom'),
+        ('single', 'single'),
+        ('double', 'double'),
+    ])
+    # Used in custom mode. Sets are separated by semicolons and genes in a set are separated by commas
+    gene_sets = models.TextField(blank=True)
+
+    model = models.ForeignKey(CobraModel, on_delete=models.CASCADE, related_name='knockout_list')
+    start_time = models.DateTimeField(auto_now_add=True)
+    task_id = models.UUIDField(null=True, blank=True, default=None)
+    result = models.TextField(blank=True, validators=[validate_json_str_or_blank_str])
+    ok = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'knockout'
+        ordering = ['-start_time']
+
+    def __str__(self):
+        return '{}[knockout]'.format(self.desc)
+
+    def get_absolute_url(self):
+        return reverse('cobra_wrapper:cobraknockout_detail', kwargs={'model_pk': self.model.pk, 'pk': self.pk})
+
+    def save_gene_set_results(self, dict_result: Dict[str, Any]):
+        """Move the result columns sent by workers into one CobraKnockoutResult row per gene set"""
+        gene_sets = dict_result.pop('gene_sets')
+        objective_values = dict_result.pop('objective_values')
+        statuses = dict_result.pop('statuses')
+        self.gene_set_results.all().delete()
+        CobraKnockoutResult.objects.bulk_create([
+            CobraKnockoutResult(knockout=self, gene_set=gene_set, objective_value=objective_value, status=status)
+            for gene_set, objective_value, status in zip(gene_sets, objective_values, statuses)
+        ], batch_size=1000)
+
+    def get_result(self, reaction_ids: Optional[List[str]] = None,
+                   gene_set_results: Optional[Iterable[Tuple[str, Optional[float], str]]] = None) -> Dict[str, Any]:
+        """
+        The result in the json form sent by workers. gene_set_results selects part of the rows as
+        (gene_set, objective_value, status) tuples, all the rows are used by default.
+        """
+        result = json.loads(self.result)
+        if result.get('ok'):
+            if gene_set_results is None:
+                gene_set_results = self.gene_set_results.values_list('gene_set', 'objective_value', 'status')
+            gene_set_results = list(gene_set_results)
+            result['gene_sets'] = [row[0] for row in gene_set_results]
+            result['objective_values'] = [row[1] for row in gene_set_results]
+            result['statuses'] = [row[2] for row in gene_set_results]
+        return result
+
+
+class CobraKnockoutResult(models.Model):
+    """Objective value of a knockout screen with one gene set knocked out, in the order of the screen"""
+    knockout = models.ForeignKey(CobraKnockout, on_delete=models.CASCADE, related_name='gene_set_results')
+    # Genes separated by commas
+    gene_set = models.TextField()
+    objective_value = models.FloatField(null=True, blank=True)
+    status = models.CharField(max_length=50, blank=True)
+
+    class Meta:
+        verbose_name = 'knockout_result'
+        ordering = ['pk']
+
 
 class CobraModelChange(models.Model):
     change_type = models.CharField(max_length=50, choices=[
@@ -156,8 +458,9 @@ class CobraModelChange(models.Model):
             elif change.change_type == 'del_reaction':
                 reactions = [restore_reaction_by_json(cobra_model, info) for info in reaction_info['reactions']]
                 cobra_model.add_reactions(reactions)
-        new_model = CobraModel.objects.create(name=name, desc=desc, sbml_content=dump_sbml(cobra_model),
-                                              owner=self.model.owner)
+        new_model = CobraModel(name=name, desc=desc, owner=self.model.owner)
+        new_model.update_sbml(cobra_model)
+        new_model.save()
         new_model.cache(cobra_model)
         return new_model
 
@@ -167,4 +470,4 @@ class CobraBiobrick(models.Model):
     cobra_model = models.ForeignKey(CobraModel, on_delete=models.CASCADE)
 
     class Meta:
-        verbose_name = 'model_biobrick'
\ No newline at end of file
+        verbose_name = 'model_biobrick'
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import cobra
+
+from .utils import load_sbml, read_model_blob
+
+
+class ModelCache:
+    """
+    LRU cache of parsed cobra models keyed by the digest of their SBML content.
+    On a miss the SBML is read from the model blob store shared with the web side, which names every blob
+    by its digest.
+    Models are handed out live with their solver, instead of copies whose solver problems are built again,
+    so the runs on the same model start from the basis of the previous run. A task has the model to itself
+    while using it, and changes made inside the model context, such as knockouts, are reverted afterwards.
+    Changes made by other means would leak into later tasks.
+    """
+
+    def __init__(self, store_dir: str, max_size: int = 8):
+        self.store_dir = store_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()  # digest -> (model, lock)
+        self._lock = threading.Lock()
+
+    def get_entry(self, digest: str):
+        with self._lock:
+            entry = self._models.get(digest)
+            if entry is not None:
+                self._models.move_to_end(digest)
+                self.hits += 1
+                return entry
+        # Parse outside the lock, parsing a genome-scale model takes seconds
+        cobra_model = load_sbml(read_model_blob(self.store_dir, digest))
+        with self._lock:
+            self.misses += 1
+            entry = self._models.setdefault(digest, (cobra_model, threading.Lock()))
+            self._models.move_to_end(digest)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+        return entry
+
+    @contextmanager
+    def use(self, digest: str) -> Iterator[cobra.Model]:
+        cobra_model, model_lock = self.get_entry(digest)
+        with model_lock:
+            try:
+                with cobra_model:
+                    yield cobra_model
+            except BaseException:
+                # The solver may be left in any state, the next task parses the model again
+                self.evict(digest)
+                raise
+
+    def evict(self, digest: str):
+        with self._lock:
+            self._models.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._models),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -21,6 +21,10 @@ task_routes = {
         'queue': 'cobra_feeds',
         'routing_key': 'cobra_feed.rge_fba',
     },
+    'cobra_wrapper.tasks.cobra_rge_fba_save': {
+        'queue': 'cobra_results',
+        'routing_key': 'cobra_result.rge_fba',
+    },
     'cobra_computation.tasks.cobra_fva': {
         'queue': 'cobra_feeds',
         'routing_key': 'cobra_feed.fva',
@@ -29,6 +33,26 @@ task_routes = {
         'queue': 'cobra_results',
         'routing_key': 'cobra_result.fva',
     },
+    'cobra_computation.tasks.cobra_fva_chunk': {
+        'queue': 'cobra_feeds',
+        'routing_key': 'cobra_feed.fva_chunk',
+    },
+    'cobra_wrapper.tasks.cobra_fva_chunk_save': {
+        'queue': 'cobra_results',
+        'routing_key': 'cobra_result.fva_chunk',
+    },
+    'cobra_computation.tasks.cobra_knockout': {
+        'queue': 'cobra_feeds',
+        'routing_key': 'cobra_feed.knockout',
+    },
+    'cobra_wrapper.tasks.cobra_knockout_save': {
+        'queue': 'cobra_results',
+        'routing_key': 'cobra_result.knockout',
+    },
+    'cobra_computation.tasks.cobra_model_cache_stats': {
+        'queue': 'cobra_feeds',
+        'routing_key': 'cobra_feed.cache_stats',
+    },
 }
 task_queues = (
     Queue('default', routing_key='task.#'),
@@ -39,6 +63,15 @@ task_default_exchange = 'tasks'
 task_default_exchange_type = 'topic'
 task_default_routing_key = 'task.default'
 task_ignore_result = True
+# Worker processes solving tasks, defaults to the number of CPUs
+worker_concurrency = int(os.environ.get("COBRA_WORKER_CONCURRENCY") or 0)
+# FVA with more reactions than this is split into chunks solved in parallel by worker processes
+fva_chunk_size = int(os.environ.get("COBRA_FVA_CHUNK_SIZE") or 200)
+# Max number of parsed models kept by each worker process
+model_cache_size = int(os.environ.get("COBRA_MODEL_CACHE_SIZE") or 8)
+# Model blob store shared with the web side, SBML is sent by its digest instead of its content
+model_store_dir = os.environ.get("COBRA_MODEL_STORE_DIR") or \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'model_store')
 # task_annotations = {
 #     'cobra_computation.tasks.cobra_fba': {
 #         'rate_limit': '10/s'
@@ -0,0 +1,33 @@
+"""
+Evaluation of the regulation rules sent with regulated FBA tasks.
+The web side compiles every rule into a json program of postfix instructions whose gene literals are already
+resolved, e.g. [['const', True], ['less_than', 'glc__D_c'], ['and']], so only the shadow prices are needed here.
+"""
+from typing import Any, Dict, List
+
+from .rule_operators import BINARY_OPERATOR_FUNCS
+
+
+def evaluate_program(program: List[List[Any]], shadow_prices: Dict[str, float]) -> bool:
+    stack = []
+    for instruction in program:
+        name = instruction[0]
+        if name == 'const':
+            stack.append(bool(instruction[1]))
+        elif name in ('less_than', 'more_than'):
+            shadow_price = shadow_prices.get(instruction[1])
+            # Metabolites without a shadow price satisfy neither kind
+            stack.append(False if shadow_price is None else
+                         shadow_price < 0 if name == 'less_than' else shadow_price > 0)
+        elif name == 'not':
+            stack.append(not stack.pop())
+        else:
+            right, left = stack.pop(), stack.pop()
+            stack.append(BINARY_OPERATOR_FUNCS[name](left, right))
+    return stack[0]
+
+
+def get_regulated_genes(regulations: Dict[str, List[List[Any]]], shadow_prices: Dict[str, float]) -> List[str]:
+    """Ids of the genes whose rules are not satisfied by the shadow prices, which are knocked out"""
+    return sorted(gene_id for gene_id, program in regulations.items()
+                  if not evaluate_program(program, shadow_prices))
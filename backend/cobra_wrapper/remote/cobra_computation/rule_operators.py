@@ -0,0 +1,15 @@
+"""
+Boolean operators of the regulation rules, by the names used in compiled rule programs.
+The module has no dependencies, so the web side imports it from here as well as the workers, which are
+deployed without Django and tt.
+"""
+
+BINARY_OPERATOR_FUNCS = {
+    'and': lambda a, b: a and b,
+    'or': lambda a, b: a or b,
+    'xor': lambda a, b: a != b,
+    'xnor': lambda a, b: a == b,
+    'impl': lambda a, b: not a or b,
+    'nand': lambda a, b: not (a and b),
+    'nor': lambda a, b: not (a or b),
+}
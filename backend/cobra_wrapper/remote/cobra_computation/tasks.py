@@ -1,4 +1,6 @@
+import itertools
 import json
+import math
 from typing import Dict, Any, Optional
 
 import cobra.manipulation
@@ -6,7 +8,10 @@ import cobra.exceptions
 from cobra.flux_analysis import flux_variability_analysis
 
 from .celery import app
-from .utils import load_sbml
+from .cache import ModelCache
+from .regulation import get_regulated_genes
+
+model_cache = ModelCache(app.conf.model_store_dir, app.conf.get('model_cache_size', 8))
 
 
 def get_result_kwargs(computation_type: str, pk: int, dict_result: Optional[Dict[str, Any]] = None,
@@ -37,51 +42,213 @@ def report_cobra_computation_error(error: Exception) -> Dict[str, Any]:
     }
 
 
+def knock_out_genes(cobra_model: cobra.Model, gene_ids):
+    # Knockouts are made in the model context which is reverted after the task, the cached model stays intact
+    if len(gene_ids) > 0:
+        cobra.manipulation.knock_out_model_genes(cobra_model, gene_ids)
+
+
 @app.task
-def cobra_fba(pk, model_sbml, deleted_genes, computation_type, task_id=None):
-    cobra_model = load_sbml(model_sbml)
-    if len(deleted_genes) > 0:
-        cobra.manipulation.delete_model_genes(cobra_model, deleted_genes, cumulative_deletions=True)
+def cobra_fba(pk, model_digest, deleted_genes, computation_type, task_id=None):
     try:
-        result_object = cobra_model.optimize()
+        # A missing model blob and unknown genes raise here and are reported like the solver errors
+        with model_cache.use(model_digest) as cobra_model:
+            knock_out_genes(cobra_model, deleted_genes)
+            result_object = cobra_model.optimize()
     except Exception as error:
         error_result = report_cobra_computation_error(error)
         app.send_task(**get_result_kwargs('fba', pk, error_result, is_error=True))
         return
-    result = {
-        'objective_value': result_object.objective_value, 'status': result_object.status,
-        'fluxes': [{'name': name, 'value': value} for name, value in result_object.fluxes.to_dict().items()],
-        'reduced_costs': [{'name': name, 'value': value}
-                          for name, value in result_object.reduced_costs.to_dict().items()],
-        'shadow_prices': [{'name': name, 'value': value}
-                          for name, value in result_object.shadow_prices.to_dict().items()],
-    }
-    result_kwargs = get_result_kwargs('fba', pk, result)
+    result_kwargs = get_result_kwargs('fba', pk, get_fba_result(result_object))
     result_kwargs['kwargs']['computation_type'] = computation_type
     if task_id:
         result_kwargs['kwargs']['task_id'] = task_id
     app.send_task(**result_kwargs)
 
 
+def get_fba_result(result_object: cobra.Solution) -> Dict[str, Any]:
+    # Values are sent by column in the order of the ids, the web side packs them against shared id vectors
+    return {
+        'objective_value': result_object.objective_value, 'status': result_object.status,
+        'reaction_ids': result_object.fluxes.index.tolist(),
+        'metabolite_ids': result_object.shadow_prices.index.tolist(),
+        'fluxes': result_object.fluxes.tolist(),
+        'reduced_costs': result_object.reduced_costs.tolist(),
+        'shadow_prices': result_object.shadow_prices.tolist(),
+    }
+
+
 @app.task
-def cobra_fva(pk, model_sbml, reaction_list, loopless, fraction_of_optimum, pfba_factor, deleted_genes):
-    cobra_model = load_sbml(model_sbml)
-    if len(deleted_genes) > 0:
-        cobra.manipulation.delete_model_genes(cobra_model, deleted_genes, cumulative_deletions=True)
+def cobra_rge_fba(pk, model_digest, deleted_genes, regulations, max_iterations=1):
+    """
+    FBA, then up to max_iterations regulation passes on the same model. Each pass knocks out the genes whose
+    regulation rules are not satisfied by the shadow prices of the last optimization and optimizes again,
+    until the knocked out genes are the same as in the last pass.
+    The knockouts of a pass are reverted before the next one, the solver is kept, so every optimization
+    starts from the basis of the previous one.
+    """
     try:
-        result_frame = json.loads(flux_variability_analysis(
-            cobra_model, reaction_list, loopless, fraction_of_optimum, pfba_factor).to_json())
-        result = {
-            'components': [
-                {
-                    'name': name,
-                    'minimum': result_frame['minimum'][name],
-                    'maximum': result_frame['maximum'][name],
-                } for name in result_frame['minimum'].keys()
-            ],
-        }
+        with model_cache.use(model_digest) as cobra_model:
+            knock_out_genes(cobra_model, deleted_genes)
+            result_object = cobra_model.optimize()
+            regulated_genes = []
+            trajectory = [get_regulation_step(result_object, regulated_genes)]
+            converged = False
+            for iteration in range(max_iterations + 1):
+                next_regulated_genes = [gene_id for gene_id in get_regulated_genes(
+                    regulations, result_object.shadow_prices.to_dict()) if cobra_model.genes.has_id(gene_id)]
+                if next_regulated_genes == regulated_genes:
+                    converged = True
+                    break
+                if iteration == max_iterations:
+                    break
+                regulated_genes = next_regulated_genes
+                with cobra_model:
+                    knock_out_genes(cobra_model, regulated_genes)
+                    result_object = cobra_model.optimize()
+                trajectory.append(get_regulation_step(result_object, regulated_genes))
     except Exception as error:
         error_result = report_cobra_computation_error(error)
-        app.send_task(**get_result_kwargs('fba', pk, error_result, is_error=True))
+        app.send_task(**get_result_kwargs('rge_fba', pk, error_result, is_error=True))
+        return
+    result = get_fba_result(result_object)
+    result.update({
+        'regulated_genes': regulated_genes,
+        'converged': converged,
+        'trajectory': trajectory,
+    })
+    app.send_task(**get_result_kwargs('rge_fba', pk, result))
+
+
+def get_regulation_step(result_object: cobra.Solution, regulated_genes) -> Dict[str, Any]:
+    return {
+        'objective_value': result_object.objective_value,
+        'status': result_object.status,
+        'regulated_genes': regulated_genes,
+    }
+
+
+def get_fva_columns(cobra_model: cobra.Model, reaction_list, loopless, fraction_of_optimum, pfba_factor):
+    # Worker processes are daemonic and can not start a process pool, parallelism comes from chunk tasks instead
+    result_frame = flux_variability_analysis(
+        cobra_model, reaction_list, loopless, fraction_of_optimum, pfba_factor, processes=1)
+    return {
+        'reaction_ids': result_frame.index.tolist(),
+        'minimum': result_frame['minimum'].tolist(),
+        'maximum': result_frame['maximum'].tolist(),
+    }
+
+
+@app.task
+def cobra_fva(pk, model_digest, reaction_list, loopless, fraction_of_optimum, pfba_factor, deleted_genes):
+    if not reaction_list:
+        try:
+            with model_cache.use(model_digest) as cobra_model:
+                reaction_list = [reaction.id for reaction in cobra_model.reactions]
+        except Exception as error:
+            error_result = report_cobra_computation_error(error)
+            app.send_task(**get_result_kwargs('fva', pk, error_result, is_error=True))
+            return
+    chunk_size = app.conf.get('fva_chunk_size', 200)
+    if len(reaction_list) > chunk_size:
+        # Split into chunk tasks which are solved by all the worker processes, and merged by the web side
+        chunks = [reaction_list[i:i + chunk_size] for i in range(0, len(reaction_list), chunk_size)]
+        for chunk_index, chunk in enumerate(chunks):
+            app.send_task(
+                'cobra_computation.tasks.cobra_fva_chunk',
+                kwargs={
+                    'pk': pk,
+                    'model_digest': model_digest,
+                    'reaction_list': chunk,
+                    'loopless': loopless,
+                    'fraction_of_optimum': fraction_of_optimum,
+                    'pfba_factor': pfba_factor,
+                    'deleted_genes': deleted_genes,
+                    'task_id': app.current_task.request.id,
+                    'chunk_index': chunk_index,
+                    'chunk_count': len(chunks),
+                },
+                queue='cobra_feeds',
+                routing_key='cobra_feed.fva_chunk',
+            )
+        return
+    try:
+        with model_cache.use(model_digest) as cobra_model:
+            knock_out_genes(cobra_model, deleted_genes)
+            result = get_fva_columns(cobra_model, reaction_list, loopless, fraction_of_optimum, pfba_factor)
+    except Exception as error:
+        error_result = report_cobra_computation_error(error)
+        app.send_task(**get_result_kwargs('fva', pk, error_result, is_error=True))
         return
     app.send_task(**get_result_kwargs('fva', pk, result))
+
+
+@app.task
+def cobra_fva_chunk(pk, model_digest, reaction_list, loopless, fraction_of_optimum, pfba_factor, deleted_genes,
+                    task_id, chunk_index, chunk_count):
+    try:
+        with model_cache.use(model_digest) as cobra_model:
+            knock_out_genes(cobra_model, deleted_genes)
+            result = get_fva_columns(cobra_model, reaction_list, loopless, fraction_of_optimum, pfba_factor)
+        result_kwargs = get_result_kwargs('fva_chunk', pk, result)
+    except Exception as error:
+        error_result = report_cobra_computation_error(error)
+        result_kwargs = get_result_kwargs('fva_chunk', pk, error_result, is_error=True)
+    result_kwargs['kwargs'].update({
+        'task_id': task_id,
+        'chunk_index': chunk_index,
+        'chunk_count': chunk_count,
+    })
+    app.send_task(**result_kwargs)
+
+
+@app.task
+def cobra_knockout(pk, model_digest, mode, gene_sets, max_gene_sets=10000):
+    try:
+        with model_cache.use(model_digest) as cobra_model:
+            gene_count = len(cobra_model.genes)
+            gene_set_count = {'single': gene_count, 'double': gene_count * (gene_count - 1) // 2}.get(
+                mode, len(gene_sets))
+            if gene_set_count > max_gene_sets:
+                # Checked before the gene sets are made, double mode of a genome-scale model has millions of them
+                error_result = {
+                    'error': 'The screen has {} gene sets, more than the limit of {}'.format(
+                        gene_set_count, max_gene_sets),
+                    'kwargs': {'error_name': 'TooManyGeneSets'},
+                }
+                app.send_task(**get_result_kwargs('knockout', pk, error_result, is_error=True))
+                return
+            if mode == 'single':
+                gene_sets = [[gene.id] for gene in cobra_model.genes]
+            elif mode == 'double':
+                gene_sets = [list(genes)
+                             for genes in itertools.combinations([gene.id for gene in cobra_model.genes], 2)]
+            objective_value = cobra_model.slim_optimize()
+            objective_values = []
+            statuses = []
+            # The same solver is kept for all the gene sets and knockouts are reverted when leaving the context,
+            # so every optimization starts from the basis of the previous one
+            for gene_set in gene_sets:
+                with cobra_model:
+                    knock_out_genes(cobra_model, gene_set)
+                    value = cobra_model.slim_optimize(error_value=float('nan'))
+                    statuses.append(cobra_model.solver.status)
+                objective_values.append(None if math.isnan(value) else value)
+    except Exception as error:
+        error_result = report_cobra_computation_error(error)
+        app.send_task(**get_result_kwargs('knockout', pk, error_result, is_error=True))
+        return
+    # Results are sent by column to keep large screens compact, the web side stores a row per gene set
+    result = {
+        'objective_value': objective_value,
+        'gene_sets': [','.join(gene_set) for gene_set in gene_sets],
+        'objective_values': objective_values,
+        'statuses': statuses,
+    }
+    app.send_task(**get_result_kwargs('knockout', pk, result))
+
+
+@app.task(ignore_result=False)
+def cobra_model_cache_stats():
+    """Hit and miss counters of the worker process which receives the task, used to size the cache"""
+    return model_cache.stats()
@@ -1,7 +1,18 @@
 import io
+import os
+
 import cobra
 
 
 def load_sbml(sbml_content: str) -> cobra.Model:
     sbml_file = io.StringIO(sbml_content)
     return cobra.io.read_sbml_model(sbml_file)
+
+
+def get_model_blob_path(store_dir: str, digest: str) -> str:
+    return os.path.join(store_dir, digest[:2], digest + '.xml')
+
+
+def read_model_blob(store_dir: str, digest: str) -> str:
+    with open(get_model_blob_path(store_dir, digest), 'r', encoding='utf-8') as blob_file:
+        return blob_file.read()
@@ -2,7 +2,7 @@ from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 from celery.result import AsyncResult
 
-from cobra_wrapper.models import CobraFba, CobraFva
+from cobra_wrapper.models import CobraFba, CobraFva, CobraKnockout
 
 from backend.celery import app
 
@@ -21,3 +21,11 @@ def revoke_cobra_fva(sender, **kwargs):
     if instance.task_id:
         result = AsyncResult(instance.task_id, app=app)
         result.revoke()
+
+
+@receiver(pre_delete, sender=CobraKnockout)
+def revoke_cobra_knockout(sender, **kwargs):
+    instance = kwargs['instance']
+    if instance.task_id:
+        result = AsyncResult(instance.task_id, app=app)
+        result.revoke()
@@ -1,23 +1,26 @@
 import json
 
 from celery import shared_task
+from django.db import transaction
 
 from . import models
-from regulation.tasks import gene_regulation
 
 
 def get_object_or_none(model_class, pk):
     try:
         return model_class.objects.get(pk=pk)
-    except models.CobraFba.DoesNotExist:
+    except model_class.DoesNotExist:
         return None
 
 
 def save_result(instance, result, task_id):
     if instance is None or str(instance.task_id) != task_id:
         return
-    instance.result = result
-    instance.ok = json.loads(result)['ok']
+    dict_result = json.loads(result)
+    if dict_result['ok'] and isinstance(instance, models.PackedResultMixin):
+        instance.pack_result(dict_result)
+    instance.result = json.dumps(dict_result)
+    instance.ok = dict_result['ok']
     instance.task_id = None
     instance.full_clean()
     instance.save()
@@ -25,22 +28,7 @@ def save_result(instance, result, task_id):
 
 @shared_task
 def cobra_fba_save(pk, result, task_id, computation_type):
-    if computation_type == 'normal':
-        save_result(get_object_or_none(models.CobraFba, pk), result, task_id)
-    elif computation_type == 'regular':
-        instance = get_object_or_none(models.CobraRgeFba, pk)
-        if instance is None:
-            return
-        gene_regulation.delay(**{
-            'pk': pk,
-            'task_id': task_id,
-            'model_pk': instance.model.pk,
-            'shadow_prices': {
-                shadow_price['name']: shadow_price['value'] for shadow_price in json.loads(result)['shadow_prices']
-            },
-        })
-    elif computation_type == 'regular_again':
-        save_result(get_object_or_none(models.CobraRgeFba, pk), result, task_id)
+    save_result(get_object_or_none(models.CobraFba, pk), result, task_id)
 
 
 @shared_task
@@ -51,3 +39,43 @@ def cobra_rge_fba_save(pk, result, task_id):
 @shared_task
 def cobra_fva_save(pk, result, task_id):
     save_result(get_object_or_none(models.CobraFva, pk), result, task_id)
+
+
+@shared_task
+def cobra_fva_chunk_save(pk, result, task_id, chunk_index, chunk_count):
+    with transaction.atomic():
+        instance = models.CobraFva.objects.select_for_update().filter(pk=pk).first()
+        if instance is None or str(instance.task_id) != task_id:
+            return
+        chunk_result = json.loads(result)
+        if not chunk_result['ok']:
+            instance.partial_result = ''
+            save_result(instance, result, task_id)
+            return
+        chunks = json.loads(instance.partial_result) if instance.partial_result else {}
+        chunks[str(chunk_index)] = chunk_result
+        instance.chunk_count = chunk_count
+        instance.finished_chunks = len(chunks)
+        if instance.finished_chunks < chunk_count:
+            instance.partial_result = json.dumps(chunks)
+            instance.save()
+            return
+        instance.partial_result = ''
+        merged_result = {
+            column: [item for index in range(chunk_count) for item in chunks[str(index)][column]]
+            for column in ('reaction_ids', 'minimum', 'maximum')
+        }
+        merged_result['ok'] = True
+        save_result(instance, json.dumps(merged_result), task_id)
+
+
+@shared_task
+def cobra_knockout_save(pk, result, task_id):
+    instance = get_object_or_none(models.CobraKnockout, pk)
+    if instance is None or str(instance.task_id) != task_id:
+        return
+    dict_result = json.loads(result)
+    with transaction.atomic():
+        if dict_result['ok']:
+            instance.save_gene_set_results(dict_result)
+        save_result(instance, json.dumps(dict_result), task_id)
@@ -13,6 +13,8 @@ def check_result_status(fva_obj):
     if fva_obj.result:
         return 'OK'
     elif fva_obj.task_id:
+        if getattr(fva_obj, 'chunk_count', 0):
+            return 'Processing ({}/{})'.format(fva_obj.finished_chunks, fva_obj.chunk_count)
         return 'Processing'
     else:
         return 'Failed'
@@ -1,10 +1,21 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-import cobra.test
-
-from .models import CobraModel, CobraFba
-from .utils import dump_sbml
+import importlib
+import json
+import os
+import sys
+import tempfile
+import uuid
+from unittest import mock
+
+import cobra.io
+
+from . import models
+from .models import CobraModel, CobraFba, CobraFva, CobraIdVector, CobraKnockout, MAX_REGULATION_ITERATIONS
+from .forms import CobraKnockoutForm, CobraModelReactionCreateForm, CobraModelReactionDeleteForm, CobraRgeFbaForm
+from .tasks import cobra_fva_chunk_save, cobra_fba_save, cobra_knockout_save
+from .utils import clean_model_store, dump_sbml, store_sbml
 
 from backend.celery import app
 
@@ -13,7 +24,7 @@ class CobraWrapperViewTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='test', password='test123456')
         self.model = CobraModel.objects.create(name='example',
-                                               sbml_content=dump_sbml(cobra.test.create_test_model()), owner=self.user)
+                                               sbml_content=dump_sbml(cobra.io.load_model('textbook')), owner=self.user)
         self.client.login(username='test', password='test123456')
 
     def test_models_list(self):
@@ -258,3 +269,460 @@ class CobraWrapperViewTests(TestCase):
 
         response = self.client.post('/cobra/models/1/fva/1/delete/')
         self.assertRedirects(response, '/cobra/models/1/fva/')
+
+
+class CobraModelBinaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        self.cobra_model = cobra.io.load_model('textbook')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(self.cobra_model),
+                                               owner=self.user)
+
+    def test_binary_generated_on_create(self):
+        model = CobraModel.objects.get(pk=self.model.pk)
+        self.assertTrue(model.binary_content)
+        cobra_model = model.build()
+        self.assertEqual(cobra_model.name, 'example')
+        self.assertEqual([reaction.id for reaction in cobra_model.reactions],
+                         [reaction.id for reaction in self.cobra_model.reactions])
+
+    def test_binary_regenerated_on_sbml_change(self):
+        self.cobra_model.remove_reactions([self.cobra_model.reactions[0]])
+        model = CobraModel.objects.get(pk=self.model.pk)
+        model.sbml_content = dump_sbml(self.cobra_model)
+        model.save()
+        model = CobraModel.objects.get(pk=self.model.pk)
+        self.assertEqual(len(model.build().reactions), len(self.cobra_model.reactions))
+
+    def test_deferred_content(self):
+        with self.assertNumQueries(1):
+            models = list(CobraModel.objects.only('pk', 'name'))
+        with self.assertNumQueries(1):
+            models[0].name = 'renamed'
+            models[0].save()
+        self.assertEqual(CobraModel.objects.get(pk=self.model.pk).name, 'renamed')
+        model = CobraModel.objects.defer('binary_content').get(pk=self.model.pk)
+        with self.assertNumQueries(1):
+            model.save()
+
+    def test_build_fallback_to_sbml(self):
+        CobraModel.objects.filter(pk=self.model.pk).update(binary_content=b'broken')
+        model = CobraModel.objects.get(pk=self.model.pk)
+        self.assertEqual(len(model.build().reactions), len(self.cobra_model.reactions))
+        self.assertNotEqual(bytes(CobraModel.objects.get(pk=self.model.pk).binary_content), b'broken')
+
+
+class CobraKnockoutFormTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        cobra_model = cobra.io.load_model('textbook')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(cobra_model), owner=self.user)
+        self.model.cache(cobra_model)
+        self.gene_ids = [gene.id for gene in cobra_model.genes]
+
+    def get_form(self, data):
+        form = CobraKnockoutForm(data)
+        form.model_object = self.model
+        return form
+
+    def test_custom_gene_sets(self):
+        form = self.get_form({'desc': 'test', 'mode': 'custom',
+                              'gene_sets': ' {}, {} ;{}; '.format(*self.gene_ids[:3])})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['gene_sets'], '{},{};{}'.format(*self.gene_ids[:3]))
+
+    def test_custom_gene_sets_not_in_model(self):
+        form = self.get_form({'desc': 'test', 'mode': 'custom', 'gene_sets': 'not_a_gene'})
+        self.assertFalse(form.is_valid())
+        form = self.get_form({'desc': 'test', 'mode': 'custom', 'gene_sets': ''})
+        self.assertFalse(form.is_valid())
+
+    def test_gene_sets_ignored_in_single_mode(self):
+        form = self.get_form({'desc': 'test', 'mode': 'single', 'gene_sets': 'not_a_gene'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['gene_sets'], '')
+
+    def test_gene_set_limit(self):
+        gene_count = len(self.gene_ids)
+        with mock.patch.object(models, 'MAX_KNOCKOUT_GENE_SETS', gene_count):
+            self.assertTrue(self.get_form({'desc': 'test', 'mode': 'single'}).is_valid())
+            self.assertFalse(self.get_form({'desc': 'test', 'mode': 'double'}).is_valid())
+        with mock.patch.object(models, 'MAX_KNOCKOUT_GENE_SETS', 1):
+            self.assertFalse(self.get_form({'desc': 'test', 'mode': 'custom',
+                                            'gene_sets': '{};{}'.format(*self.gene_ids[:2])}).is_valid())
+
+
+class CobraRgeFbaFormTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        cobra_model = cobra.io.load_model('textbook')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(cobra_model), owner=self.user)
+        self.model.cache(cobra_model)
+
+    def get_form(self, data):
+        form = CobraRgeFbaForm(data)
+        form.model_object = self.model
+        return form
+
+    def test_max_iterations(self):
+        self.assertTrue(self.get_form({'desc': 'test', 'deleted_genes': '', 'max_iterations': 10}).is_valid())
+        self.assertFalse(self.get_form({'desc': 'test', 'deleted_genes': '', 'max_iterations': 0}).is_valid())
+        self.assertFalse(self.get_form({'desc': 'test', 'deleted_genes': '',
+                                        'max_iterations': MAX_REGULATION_ITERATIONS + 1}).is_valid())
+
+
+class CobraModelCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        cobra_model = cobra.io.load_model('textbook')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(cobra_model), owner=self.user)
+        self.model.cache(cobra_model)
+
+    def get_cached(self, model):
+        return [(component.kind, component.cobra_id, component.name) for component in model.components.all()]
+
+    def assert_same_as_rebuilt(self):
+        model = CobraModel.objects.get(pk=self.model.pk)
+        patched = self.get_cached(model)
+        model.cache(model.build())
+        self.assertCountEqual(patched, self.get_cached(model))
+
+    def test_delete_reactions(self):
+        form = CobraModelReactionDeleteForm({'deleted_reaction_id': 'PGI,PFK', 'change_type': 'del_reaction'})
+        form.model_object = self.model
+        self.assertTrue(form.is_valid())
+        form.save(self.model)
+        self.assertEqual(self.model.get_missing_components('reaction', ['PGI', 'PFK', 'PGK']), ['PGI', 'PFK'])
+        self.assert_same_as_rebuilt()
+
+        form = CobraModelReactionDeleteForm({'deleted_reaction_id': 'PGI', 'change_type': 'del_reaction'})
+        form.model_object = self.model
+        self.assertFalse(form.is_valid())
+
+    def test_add_reaction(self):
+        form = CobraModelReactionCreateForm({
+            'cobra_id': 'NEW_RXN', 'name': 'New reaction', 'subsystem': 'test', 'lower_bound': 0,
+            'upper_bound': 1000, 'reaction_str': 'glc__D_c + new_met_c --> g6p_c', 'gene_reaction_rule': 'b0001',
+            'change_type': 'add_reaction',
+        })
+        self.assertTrue(form.is_valid())
+        form.save(self.model)
+        self.assertFalse(self.model.get_missing_components('metabolite', ['new_met_c', 'g6p_c']))
+        self.assertFalse(self.model.get_missing_components('gene', ['b0001']))
+        self.assert_same_as_rebuilt()
+
+
+class CobraModelComponentViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        self.cobra_model = cobra.io.load_model('textbook')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(self.cobra_model),
+                                               owner=self.user)
+        self.model.cache(self.cobra_model)
+        self.client.login(username='test', password='test123456')
+
+    def test_detail_pages(self):
+        reaction_ids = sorted(reaction.id for reaction in self.cobra_model.reactions)
+        response = self.client.get('/cobra/models/{}/'.format(self.model.pk))
+        self.assertEqual([reaction.cobra_id for reaction in response.context['reactions']], reaction_ids[:100])
+        self.assertEqual(response.context['reaction_page'].paginator.count, len(reaction_ids))
+        self.assertEqual(response.context['metabolite_count'], len(self.cobra_model.metabolites))
+        self.assertEqual(response.context['gene_count'], len(self.cobra_model.genes))
+
+    def test_component_list_json(self):
+        response = self.client.get('/cobra/models/{}/components/reaction/json/'.format(self.model.pk),
+                                   {'q': 'PG'})
+        content = json.loads(response.content)
+        expected_ids = sorted(reaction.id for reaction in self.cobra_model.reactions if reaction.id.startswith('PG'))
+        self.assertEqual(content['count'], len(expected_ids))
+        self.assertEqual([component['cobra_id'] for component in content['results']], expected_ids)
+
+        response = self.client.get('/cobra/models/{}/components/reaction/json/'.format(self.model.pk),
+                                   {'q': 'pg'})
+        self.assertEqual(json.loads(response.content)['count'],
+                         len([reaction for reaction in self.cobra_model.reactions if reaction.id.startswith('pg')]))
+
+        response = self.client.get('/cobra/models/{}/components/gene/json/'.format(self.model.pk), {'page': 2})
+        content = json.loads(response.content)
+        self.assertEqual(content['page'], 2)
+        self.assertEqual(len(content['results']), min(len(self.cobra_model.genes) - 100, 100))
+
+        response = self.client.get('/cobra/models/{}/components/compartment/json/'.format(self.model.pk))
+        self.assertEqual(response.status_code, 404)
+
+
+class CobraFvaChunkSaveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(cobra.io.load_model('textbook')),
+                                          owner=self.user)
+        self.task_id = str(uuid.uuid4())
+        self.fva = CobraFva.objects.create(desc='test', reaction_list='a,b,c,d,e', model=model, task_id=self.task_id)
+
+    def save_chunk(self, chunk_index, names, ok=True):
+        result = {'reaction_ids': names, 'minimum': [0.0] * len(names), 'maximum': [1.0] * len(names), 'ok': ok}
+        cobra_fva_chunk_save(self.fva.pk, json.dumps(result), self.task_id, chunk_index, 3)
+        return CobraFva.objects.get(pk=self.fva.pk)
+
+    def test_merge_in_chunk_order(self):
+        fva = self.save_chunk(2, ['e'])
+        self.assertEqual((fva.finished_chunks, fva.chunk_count, fva.result), (1, 3, ''))
+        self.save_chunk(0, ['a', 'b'])
+        fva = self.save_chunk(1, ['c', 'd'])
+        self.assertTrue(fva.ok)
+        self.assertIsNone(fva.task_id)
+        self.assertEqual(fva.partial_result, '')
+        self.assertEqual([component['name'] for component in fva.get_result()['components']],
+                         ['a', 'b', 'c', 'd', 'e'])
+
+    def test_failed_chunk(self):
+        self.save_chunk(0, ['a'])
+        fva = self.save_chunk(1, [], ok=False)
+        self.assertFalse(fva.ok)
+        self.assertIsNone(fva.task_id)
+        fva = self.save_chunk(2, ['e'])
+        self.assertEqual(fva.finished_chunks, 1)
+
+
+class CobraPackedResultTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(
+            cobra.io.load_model('textbook')), owner=self.user)
+        self.result = {
+            'objective_value': 1.0, 'status': 'optimal',
+            'reaction_ids': ['PFK', 'PGI', 'FBA'], 'metabolite_ids': ['atp_c', 'h2o_c'],
+            'fluxes': [1.0, 2.0, float('nan')], 'reduced_costs': [0.0, 0.5, 0.0], 'shadow_prices': [-1.0, 0.25],
+            'ok': True,
+        }
+
+    def save_fba(self):
+        task_id = str(uuid.uuid4())
+        fba = CobraFba.objects.create(desc='test', model=self.model, task_id=task_id)
+        cobra_fba_save(fba.pk, json.dumps(self.result), task_id, 'normal')
+        return CobraFba.objects.get(pk=fba.pk)
+
+    def test_result_json_form(self):
+        fba = self.save_fba()
+        self.assertTrue(fba.ok)
+        self.assertNotIn('fluxes', json.loads(fba.result))
+        result = fba.get_result()
+        self.assertEqual(result['objective_value'], 1.0)
+        self.assertEqual(result['fluxes'], [{'name': 'PFK', 'value': 1.0}, {'name': 'PGI', 'value': 2.0},
+                                            {'name': 'FBA', 'value': None}])
+        self.assertEqual(result['shadow_prices'], [{'name': 'atp_c', 'value': -1.0}, {'name': 'h2o_c', 'value': 0.25}])
+
+    def test_slice_by_reaction_ids(self):
+        result = self.save_fba().get_result(['PGI', 'missing'])
+        self.assertEqual(result['fluxes'], [{'name': 'PGI', 'value': 2.0}])
+        self.assertEqual(result['reduced_costs'], [{'name': 'PGI', 'value': 0.5}])
+        self.assertEqual(len(result['shadow_prices']), 2)
+
+    def test_id_vectors_are_shared(self):
+        first = self.save_fba()
+        second = self.save_fba()
+        self.assertEqual(first.reaction_ids_id, second.reaction_ids_id)
+        self.assertEqual(first.metabolite_ids_id, second.metabolite_ids_id)
+        self.assertEqual(CobraIdVector.objects.count(), 2)
+
+
+class CobraKnockoutResultTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(
+            cobra.io.load_model('textbook')), owner=self.user)
+        self.task_id = str(uuid.uuid4())
+        self.knockout = CobraKnockout.objects.create(desc='test', mode='single', model=self.model,
+                                                     task_id=self.task_id)
+        gene_sets = ['g{}'.format(i) for i in range(150)]
+        cobra_knockout_save(self.knockout.pk, json.dumps({
+            'objective_value': 1.0, 'gene_sets': gene_sets, 'objective_values': [0.5] * 149 + [None],
+            'statuses': ['optimal'] * 149 + ['infeasible'], 'ok': True,
+        }), self.task_id)
+
+    def test_one_row_per_gene_set(self):
+        knockout = CobraKnockout.objects.get(pk=self.knockout.pk)
+        self.assertTrue(knockout.ok)
+        self.assertEqual(json.loads(knockout.result), {'objective_value': 1.0, 'ok': True})
+        self.assertEqual(knockout.gene_set_results.count(), 150)
+        result = knockout.get_result()
+        self.assertEqual(result['gene_sets'][:2], ['g0', 'g1'])
+        self.assertEqual((result['objective_values'][-1], result['statuses'][-1]), (None, 'infeasible'))
+
+    def test_json_pages(self):
+        self.client.login(username='test', password='test123456')
+        response = self.client.get('/cobra/models/{}/knockout/{}/json/'.format(self.model.pk, self.knockout.pk),
+                                   {'page': 2})
+        content = json.loads(response.content)
+        self.assertEqual((content['count'], content['num_pages'], content['page']), (150, 2, 2))
+        self.assertEqual(content['results'][0]['gene_sets'], ['g{}'.format(i) for i in range(100, 150)])
+        self.assertEqual(content['results'][0]['objective_value'], 1.0)
+
+
+class CobraModelStoreTests(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        user = User.objects.create_user(username='test', password='test123456')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(
+            cobra.io.load_model('textbook')), owner=user)
+
+    def test_clean_unused_blobs(self):
+        with self.settings(COBRA_MODEL_STORE_DIR=self.temp_dir.name):
+            used_digest = store_sbml(self.model.sbml_content)
+            unused_digest = store_sbml(dump_sbml(cobra.Model('unused')))
+            self.assertEqual(clean_model_store(3600), [])
+            deleted_paths = clean_model_store(0)
+        self.assertEqual([os.path.basename(path) for path in deleted_paths], [unused_digest + '.xml'])
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir.name, used_digest[:2], used_digest + '.xml')))
+
+
+def import_computation_tasks():
+    # The worker runs from cobra_wrapper/remote and imports itself as the top-level cobra_computation package
+    remote_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'remote')
+    if remote_dir not in sys.path:
+        sys.path.append(remote_dir)
+    return importlib.import_module('cobra_computation.tasks')
+
+
+class CobraComputationTests(SimpleTestCase):
+    def setUp(self):
+        self.tasks = import_computation_tasks()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.model_cache = self.tasks.ModelCache(self.temp_dir.name, 2)
+        self.send_task = mock.MagicMock()
+        for patcher in [mock.patch.object(self.tasks, 'model_cache', self.model_cache),
+                        mock.patch.object(self.tasks.app, 'send_task', self.send_task)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with self.settings(COBRA_MODEL_STORE_DIR=self.temp_dir.name):
+            self.digest = store_sbml(dump_sbml(cobra.io.load_model('textbook')))
+
+    def get_sent_results(self):
+        return [json.loads(call[1]['kwargs']['result']) for call in self.send_task.call_args_list]
+
+    def test_missing_model_blob(self):
+        computation_kwargs = {
+            'cobra_fba': {'deleted_genes': [], 'computation_type': 'fba'},
+            'cobra_rge_fba': {'deleted_genes': [], 'regulations': []},
+            'cobra_fva': {'reaction_list': [], 'loopless': False, 'fraction_of_optimum': 1.0, 'pfba_factor': None,
+                          'deleted_genes': []},
+            'cobra_fva_chunk': {'reaction_list': ['PGI'], 'loopless': False, 'fraction_of_optimum': 1.0,
+                                'pfba_factor': None, 'deleted_genes': [], 'task_id': 'fva', 'chunk_index': 0,
+                                'chunk_count': 1},
+            'cobra_knockout': {'mode': 'single', 'gene_sets': []},
+        }
+        for task_name, kwargs in computation_kwargs.items():
+            with self.subTest(task_name):
+                self.send_task.reset_mock()
+                getattr(self.tasks, task_name).apply(kwargs=dict(pk=1, model_digest='0' * 64, **kwargs))
+                # The row is saved as failed instead of staying in processing
+                self.assertEqual(self.send_task.call_args[1]['name'],
+                                 'cobra_wrapper.tasks.{}_save'.format(task_name))
+                result, = self.get_sent_results()
+                self.assertFalse(result['ok'])
+
+    def test_model_cache_lru(self):
+        with self.settings(COBRA_MODEL_STORE_DIR=self.temp_dir.name):
+            other_digests = [store_sbml(dump_sbml(cobra.Model(name))) for name in ['a', 'b']]
+        model = self.model_cache.get_entry(self.digest)[0]
+        self.model_cache.get_entry(other_digests[0])
+        # A hit makes the model the most recently used one, so the other one is evicted when the cache is full
+        self.assertIs(self.model_cache.get_entry(self.digest)[0], model)
+        self.model_cache.get_entry(other_digests[1])
+        self.assertEqual(self.model_cache.stats(), {'size': 2, 'max_size': 2, 'hits': 1, 'misses': 3})
+        self.model_cache.get_entry(other_digests[0])
+        self.assertEqual(self.model_cache.stats()['misses'], 4)
+
+    def test_model_cache_evicts_on_error(self):
+        with self.model_cache.use(self.digest) as cobra_model:
+            model = cobra_model
+        with self.assertRaises(ValueError):
+            with self.model_cache.use(self.digest) as cobra_model:
+                self.assertIs(cobra_model, model)
+                raise ValueError
+        with self.model_cache.use(self.digest) as cobra_model:
+            self.assertIsNot(cobra_model, model)
+        self.assertEqual(self.model_cache.stats()['misses'], 2)
+
+    def run_fva(self, chunk_size):
+        self.send_task.reset_mock()
+        self.tasks.app.conf.fva_chunk_size = chunk_size
+        self.tasks.cobra_fva.apply(kwargs=dict(pk=1, model_digest=self.digest, reaction_list=[], loopless=False,
+                                               fraction_of_optimum=0.9, pfba_factor=None, deleted_genes=[]))
+        chunk_calls = [call for call in self.send_task.call_args_list
+                       if call[0] == ('cobra_computation.tasks.cobra_fva_chunk',)]
+        for call in chunk_calls:
+            self.tasks.cobra_fva_chunk.apply(kwargs=call[1]['kwargs'])
+        results = [(call[1]['kwargs'].get('chunk_index', 0), json.loads(call[1]['kwargs']['result']))
+                   for call in self.send_task.call_args_list if call[1].get('name')]
+        return len(chunk_calls), [result for _, result in sorted(results, key=lambda item: item[0])]
+
+    def test_fva_chunks(self):
+        self.addCleanup(setattr, self.tasks.app.conf, 'fva_chunk_size', self.tasks.app.conf.fva_chunk_size)
+        chunk_count, results = self.run_fva(30)
+        self.assertEqual(chunk_count, 4)
+        self.assertTrue(all(result['ok'] for result in results))
+        self.assertEqual([len(result['reaction_ids']) for result in results], [30, 30, 30, 5])
+        _, (single_result,) = self.run_fva(200)
+        # The chunks merged in chunk order are the FVA of a single task
+        for column in ['reaction_ids', 'minimum', 'maximum']:
+            merged = [value for result in results for value in result[column]]
+            if column == 'reaction_ids':
+                self.assertEqual(merged, single_result[column])
+            else:
+                for merged_value, value in zip(merged, single_result[column]):
+                    self.assertAlmostEqual(merged_value, value, places=6)
+
+    def run_rge_fba(self, regulations, max_iterations):
+        self.send_task.reset_mock()
+        self.tasks.cobra_rge_fba.apply(kwargs=dict(pk=1, model_digest=self.digest, deleted_genes=[],
+                                                   regulations=regulations, max_iterations=max_iterations))
+        result, = self.get_sent_results()
+        return result
+
+    def test_rge_fba_converges(self):
+        result = self.run_rge_fba({'b4025': [['const', False]], 'b1779': [['const', True]]}, MAX_REGULATION_ITERATIONS)
+        self.assertTrue(result['converged'])
+        self.assertEqual(result['regulated_genes'], ['b4025'])
+        self.assertEqual([step['regulated_genes'] for step in result['trajectory']], [[], ['b4025']])
+        # The last pass is the FBA of the model with the regulated genes knocked out
+        model = cobra.io.load_model('textbook')
+        model.genes.b4025.knock_out()
+        self.assertAlmostEqual(result['objective_value'], model.slim_optimize(), places=6)
+
+        result = self.run_rge_fba({'b4025': [['const', True]]}, MAX_REGULATION_ITERATIONS)
+        self.assertTrue(result['converged'])
+        self.assertEqual((result['regulated_genes'], len(result['trajectory'])), ([], 1))
+
+    def test_rge_fba_stops_at_max_iterations(self):
+        result = self.run_rge_fba({'b4025': [['const', False]]}, 0)
+        self.assertFalse(result['converged'])
+        self.assertEqual((result['regulated_genes'], len(result['trajectory'])), ([], 1))
+
+        # Rules which flip with the shadow prices of the last pass never reach a fixed point
+        with mock.patch.object(self.tasks, 'get_regulated_genes', side_effect=[['b4025'], []] * 2):
+            result = self.run_rge_fba({}, 3)
+        self.assertFalse(result['converged'])
+        self.assertEqual([step['regulated_genes'] for step in result['trajectory']], [[], ['b4025'], [], ['b4025']])
+
+    def test_model_reused_between_tasks(self):
+        fba_kwargs = dict(pk=1, model_digest=self.digest, computation_type='normal')
+        self.tasks.cobra_fba.apply(kwargs=dict(deleted_genes=['b4025'], **fba_kwargs))
+        self.tasks.cobra_knockout.apply(kwargs=dict(pk=1, model_digest=self.digest, mode='custom',
+                                                    gene_sets=[['b1779'], ['b4025', 'b1241']]))
+        self.tasks.cobra_fba.apply(kwargs=dict(deleted_genes=[], **fba_kwargs))
+        fba_result, knockout_result, unchanged_result = self.get_sent_results()
+        self.assertEqual(self.model_cache.stats()['misses'], 1)
+
+        model = cobra.io.load_model('textbook')
+        # Knockouts of the earlier tasks are reverted, the cached model is the same as a parsed one
+        self.assertAlmostEqual(unchanged_result['objective_value'], model.slim_optimize(), places=6)
+        self.assertAlmostEqual(knockout_result['objective_value'], model.slim_optimize(), places=6)
+        with self.model_cache.use(self.digest) as cobra_model:
+            self.assertEqual([reaction.bounds for reaction in cobra_model.reactions],
+                             [reaction.bounds for reaction in model.reactions])
+        model.genes.b4025.knock_out()
+        self.assertAlmostEqual(fba_result['objective_value'], model.slim_optimize(), places=6)
+        self.assertAlmostEqual(knockout_result['objective_values'][1], model.slim_optimize(), places=6)
@@ -8,6 +8,8 @@ urlpatterns = [
     path('models/<int:pk>/', views.CobraModelDetailView.as_view(), name='cobramodel_detail'),
     path('models/<int:pk>/map/', views.CobraModelMapView.as_view(), name='cobramodel_map'),
     path('models/<int:pk>/json/', api_views.CobraModelDetailJsonView.as_view(), name='cobramodel_detail_json'),
+    path('models/<int:pk>/components/<str:kind>/json/', api_views.CobraModelComponentListJsonView.as_view(),
+         name='cobramodel_component_list_json'),
     path('models/create/', views.CobraModelCreateView.as_view(), name='cobramodel_create_form'),
     path('models/<int:pk>/delete/', views.CobraModelDeleteView.as_view(), name='cobramodel_confirm_delete'),
     path('models/<int:pk>/update/', views.CobraModelUpdateView.as_view(), name='cobramodel_update_form'),
@@ -39,4 +41,14 @@ urlpatterns = [
     path('models/<int:model_pk>/fva/create/', views.CobraFvaCreateView.as_view(), name='cobrafva_create_form'),
     path('models/<int:model_pk>/fva/<int:pk>/delete/', views.CobraFvaDeleteView.as_view(),
          name='cobrafva_confirm_delete'),
+
+    path('models/<int:model_pk>/knockout/', views.CobraKnockoutListView.as_view(), name='cobraknockout_list'),
+    path('models/<int:model_pk>/knockout/<int:pk>/', views.CobraKnockoutDetailView.as_view(),
+         name='cobraknockout_detail'),
+    path('models/<int:model_pk>/knockout/<int:pk>/json/', api_views.CobraKnockoutDetailJsonView.as_view(),
+         name='cobraknockout_detail_json'),
+    path('models/<int:model_pk>/knockout/create/', views.CobraKnockoutCreateView.as_view(),
+         name='cobraknockout_create_form'),
+    path('models/<int:model_pk>/knockout/<int:pk>/delete/', views.CobraKnockoutDeleteView.as_view(),
+         name='cobraknockout_confirm_delete'),
 ]
@@ -1,7 +1,14 @@
+import hashlib
 import io
+import os
+import pickle
 import re
-from typing import List, Dict, Any
+import struct
+import tempfile
+import time
+from typing import List, Dict, Any, Iterable, Optional
 
+from django.conf import settings
 import cobra
 from cobra.core.reaction import _forward_arrow_finder, _reverse_arrow_finder, _reversible_arrow_finder, \
     compartment_finder
@@ -19,6 +26,66 @@ def dump_sbml(cobra_model: cobra.Model) -> str:
     return sbml_file.read()
 
 
+def dump_binary(cobra_model: cobra.Model) -> bytes:
+    return pickle.dumps(cobra_model, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_binary(binary_content: bytes) -> cobra.Model:
+    return pickle.loads(binary_content)
+
+
+def store_sbml(sbml_content: str) -> str:
+    """Save SBML to the model blob store shared with computation workers and return its digest"""
+    digest = hashlib.sha256(sbml_content.encode('utf-8')).hexdigest()
+    blob_dir = os.path.join(settings.COBRA_MODEL_STORE_DIR, digest[:2])
+    blob_path = os.path.join(blob_dir, digest + '.xml')
+    if not os.path.isfile(blob_path):
+        os.makedirs(blob_dir, exist_ok=True)
+        # Write to a uniquely named temp file first so that workers never read a partial blob,
+        # and threads or hosts storing the same blob do not write to the same file
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=blob_dir, suffix='.tmp',
+                                         delete=False) as blob_file:
+            blob_file.write(sbml_content)
+        os.replace(blob_file.name, blob_path)
+    else:
+        # Blobs are cleaned by age, a blob sent again is as young as a new one
+        os.utime(blob_path)
+    return digest
+
+
+def clean_model_store(min_age: float) -> List[str]:
+    """
+    Delete the blobs which are not the SBML of any model and were not touched for min_age seconds,
+    returns their paths. Young blobs are kept, they may be sent with computations which are still queued.
+    """
+    from .models import CobraModel
+    used_digests = {hashlib.sha256(sbml_content.encode('utf-8')).hexdigest()
+                    for sbml_content in CobraModel.objects.values_list('sbml_content', flat=True).iterator()}
+    deleted_paths = []
+    now = time.time()
+    for dir_path, _, file_names in os.walk(settings.COBRA_MODEL_STORE_DIR):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            digest = file_name.split('.')[0]
+            if digest in used_digests or now - os.path.getmtime(path) < min_age:
+                continue
+            os.remove(path)
+            deleted_paths.append(path)
+    return deleted_paths
+
+
+def pack_floats(values: Iterable[Optional[float]]) -> bytes:
+    """Pack values to little-endian doubles, None is packed as nan"""
+    values = [float('nan') if value is None else value for value in values]
+    return struct.pack('<{}d'.format(len(values)), *values)
+
+
+def unpack_floats(content: bytes, offset: int, count: int) -> List[Optional[float]]:
+    """Unpack count doubles starting from the offset-th one, nan is unpacked as None"""
+    values = struct.unpack_from('<{}d'.format(count), content, offset * 8)
+    return [None if value != value else value for value in values]
+
+
 def get_reaction_json(reaction: cobra.Reaction) -> Dict[str, Any]:
     return {
         'cobra_id': reaction.id,
@@ -57,6 +124,15 @@ def load_comma_separated_str(value: str) -> List[str]:
     return value.split(',') if value else []
 
 
+def clean_gene_sets_str(form, value: str) -> str:
+    gene_sets = [clean_comma_separated_str(form, gene_set) for gene_set in value.split(';')]
+    return ';'.join([gene_set for gene_set in gene_sets if gene_set])
+
+
+def load_gene_sets_str(value: str) -> List[List[str]]:
+    return [gene_set.split(',') for gene_set in value.split(';')] if value else []
+
+
 COENZYME_PREFIXES = ['nadn', 'nad', 'nadph', 'nadp', 'atp', 'fmn', 'fmnh2', 'fad', 'fadh2']
 
 
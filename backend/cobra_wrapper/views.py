@@ -1,5 +1,3 @@
-import json
-
 from django.shortcuts import get_object_or_404, reverse, Http404, redirect
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, TemplateView, FormView, View
@@ -7,11 +5,13 @@ from django.views.generic.edit import DeletionMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.forms import Form
 from django.utils import timezone
+from django.core.paginator import Paginator
 
 from . import models, forms
-from .utils import load_comma_separated_str
+from .utils import load_comma_separated_str, load_gene_sets_str, store_sbml
 
 from backend.celery import app
+from regulation.tasks import get_regulation_programs
 
 
 class CobraModelListView(LoginRequiredMixin, ListView):
@@ -25,6 +25,8 @@ class CobraModelListView(LoginRequiredMixin, ListView):
 
 
 class CobraModelDetailView(LoginRequiredMixin, DetailView):
+    reaction_paginate_by = 100
+
     def get_object(self, queryset=None):
         return get_object_or_404(models.CobraModel, owner=self.request.user, pk=self.kwargs['pk'])
 
@@ -34,7 +36,10 @@ class CobraModelDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context_data = super().get_context_data()
         context_data['forms'] = self.get_update_forms()
-        context_data['reactions'] = json.loads(self.object.reactions)
+        reaction_page = Paginator(self.object.get_components('reaction'), self.reaction_paginate_by).get_page(
+            self.request.GET.get('page'))
+        context_data['reaction_page'] = reaction_page
+        context_data['reactions'] = reaction_page.object_list
 
         def form_mount_reaction_id(cobra_id: str) -> forms.CobraModelReactionUpdateBoundForm:
             form = forms.CobraModelReactionUpdateBoundForm()
@@ -44,8 +49,8 @@ class CobraModelDetailView(LoginRequiredMixin, DetailView):
         # Do not render this in template
         # context_data['reaction_forms'] = [form_mount_reaction_id(reaction['cobra_id']) for reaction in
         #                                   context_data['reactions']]
-        context_data['metabolites'] = json.loads(self.object.metabolites)
-        context_data['genes'] = json.loads(self.object.genes)
+        context_data['metabolite_count'] = self.object.get_components('metabolite').count()
+        context_data['gene_count'] = self.object.get_components('gene').count()
         context_data['latest_changes'] = models.CobraModelChange.objects.filter(model=self.object)[:10]
         context_data['change_line_len'] = context_data['latest_changes'].count() * 95
 
@@ -224,7 +229,7 @@ class CobraFbaCreateView(LoginRequiredMixin, InsertModelForFormMixin, TemplateAd
             'cobra_computation.tasks.cobra_fba',
             kwargs={
                 'pk': self.object.pk,
-                'model_sbml': self.model_object.sbml_content,
+                'model_digest': store_sbml(self.model_object.sbml_content),
                 'deleted_genes': load_comma_separated_str(form.cleaned_data['deleted_genes']),
                 'computation_type': 'normal',
             },
@@ -277,12 +282,15 @@ class CobraRgeFbaCreateView(LoginRequiredMixin, InsertModelForFormMixin, Templat
         form.instance.model = self.model_object
         response = super().form_valid(form)
         result = app.send_task(
-            'cobra_computation.tasks.cobra_fba',
+            'cobra_computation.tasks.cobra_rge_fba',
             kwargs={
                 'pk': self.object.pk,
-                'model_sbml': self.model_object.sbml_content,
+                'model_digest': store_sbml(self.model_object.sbml_content),
                 'deleted_genes': load_comma_separated_str(form.cleaned_data['deleted_genes']),
-                'computation_type': 'regular',
+                'regulations': get_regulation_programs(
+                    self.model_object.build().id,
+                    self.model_object.get_components('gene').values_list('cobra_id', flat=True)),
+                'max_iterations': self.object.max_iterations,
             },
             queue='cobra_feeds',
             routing_key='cobra_feed.rge_fba',
@@ -336,7 +344,7 @@ class CobraFvaCreateView(LoginRequiredMixin, InsertModelForFormMixin, TemplateAd
             'cobra_computation.tasks.cobra_fva',
             kwargs={
                 'pk': self.object.pk,
-                'model_sbml': self.model_object.sbml_content,
+                'model_digest': store_sbml(self.model_object.sbml_content),
                 'reaction_list': load_comma_separated_str(form.cleaned_data['reaction_list']),
                 'loopless': form.cleaned_data['loopless'],
                 'fraction_of_optimum': form.cleaned_data['fraction_of_optimum'],
@@ -363,3 +371,60 @@ class CobraFvaDeleteView(LoginRequiredMixin, DeletionMixin, View):
 
     def get_success_url(self):
         return reverse('cobra_wrapper:cobrafva_list', kwargs={'model_pk': self.kwargs['model_pk']})
+
+
+class CobraKnockoutListView(LoginRequiredMixin, TemplateAddModelPkMixin, ListView):
+    def get_queryset(self):
+        model = get_object_or_404(models.CobraModel, pk=self.kwargs['model_pk'], owner=self.request.user)
+        return model.knockout_list.all()
+
+    def get_context_data(self, **kwargs):
+        context_data = super().get_context_data(**kwargs)
+        context_data['form'] = forms.CobraKnockoutForm()
+        return context_data
+
+
+class CobraKnockoutDetailView(LoginRequiredMixin, TemplateAddModelPkMixin, DetailView):
+    def get_object(self, queryset=None):
+        self.model_object = get_object_or_404(models.CobraModel, pk=self.kwargs['model_pk'], owner=self.request.user)
+        return get_object_or_404(self.model_object.knockout_list.all(), pk=self.kwargs['pk'])
+
+
+class CobraKnockoutCreateView(LoginRequiredMixin, InsertModelForFormMixin, TemplateAddModelPkMixin, CreateView):
+    http_method_names = ['post']
+    template_name = 'cobra_wrapper/cobraknockout_list.html'
+    model = models.CobraKnockout
+    form_class = forms.CobraKnockoutForm
+
+    def form_valid(self, form: Form):
+        form.instance.model = self.model_object
+        response = super().form_valid(form)
+        result = app.send_task(
+            'cobra_computation.tasks.cobra_knockout',
+            kwargs={
+                'pk': self.object.pk,
+                'model_digest': store_sbml(self.model_object.sbml_content),
+                'mode': form.cleaned_data['mode'],
+                'gene_sets': load_gene_sets_str(form.cleaned_data['gene_sets']),
+                'max_gene_sets': models.MAX_KNOCKOUT_GENE_SETS,
+            },
+            queue='cobra_feeds',
+            routing_key='cobra_feed.knockout',
+        )
+        self.object.task_id = result.id
+        self.object.save()
+        return response
+
+    def get_success_url(self):
+        return reverse('cobra_wrapper:cobraknockout_list', kwargs={'model_pk': self.kwargs['model_pk']})
+
+
+class CobraKnockoutDeleteView(LoginRequiredMixin, DeletionMixin, View):
+    http_method_names = ['post']
+
+    def get_object(self):
+        model = get_object_or_404(models.CobraModel, pk=self.kwargs['model_pk'], owner=self.request.user)
+        return get_object_or_404(model.knockout_list.all(), pk=self.kwargs['pk'])
+
+    def get_success_url(self):
+        return reverse('cobra_wrapper:cobraknockout_list', kwargs={'model_pk': self.kwargs['model_pk']})
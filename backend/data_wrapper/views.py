@@ -4,7 +4,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponse
 from django.views import View
 from django.shortcuts import redirect
-from cobra_wrapper.utils import load_sbml, dump_sbml, get_reaction_json
+from cobra_wrapper.utils import get_reaction_json
 from bigg_database.models import Reaction as DataReaction
 from cobra_wrapper.models import CobraModel
 from .common import reaction_string_to_metabolites
@@ -44,7 +44,7 @@ class AddDataModelToCobra(View):
         cobra_model_object.desc = desc
         cobra_model_object.name = name
         cobra_model_object.save()
-        cobra_model_object.cache(load_sbml(cobra_model_object.sbml_content))
+        cobra_model_object.cache(cobra_model_object.build())
         # return JsonResponse({"messages": "OK"}, status=200)
         return redirect("/cobra/models")
 
@@ -80,15 +80,16 @@ class AddDataReactionToCobra(View):
         if metabolites_dict is None:
             return HttpResponse("Internal Error", status=500)
         reaction.add_metabolites(metabolites_dict)
-        cobra_object = load_sbml(cobra_model_object.sbml_content)
+        cobra_object = cobra_model_object.build()
         try:
             reaction.gene_reaction_rule = [gene.gene_reaction_rule for gene in data_reaction_object.reactiongene_set.all()][
                 0]
         except IndexError:
             pass
-        cobra_model_object.sbml_content = dump_sbml(cobra_object)
+        cobra_object.add_reactions([reaction])
+        cobra_model_object.update_sbml(cobra_object)
         cobra_model_object.save()
-        cobra_model_object.cache(load_sbml(cobra_model_object.sbml_content))
+        cobra_model_object.patch_cache(cobra_object, added_reactions=[reaction])
         # return JsonResponse({"messages": "OK"}, status=200)
         models.CobraModelChange.objects.create(change_type='add_reaction', model=cobra_model_object,
                                                reaction_info=json.dumps({
@@ -0,0 +1,120 @@
+"""
+Compiled regulation rules.
+A rule like 'glk and glc__Dless_than' is parsed by tt once into a program, a tuple of postfix instructions
+such as ('gene', 'glk'), ('less_than', 'glc__D_c'), ('and',). Programs are cached by rule text, so an edited
+Regulation row is compiled again the first time its new text is seen.
+'xxxless_than' and 'xxxmore_than' symbols test the sign of the shadow price of xxx_c, and any other symbol
+tests whether a gene of that name is in the model.
+Programs are turned into closures to be evaluated here, or sent to the computation workers as json once
+their gene literals are resolved, which evaluate them without tt.
+Literal values are computed once per run and shared by every rule which refers to them.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tt import BooleanExpression
+from tt.definitions import (OPERATOR_MAPPING, TT_AND_OP, TT_IMPL_OP, TT_NAND_OP, TT_NOR_OP, TT_NOT_OP, TT_OR_OP,
+                            TT_XNOR_OP, TT_XOR_OP)
+
+from cobra_wrapper.remote.cobra_computation.rule_operators import BINARY_OPERATOR_FUNCS
+
+# (kind, key), kind is 'less_than', 'more_than' or 'gene'
+Literal = Tuple[str, str]
+
+OPERATOR_NAMES = {
+    TT_NOT_OP: 'not',
+    TT_AND_OP: 'and',
+    TT_OR_OP: 'or',
+    TT_XOR_OP: 'xor',
+    TT_XNOR_OP: 'xnor',
+    TT_IMPL_OP: 'impl',
+    TT_NAND_OP: 'nand',
+    TT_NOR_OP: 'nor',
+}
+
+
+def get_literal(symbol: str) -> Literal:
+    for kind in ('less_than', 'more_than'):
+        position = symbol.find(kind)
+        if position != -1:
+            return kind, symbol[:position] + '_c'
+    return 'gene', symbol
+
+
+class LiteralValues:
+    """Values of the literals of one run, computed on first use"""
+
+    def __init__(self, model_gene_ids: Iterable[str], name_to_ids: Dict[str, List[str]],
+                 shadow_prices: Dict[str, float]):
+        self.model_gene_ids = set(model_gene_ids)
+        self.name_to_ids = name_to_ids
+        self.shadow_prices = shadow_prices
+        self.values = {}  # type: Dict[Literal, bool]
+
+    def __getitem__(self, literal: Literal) -> bool:
+        try:
+            return self.values[literal]
+        except KeyError:
+            pass
+        kind, key = literal
+        if kind == 'gene':
+            value = any(gene_id in self.model_gene_ids for gene_id in self.name_to_ids.get(key, ()))
+        else:
+            shadow_price = self.shadow_prices.get(key)
+            # Metabolites without a shadow price satisfy neither kind
+            value = shadow_price is not None and (shadow_price < 0 if kind == 'less_than' else shadow_price > 0)
+        self.values[literal] = value
+        return value
+
+
+@lru_cache(maxsize=4096)
+def get_rule_program(rule: Optional[str]) -> Optional[Tuple[Tuple[Any, ...], ...]]:
+    """Postfix instructions of the rule, None if tt can not parse it"""
+    try:
+        postfix_tokens = BooleanExpression(rule).postfix_tokens
+    except Exception:
+        return None
+    program = []
+    for token in postfix_tokens:
+        if token in OPERATOR_MAPPING:
+            program.append((OPERATOR_NAMES[OPERATOR_MAPPING[token]],))
+        elif token in ('0', '1'):
+            program.append(('const', token == '1'))
+        else:
+            program.append(get_literal(token))
+    return tuple(program)
+
+
+@lru_cache(maxsize=4096)
+def compile_rule(rule: Optional[str]) -> Optional[Callable[[LiteralValues], bool]]:
+    """Function evaluating the rule with the values of a run, None if tt can not parse the rule"""
+    program = get_rule_program(rule)
+    if program is None:
+        return None
+    stack = []
+    for instruction in program:
+        name = instruction[0]
+        if name == 'not':
+            operand = stack.pop()
+            stack.append(lambda values, operand=operand: not operand(values))
+        elif name in BINARY_OPERATOR_FUNCS:
+            right, left = stack.pop(), stack.pop()
+            stack.append(lambda values, left=left, right=right, func=BINARY_OPERATOR_FUNCS[name]:
+                         func(left(values), right(values)))
+        elif name == 'const':
+            stack.append(lambda values, constant=instruction[1]: constant)
+        else:
+            stack.append(lambda values, literal=instruction: values[literal])
+    return stack[0]
+
+
+def resolve_gene_literals(program: Tuple[Tuple[Any, ...], ...], values: LiteralValues) -> List[List[Any]]:
+    """Json form of a program in which gene literals are replaced by their values, for the workers"""
+    return [['const', values[instruction]] if instruction[0] == 'gene' else list(instruction)
+            for instruction in program]
+
+
+def check_rule(rule: Optional[str], values: LiteralValues) -> bool:
+    """Whether the regulated gene stays active, rules which can not be parsed never knock it out"""
+    func = compile_rule(rule)
+    return True if func is None else bool(func(values))
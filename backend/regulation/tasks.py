@@ -1,107 +1,48 @@
-import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .models import Regulation
-from django.core.exceptions import ObjectDoesNotExist
-from bigg_database.models import Gene, Model
-from cobra_wrapper.utils import load_sbml, dump_sbml
-from celery import shared_task
-from backend.celery import app
-from cobra_wrapper.models import CobraModel
-from tt import BooleanExpression
-
-
-@shared_task
-def gene_regulation(pk, task_id, model_pk, shadow_prices):
-    cobra_model = CobraModel.objects.get(pk=model_pk).build()
-    for gene in cobra_model.genes:
-        gene_name = __get_gene_name(gene.id, cobra_model.id)
-        try:
-            regulation = Regulation.objects.get(gene=gene_name)
-        except ObjectDoesNotExist:
-            continue
-        if not __check(regulation, cobra_model, shadow_prices):
-            gene.knock_out()
-    app.send_task(
-        'cobra_computation.tasks.cobra_fba',
-        kwargs={
-            'pk': pk,
-            'model_sbml': dump_sbml(cobra_model),
-            'deleted_genes': [],
-            'computation_type': 'regular_again',
-            'task_id': task_id,
-        },
-        queue='cobra_feeds',
-        routing_key='cobra_feed.fba',
-    )
-
-
-def __check(regulation, cobra_model, shadow_price):
-    try:
-        exp = BooleanExpression(regulation.rule)
-    except Exception:
-        return True
-    tokens = exp.symbols
-    value = []
-    for i in tokens:
-        if i.find('less_than') != -1:
-            try:
-                SP = shadow_price[i[0:i.find('less_than')] + '_c']
-            except KeyError:
-                value.append(False)
-                continue
-            if SP < 0:
-                value.append(True)
-            else:
-                value.append(False)
-        elif i.find('more_than') != -1:
-            try:
-                SP = shadow_price[i[0:i.find('more_than')] + '_c']
-            except KeyError:
-                value.append(False)
-                continue
-            if SP > 0:
-                value.append(True)
-            else:
-                value.append(False)
-        else:
-
-            if __check_gene(cobra_model, i):
-                value.append(True)
-            else:
-                value.append(False)
-    truth = exp.evaluate(**dict(zip(tokens, value)))
-    return truth
-
-
-def __check_gene(cobra_model, gene_name):
-    gene_id = __get_gene_id(gene_name, cobra_model.id)
-    try:
-        cobra_model.genes.get_by_id(gene_id)
-    except KeyError:
-        return False
-    return True
-
-
-def __get_gene_id(gene_name, model_name):
-    try:
-        model = Model.objects.get(bigg_id=model_name)
-    except ObjectDoesNotExist:
-        # print("no id in model")
-        return None
-    try:
-        gene_id = model.gene_set.get(name=gene_name).bigg_id
-    except ObjectDoesNotExist:
-        return None
-    return gene_id
-
-
-def __get_gene_name(gene_id, model_name):
-    try:
-        model = Model.objects.get(bigg_id=model_name)
-    except ObjectDoesNotExist:
-        return None
-    try:
-        gene_name = model.gene_set.get(bigg_id=gene_id).name
-    except ObjectDoesNotExist:
-        return None
-    return gene_name
+from bigg_database.models import Gene
+from .rules import LiteralValues, get_rule_program, resolve_gene_literals
+
+
+def get_gene_maps(model_name: Optional[str] = None,
+                  gene_ids: Optional[Iterable[str]] = None) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    BiGG gene id -> name and name -> ids of the genes in the BiGG model, or of the genes with the given ids,
+    loaded by one query
+    """
+    genes = Gene.objects.all()
+    if model_name is not None:
+        genes = genes.filter(models__bigg_id=model_name)
+    if gene_ids is not None:
+        genes = genes.filter(bigg_id__in=list(gene_ids))
+    id_to_name = {}
+    name_to_ids = {}
+    for gene_id, gene_name in genes.values_list('bigg_id', 'name'):
+        id_to_name[gene_id] = gene_name
+        name_to_ids.setdefault(gene_name, []).append(gene_id)
+    return id_to_name, name_to_ids
+
+
+def get_regulation_rules() -> Dict[str, str]:
+    """Gene name -> rule of every regulation, the table is small enough to be loaded by one query"""
+    return dict(Regulation.objects.values_list('gene', 'rule'))
+
+
+def get_regulation_programs(model_name: str, gene_ids: Iterable[str]) -> Dict[str, List[List[Any]]]:
+    """
+    Gene id -> json program of the rule regulating it, for the genes of a model which are regulated, sent with
+    regulated FBA tasks. Genes are named by the BiGG model with the id of the model, other models may share
+    gene ids. Genes referred to by the rules are looked up here, so that workers only need the shadow prices.
+    """
+    gene_ids = set(gene_ids)
+    id_to_name, name_to_ids = get_gene_maps(model_name, gene_ids)
+    rules = get_regulation_rules()
+    values = LiteralValues(gene_ids, name_to_ids, {})
+    programs = {}
+    for gene_id, gene_name in id_to_name.items():
+        program = get_rule_program(rules[gene_name]) if gene_name in rules else None
+        # Rules which can not be parsed never knock the gene out
+        if program is not None:
+            programs[gene_id] = resolve_gene_literals(program, values)
+    return programs
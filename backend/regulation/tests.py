@@ -1,3 +1,62 @@
 from django.test import TestCase
+from tt import BooleanExpression
 
-# Create your tests here.
+from bigg_database.models import Gene, Model
+from . import tasks
+from .models import Regulation
+from .rules import LiteralValues, check_rule, compile_rule
+
+
+class GeneRegulationLookupTests(TestCase):
+    fixtures = ['bigg_database/test_data']
+
+    def setUp(self):
+        model = Model.objects.get(bigg_id='e_coli_core')
+        model.gene_set.add(Gene.objects.get(bigg_id='b3291'), Gene.objects.get(bigg_id='G2583_2921'))
+        Regulation.objects.create(bNum='b3291', gene='mscL', rule='glk and glc__Dless_than')
+
+    def test_gene_maps(self):
+        with self.assertNumQueries(1):
+            id_to_name, name_to_ids = tasks.get_gene_maps('e_coli_core')
+        self.assertEqual(id_to_name, {'b3291': 'mscL', 'G2583_2921': 'glk'})
+        self.assertEqual(name_to_ids, {'mscL': ['b3291'], 'glk': ['G2583_2921']})
+        self.assertEqual(tasks.get_gene_maps('no_such_model'), ({}, {}))
+
+    def test_check_rule(self):
+        rule = tasks.get_regulation_rules()['mscL']
+        _, name_to_ids = tasks.get_gene_maps('e_coli_core')
+        self.assertTrue(check_rule(rule, LiteralValues({'G2583_2921'}, name_to_ids, {'glc__D_c': -1.0})))
+        self.assertFalse(check_rule(rule, LiteralValues({'G2583_2921'}, name_to_ids, {'glc__D_c': 1.0})))
+        self.assertFalse(check_rule(rule, LiteralValues(set(), name_to_ids, {'glc__D_c': -1.0})))
+        self.assertTrue(check_rule('not a valid rule (', LiteralValues(set(), name_to_ids, {})))
+        self.assertTrue(check_rule(None, LiteralValues(set(), name_to_ids, {})))
+
+    def test_regulation_programs(self):
+        Regulation.objects.create(bNum='b0000', gene='glk', rule='not a valid rule (')
+        with self.assertNumQueries(2):
+            programs = tasks.get_regulation_programs('e_coli_core', ['b3291', 'G2583_2921'])
+        self.assertEqual(programs, {'b3291': [['const', True], ['less_than', 'glc__D_c'], ['and']]})
+        self.assertEqual(tasks.get_regulation_programs('e_coli_core', ['b3291']),
+                         {'b3291': [['const', False], ['less_than', 'glc__D_c'], ['and']]})
+
+    def test_regulation_programs_of_model(self):
+        # Genes are named by the BiGG model of the same id, not by any model with a gene of the same id
+        Model.objects.get(bigg_id='e_coli_core').gene_set.remove(Gene.objects.get(bigg_id='b3291'))
+        self.assertEqual(tasks.get_regulation_programs('e_coli_core', ['b3291', 'G2583_2921']), {})
+        self.assertEqual(tasks.get_regulation_programs('no_such_model', ['b3291']), {})
+
+
+class CompiledRuleTests(TestCase):
+    def test_same_as_tt(self):
+        values = LiteralValues({'b1', 'b2'}, {'a': ['b1'], 'b': ['b2'], 'c': ['b3']},
+                               {'x_c': -1.0, 'y_c': 1.0})
+        symbols = {'a': True, 'b': True, 'c': False, 'xless_than': True, 'xmore_than': False,
+                   'yless_than': False, 'ymore_than': True, 'zless_than': False}
+        for rule in ['a and not c', 'a -> c', 'c or xless_than', 'a xor b', 'xmore_than nand ymore_than',
+                     '(a nor c) iff yless_than', '1 and ~zless_than', 'a and (b or c) and not (xmore_than or 0)']:
+            expression = BooleanExpression(rule)
+            expected = expression.evaluate(**{symbol: symbols[symbol] for symbol in expression.symbols})
+            self.assertEqual(check_rule(rule, values), bool(expected), rule)
+
+    def test_cached_by_text(self):
+        self.assertIs(compile_rule('a and b'), compile_rule('a and b'))
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class SearchConfig(AppConfig):
     name = 'search'
+
+    def ready(self):
+        from .index import INDEXED_MODELS
+        from .signals import remove_from_search_index, setup_trigram_similarity, update_search_index
+        connection_created.connect(setup_trigram_similarity, dispatch_uid='setup_trigram_similarity')
+        for model_class in INDEXED_MODELS:
+            label = model_class._meta.label
+            post_save.connect(update_search_index, sender=model_class,
+                              dispatch_uid='update_search_index_' + label)
+            post_delete.connect(remove_from_search_index, sender=model_class,
+                                dispatch_uid='remove_from_search_index_' + label)
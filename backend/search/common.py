@@ -1,8 +1,33 @@
-from .models import TrgmSimilarity
+from typing import Dict
+
+from .index import get_candidates
+from .models import MIN_SIMILARITY, TrgmSimilarity
+from django.db import connections
 from django.db.models import QuerySet, F, Q, Value, FloatField
 from django.db.models.functions import Greatest
 
 
+def count_querysets(querysets: Dict[str, QuerySet]) -> Dict[str, int]:
+    """
+    Count several querysets in one UNION ALL query instead of one query each.
+    All the querysets should use the same database.
+    """
+    if not querysets:
+        return {}
+    sql_parts = []
+    params = []
+    using = None
+    for c, (name, qs) in enumerate(querysets.items()):
+        using = qs.db
+        sql, qs_params = qs.order_by().values('pk').query.get_compiler(using=using).as_sql()
+        sql_parts.append('SELECT %s, COUNT(*) FROM ({}) count_{}'.format(sql, c))
+        params.append(name)
+        params.extend(qs_params)
+    with connections[using].cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(sql_parts), params)
+        return {name: count for name, count in cursor.fetchall()}
+
+
 class SimilarityQuery:
     def __init__(self, query_strings=None, query_model=None, filter_list=None, ordered_query=False, limit=0):
         self.query_strings = query_strings or []
@@ -50,6 +75,7 @@ class SimilarityQuery:
         filter_query = None
         query_strings = self.query_strings or ['']
         qs = self.query_model.objects
+        use_trgm_operator = connections[qs.db].vendor == 'postgresql'
 
         sort_field = []
         for entry, threshold in self.filter_list:
@@ -60,14 +86,22 @@ class SimilarityQuery:
                     field: TrgmSimilarity(F(entry), Value(query_string))
                 })
 
+                field_query = Q(**{
+                    field + '__gte': threshold
+                }) & ~Q(**{entry: Value('')})
+                if use_trgm_operator and threshold >= MIN_SIMILARITY:
+                    # The % operator lets PostgreSQL find the rows by the gin_trgm_ops index
+                    field_query = Q(**{entry + '__trgm_similar': query_string}) & field_query
+                else:
+                    candidates = get_candidates(self.query_model, entry, query_string, threshold)
+                    if candidates is not None:
+                        # Only rows sharing enough trigrams with the query string are scored
+                        field_query = Q(pk__in=candidates) & field_query
+
                 if filter_query is None:
-                    filter_query = Q(**{
-                        field + '__gte': threshold
-                    }) & ~Q(**{entry: Value('')})
+                    filter_query = field_query
                 else:
-                    filter_query = filter_query | Q(**{
-                        field + '__gte': threshold
-                    }) & ~Q(**{entry: Value('')})
+                    filter_query = filter_query | field_query
 
         qs = qs.filter(filter_query)
         if self.ordered_query:
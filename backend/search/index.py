@@ -0,0 +1,117 @@
+"""
+Maintenance and lookup of the trigram index kept in SearchTrigram.
+An object is a candidate for a query string if its field shares at least ceil(threshold * n) trigrams with
+the n trigrams of the query string. Any object reaching the similarity threshold shares at least so many,
+so scoring only the candidates returns the same rows as scoring the whole table.
+"""
+import math
+from typing import Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, QuerySet
+
+from bigg_database.models import Gene, Metabolite, Model, Reaction
+
+from .models import SearchTrigram
+from .trigram import get_trigrams
+
+INDEXED_MODELS = [Model, Reaction, Metabolite, Gene]
+
+# Seconds whether a model is indexed is cached, the index only changes on rebuild
+INDEXED_CACHE_TIMEOUT = 60
+
+
+def get_indexed_fields(model_class) -> List[str]:
+    return ['bigg_id'] + (['name'] if hasattr(model_class, 'name') else [])
+
+
+def _get_indexed_cache_key(model_class) -> str:
+    return 'search_indexed:' + model_class._meta.model_name
+
+
+def is_indexed(model_class) -> bool:
+    indexed = cache.get(_get_indexed_cache_key(model_class))
+    if indexed is None:
+        indexed = SearchTrigram.objects.filter(model_name=model_class._meta.model_name).exists()
+        cache.set(_get_indexed_cache_key(model_class), indexed, INDEXED_CACHE_TIMEOUT)
+    return indexed
+
+
+def get_trigram_rows(model_class, object_id: int, values: Iterable[str]) -> List[SearchTrigram]:
+    model_name = model_class._meta.model_name
+    return [SearchTrigram(model_name=model_name, field_name=field_name, trigram=trigram, object_id=object_id)
+            for field_name, value in zip(get_indexed_fields(model_class), values)
+            for trigram in get_trigrams(value or '')]
+
+
+def rebuild_index(model_class, batch_size: int = 5000) -> int:
+    """Index every object of model_class again in one transaction, returns the number of rows written"""
+    fields = get_indexed_fields(model_class)
+    written = 0
+    with transaction.atomic():
+        SearchTrigram.objects.filter(model_name=model_class._meta.model_name).delete()
+        batch = []
+        for pk, *values in model_class.objects.values_list('pk', *fields).iterator():
+            batch.extend(get_trigram_rows(model_class, pk, values))
+            if len(batch) >= batch_size:
+                SearchTrigram.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        SearchTrigram.objects.bulk_create(batch)
+        written += len(batch)
+    cache.delete(_get_indexed_cache_key(model_class))
+    return written
+
+
+def update_object(instance):
+    """Index an object again after it is saved, models whose index has not been built are left alone"""
+    model_class = type(instance)
+    if not is_indexed(model_class):
+        return
+    with transaction.atomic():
+        remove_object(instance)
+        SearchTrigram.objects.bulk_create(get_trigram_rows(
+            model_class, instance.pk, [getattr(instance, field) for field in get_indexed_fields(model_class)]))
+
+
+def refresh_objects(model_class, pks: Iterable[int], batch_size: int = 500):
+    """
+    Index the objects with the given pks again, e.g. after bulk writes which send no signals.
+    Objects which no longer exist are removed from the index.
+    """
+    if model_class not in INDEXED_MODELS or not is_indexed(model_class):
+        return
+    model_name = model_class._meta.model_name
+    fields = get_indexed_fields(model_class)
+    pks = sorted(set(pks))
+    with transaction.atomic():
+        for i in range(0, len(pks), batch_size):
+            batch_pks = pks[i:i + batch_size]
+            SearchTrigram.objects.filter(model_name=model_name, object_id__in=batch_pks).delete()
+            SearchTrigram.objects.bulk_create([
+                row for pk, *values in model_class.objects.filter(pk__in=batch_pks).values_list('pk', *fields)
+                for row in get_trigram_rows(model_class, pk, values)
+            ])
+
+
+def remove_object(instance):
+    SearchTrigram.objects.filter(model_name=type(instance)._meta.model_name, object_id=instance.pk).delete()
+
+
+def get_candidates(model_class, field_name: str, query_string: str, threshold: float) -> Optional[QuerySet]:
+    """
+    Ids of the objects whose field may reach threshold similarity with query_string, as a subquery.
+    None if the index can not narrow the search, so that every object has to be scored.
+    """
+    if threshold <= 0 or not is_indexed(model_class):
+        return None
+    trigrams = get_trigrams(query_string)
+    # Subtract a little so that rounding of threshold * n does not raise the bound by one
+    min_shared = max(1, math.ceil(threshold * len(trigrams) - 1e-9))
+    return SearchTrigram.objects \
+        .filter(model_name=model_class._meta.model_name, field_name=field_name, trigram__in=trigrams) \
+        .values('object_id') \
+        .annotate(shared=Count('pk')) \
+        .filter(shared__gte=min_shared) \
+        .values('object_id')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from search.index import INDEXED_MODELS, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Build the trigram index of the BiGG search, run it again after importing BiGG data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written by one bulk insert')
+
+    def handle(self, **kwargs):
+        for model_class in INDEXED_MODELS:
+            written = rebuild_index(model_class, kwargs['batch_size'])
+            print('{}: {} trigrams indexed'.format(model_class.__name__, written))
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=31)),
+                ('field_name', models.CharField(max_length=31)),
+                ('trigram', models.CharField(max_length=3)),
+                ('object_id', models.IntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['model_name', 'field_name', 'trigram'], name='search_sear_model_n_58b77e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['model_name', 'object_id'], name='search_sear_model_n_813dd0_idx'),
+        ),
+    ]
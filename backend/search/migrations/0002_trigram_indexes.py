@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Searched columns of the BiGG tables, indexed for the % operator of pg_trgm
+TRIGRAM_INDEXED_FIELDS = [
+    ('Model', 'bigg_id'),
+    ('Reaction', 'bigg_id'),
+    ('Reaction', 'name'),
+    ('Metabolite', 'bigg_id'),
+    ('Metabolite', 'name'),
+    ('Gene', 'bigg_id'),
+    ('Gene', 'name'),
+]
+
+
+def get_index_name(db_table, column):
+    return '{}_{}_trgm'.format(db_table, column)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for model_name, field_name in TRIGRAM_INDEXED_FIELDS:
+        model = apps.get_model('bigg_database', model_name)
+        db_table = model._meta.db_table
+        column = model._meta.get_field(field_name).column
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS {} ON {} USING gin ({} gin_trgm_ops)'.format(
+            schema_editor.quote_name(get_index_name(db_table, column)), schema_editor.quote_name(db_table),
+            schema_editor.quote_name(column)))
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, field_name in TRIGRAM_INDEXED_FIELDS:
+        model = apps.get_model('bigg_database', model_name)
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(schema_editor.quote_name(
+            get_index_name(model._meta.db_table, model._meta.get_field(field_name).column))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bigg_database', '0002_importedfile'),
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
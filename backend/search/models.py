@@ -1,12 +1,55 @@
-from django.db.models import F, Func
+from django.db import models
+from django.db.models import CharField, F, FloatField, Func, Lookup
+
+# Lowest threshold the searches use, PostgreSQL connections set it as pg_trgm.similarity_threshold
+MIN_SIMILARITY = 0.2
 
 
 class TrgmSimilarity(Func):
+    """
+    Trigram similarity of two strings. MySQL needs the trgm_similarity UDF, SQLite connections get a Python
+    function of the same name registered, and PostgreSQL uses similarity() of pg_trgm.
+    """
     function = 'trgm_similarity'
     template = '%(function)s(%(expressions)s)'
-
-    def as_sqlite(self, *args, **kwargs):
-        raise RuntimeError('TrgmSimilarity doesn\'t support sqlite')
+    # Compared with float thresholds, which would become strings if the type of the fields was used
+    output_field = FloatField()
 
     def as_postgresql(self, compiler, connection):
         return self.as_sql(compiler, connection, function='similarity')
+
+
+@CharField.register_lookup
+class TrgmSimilar(Lookup):
+    """
+    The % operator of pg_trgm, true if the similarity reaches pg_trgm.similarity_threshold,
+    which a GIN index with gin_trgm_ops can answer. Other databases compare with MIN_SIMILARITY.
+    """
+    lookup_name = 'trgm_similar'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return 'trgm_similarity(%s, %s) >= %s' % (lhs, rhs, MIN_SIMILARITY), lhs_params + rhs_params
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s %%%% %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+class SearchTrigram(models.Model):
+    """
+    Inverted trigram index over the searched fields of the BiGG models, one row per distinct trigram of a field
+    of an object. Rows sharing enough trigrams with a query are the only ones which need to be scored.
+    """
+    model_name = models.CharField(max_length=31)
+    field_name = models.CharField(max_length=31)
+    trigram = models.CharField(max_length=3)
+    object_id = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_name', 'field_name', 'trigram']),
+            models.Index(fields=['model_name', 'object_id']),
+        ]
@@ -0,0 +1,20 @@
+from search.index import remove_object, update_object
+from search.models import MIN_SIMILARITY
+from search.trigram import similarity
+
+
+def update_search_index(sender, instance, **kwargs):
+    update_object(instance)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_object(instance)
+
+
+def setup_trigram_similarity(sender, connection, **kwargs):
+    """Register trgm_similarity on SQLite connections, and set the threshold of % on PostgreSQL connections"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('trgm_similarity', 2, similarity, deterministic=True)
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET pg_trgm.similarity_threshold = %s', [MIN_SIMILARITY])
@@ -1,3 +1,108 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.test import Client, TestCase
 
-# Create your tests here.
+from bigg_database.http_cache import bump_data_version
+from bigg_database.management.bulk_loader import BulkWriter
+from bigg_database.models import Gene, Metabolite, Model, Reaction
+
+from .common import SimilarityQuery, count_querysets
+from .index import get_candidates, rebuild_index
+from .trigram import get_trigrams, similarity
+
+
+class CountQuerysetsTests(TestCase):
+    fixtures = ['bigg_database/test_data']
+
+    def test_count_in_one_query(self):
+        querysets = {
+            'model': Model.objects.filter(bigg_id__startswith='iAF'),
+            'reaction': Reaction.objects.all(),
+            'metabolite': Metabolite.objects.filter(name__icontains='nicotin'),
+            'gene': Gene.objects.filter(pk=-1),
+        }
+        with self.assertNumQueries(1):
+            counts = count_querysets(querysets)
+        self.assertEqual(counts, {name: qs.count() for name, qs in querysets.items()})
+        self.assertEqual(counts['gene'], 0)
+
+
+class TrigramIndexTests(TestCase):
+    fixtures = ['bigg_database/test_data']
+
+    def setUp(self):
+        # Whether a model is indexed is cached, which outlives the rollback of the index rows
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_trigrams(self):
+        self.assertEqual(get_trigrams('Ab-c'), {'  a', ' ab', 'ab ', '  c', ' c '})
+        self.assertEqual(get_trigrams(' -_ '), set())
+        self.assertAlmostEqual(similarity('word', 'two words'), 4 / 11)
+
+    def test_candidates_hold_all_matches(self):
+        self.assertIsNone(get_candidates(Reaction, 'name', 'diacylgycero', 0.3))
+        self.assertGreater(rebuild_index(Reaction), 0)
+        all_pks = set(Reaction.objects.values_list('pk', flat=True))
+        queries = [('diacylglycerol acyltransferase', 0.3), ('sulfonate exchange', 0.3), ('glycerol', 0.1)]
+        for query_string, threshold in queries:
+            candidates = set(row['object_id'] for row in get_candidates(Reaction, 'name', query_string, threshold))
+            matches = set(pk for pk, name in Reaction.objects.values_list('pk', 'name')
+                          if similarity(name, query_string) >= threshold)
+            self.assertTrue(matches)
+            self.assertLessEqual(matches, candidates)
+            self.assertLess(len(candidates), len(all_pks))
+
+    def test_index_follows_saves(self):
+        rebuild_index(Reaction)
+        reaction = Reaction.objects.first()
+        reaction.name = 'zwitterionic placeholder'
+        reaction.save()
+        self.assertEqual([row['object_id'] for row in get_candidates(Reaction, 'name', 'zwitterion', 0.3)],
+                         [reaction.pk])
+        reaction.delete()
+        self.assertFalse(get_candidates(Reaction, 'name', 'zwitterion', 0.3).exists())
+
+    def test_index_follows_bulk_writes(self):
+        rebuild_index(Reaction)
+        reaction = Reaction.objects.first()
+        reaction.pk = None
+        reaction.bigg_id = 'ZWITTER'
+        reaction.name = 'zwitterionic placeholder'
+        with BulkWriter(Reaction, ('bigg_id',)) as writer:
+            writer.add(reaction)
+        pk = Reaction.objects.get(bigg_id='ZWITTER').pk
+        self.assertEqual([row['object_id'] for row in get_candidates(Reaction, 'name', 'zwitterion', 0.3)], [pk])
+
+
+class SimilarityQueryTests(TestCase):
+    fixtures = ['bigg_database/test_data']
+
+    def setUp(self):
+        # Whether a model is indexed is cached, which outlives the rollback of the index rows
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_sqlite_similarity(self):
+        query = SimilarityQuery().query('diacylglycerol').model(Reaction).apply_filter_or('name', 0.3)
+        expect = {pk for pk, name in Reaction.objects.values_list('pk', 'name')
+                  if similarity(name, 'diacylglycerol') >= 0.3}
+        self.assertTrue(expect)
+        self.assertSetEqual(set(query.load_query().values_list('pk', flat=True)), expect)
+        rebuild_index(Reaction)
+        self.assertSetEqual(set(query.load_query().values_list('pk', flat=True)), expect)
+
+    def test_search_view(self):
+        client = Client()
+        resp = client.get(reverse('bigg_database:search'), {'q': 'nicotinate', 'model': 'metabolite'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['search_result_count'], 4)
+        self.assertContains(resp, 'nac_c')
+
+    def test_search_counts_follow_data_version(self):
+        client = Client()
+        params = {'q': 'nicotinate', 'model': 'metabolite'}
+        self.assertEqual(client.get(reverse('bigg_database:search'), params).context['search_result_count'], 4)
+        Metabolite.objects.filter(bigg_id='nac_c').delete()
+        bump_data_version()
+        self.assertEqual(client.get(reverse('bigg_database:search'), params).context['search_result_count'], 3)
@@ -0,0 +1,38 @@
+import re
+from functools import lru_cache
+from typing import FrozenSet, Optional, Set
+
+_non_alphanumeric = re.compile(r'[\W_]+')
+
+
+def get_trigrams(text: str) -> Set[str]:
+    """
+    Trigrams of a string in the way of pg_trgm: case is folded, every word is padded with two spaces
+    before and one space after, and characters other than letters and digits separate words
+    """
+    trigrams = set()
+    for word in _non_alphanumeric.split(text.lower()):
+        if word:
+            padded = '  ' + word + ' '
+            trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+@lru_cache(maxsize=4096)
+def _get_cached_trigrams(text: str) -> FrozenSet[str]:
+    return frozenset(get_trigrams(text))
+
+
+def similarity(text: Optional[str], query_string: Optional[str]) -> Optional[float]:
+    """
+    Shared trigrams divided by all the distinct trigrams of both strings, as pg_trgm similarity().
+    None if either string is None, like a SQL function given NULL.
+    """
+    if text is None or query_string is None:
+        return None
+    text_trigrams = _get_cached_trigrams(text)
+    query_trigrams = _get_cached_trigrams(query_string)
+    if not text_trigrams or not query_trigrams:
+        return 0.0
+    shared = len(text_trigrams & query_trigrams)
+    return shared / (len(text_trigrams) + len(query_trigrams) - shared)
@@ -1,12 +1,24 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.shortcuts import redirect, render, reverse
 from django.views.generic import FormView, View
 from django.views.generic.edit import FormMixin
 from django.views.generic.list import MultipleObjectMixin
 
+from bigg_database.http_cache import get_data_version
 from bigg_database.models import Gene, Metabolite, Model, Reaction
 
 from .forms import BareSearchForm
-from .common import SimilarityQuery
+from .common import SimilarityQuery, count_querysets
+
+# Seconds the match counts of a query are cached, a new data version makes them unreachable before
+COUNT_CACHE_TIMEOUT = 60
+
+
+def normalize_query_string(query_string):
+    return ' '.join(query_string.split())
 
 
 class BiGGDatabaseSearchView(MultipleObjectMixin, FormView):
@@ -55,29 +67,43 @@ class BiGGDatabaseSearchView(MultipleObjectMixin, FormView):
             sq = sq.apply_order()
         return sq
 
+    def get_counts(self, query_string):
+        """Match counts of every model in one query, cached for a short time under the data version"""
+        cache_key = 'search_counts:{}:{}'.format(get_data_version()[0],
+                                                 hashlib.sha1(query_string.encode('utf-8')).hexdigest())
+        counts = cache.get(cache_key)
+        if counts is None:
+            counts = count_querysets({
+                model_name: self.construct_query(query_string, model_cls, apply_order=False).load_query()
+                for model_name, model_cls in self.model_map.items()
+            })
+            cache.set(cache_key, counts, COUNT_CACHE_TIMEOUT)
+        return counts
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        paginator = Paginator(queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+                              **kwargs)
+        # Paginator.count is a cached property, use the count computed with the other models
+        paginator.count = self.search_result_count
+        return paginator
+
     def form_valid(self, form):
-        query_string = form.cleaned_data['q']
+        query_string = normalize_query_string(form.cleaned_data['q'])
         search_model = form.cleaned_data.get('model') or 'model'
         model = self.model_map[search_model]
 
         sq = self.construct_query(query_string, model, apply_order=True)
         object_list = sq.load_query()
 
-        total_number = {
-            model_name: (self.construct_query(query_string, model_cls, apply_order=False)
-                         .count()
-                         )
-            for model_name, model_cls in self.model_map.items()
-            if model_cls != model
-        }
-        total_number[search_model] = object_list.count()
+        total_number = self.get_counts(query_string)
+        self.search_result_count = total_number[search_model]
 
         context = {
             'form': form,
             'query': form.cleaned_data['q'],
             'object_list': object_list,
             'search_model': search_model,
-            'search_result_count': object_list.count(),
+            'search_result_count': self.search_result_count,
             'total_count': sum([c for _, c in total_number.items()]),
             'counts': total_number
         }
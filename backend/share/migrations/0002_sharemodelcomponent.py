@@ -0,0 +1,56 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:33
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_components(apps, schema_editor):
+    ShareModel = apps.get_model('share', 'ShareModel')
+    ShareModelComponent = apps.get_model('share', 'ShareModelComponent')
+    for share_model in ShareModel.objects.only('pk', 'reactions', 'metabolites', 'genes').iterator():
+        components = {}
+        for kind, field in [('reaction', 'reactions'), ('metabolite', 'metabolites'), ('gene', 'genes')]:
+            for component in json.loads(getattr(share_model, field) or '[]'):
+                components[(kind, component['cobra_id'])] = component['name']
+        ShareModelComponent.objects.bulk_create([
+            ShareModelComponent(model_id=share_model.pk, kind=kind, cobra_id=cobra_id, name=name)
+            for (kind, cobra_id), name in components.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('share', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShareModelComponent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reaction', 'reaction'), ('metabolite', 'metabolite'), ('gene', 'gene')], max_length=15)),
+                ('cobra_id', models.CharField(max_length=600)),
+                ('name', models.TextField(blank=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='share.ShareModel')),
+            ],
+            options={
+                'unique_together': {('model', 'kind', 'cobra_id')},
+            },
+        ),
+        migrations.RunPython(fill_components, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='sharemodel',
+            name='genes',
+        ),
+        migrations.RemoveField(
+            model_name='sharemodel',
+            name='metabolites',
+        ),
+        migrations.RemoveField(
+            model_name='sharemodel',
+            name='reactions',
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
-from cobra_wrapper.models import CobraModel
+from cobra_wrapper.models import COMPONENT_KINDS, CobraModel
 
 User = get_user_model()
 
@@ -19,6 +19,25 @@ class ShareModel(models.Model):
 
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     created_time = models.DateTimeField(auto_now_add=True)
-    reactions = models.TextField(blank=True)
-    metabolites = models.TextField(blank=True)
-    genes = models.TextField(blank=True)
+
+    def copy_components(self, cobra_model: CobraModel):
+        """Snapshot the components of the shared model, later changes of the model are not shared"""
+        ShareModelComponent.objects.bulk_create([
+            ShareModelComponent(model=self, kind=kind, cobra_id=cobra_id, name=name)
+            for kind, cobra_id, name in cobra_model.components.values_list('kind', 'cobra_id', 'name')
+        ], batch_size=1000)
+
+    def get_components(self, kind: str):
+        """Components of the kind ordered by cobra id, which is the order of the (model, kind, cobra_id) index"""
+        return self.components.filter(kind=kind).order_by('cobra_id')
+
+
+class ShareModelComponent(models.Model):
+    """Reactions, metabolites and genes of a shared model, like CobraModelComponent"""
+    model = models.ForeignKey(ShareModel, on_delete=models.CASCADE, related_name='components')
+    kind = models.CharField(max_length=15, choices=[(kind, kind) for kind in COMPONENT_KINDS])
+    cobra_id = models.CharField(max_length=600)
+    name = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('model', 'kind', 'cobra_id')
@@ -0,0 +1,33 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+import cobra
+
+from cobra_wrapper.models import CobraModel, CobraModelComponent
+from cobra_wrapper.utils import dump_sbml
+from .models import ShareModel
+
+
+class ShareModelTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='test123456')
+        self.model = CobraModel.objects.create(name='example', sbml_content=dump_sbml(cobra.Model('example')),
+                                               owner=self.user)
+        components = [CobraModelComponent(model=self.model, kind='reaction', cobra_id='R{:03d}'.format(i), name='r')
+                      for i in range(150)]
+        components.append(CobraModelComponent(model=self.model, kind='gene', cobra_id='g1', name='g'))
+        CobraModelComponent.objects.bulk_create(components)
+        self.client.login(username='test', password='test123456')
+
+    def test_share_components(self):
+        response = self.client.post('/share/create/', {'model_id': self.model.pk, 'desc': 'test'})
+        share_model = ShareModel.objects.get(pk=json.loads(response.content)['url'].split('/')[-1])
+        # The shared components do not follow later changes of the model
+        self.model.components.filter(kind='reaction').delete()
+        self.assertEqual(share_model.get_components('reaction').count(), 150)
+        self.assertEqual(list(share_model.get_components('gene').values_list('cobra_id', flat=True)), ['g1'])
+
+        response = self.client.get('/share/model/{}'.format(share_model.pk), {'page': 2})
+        self.assertEqual([reaction.cobra_id for reaction in response.context['reactions']],
+                         ['R{:03d}'.format(i) for i in range(100, 150)])
@@ -1,5 +1,4 @@
-import json
-
+from django.core.paginator import Paginator
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.views.generic import DetailView, View
@@ -26,12 +25,9 @@ class CreateShareLinkView(View):
         shared_model_object = ShareModel.objects.create(sbml_content=cobra_model.sbml_content,
                                                         owner=self.owner,
                                                         name=cobra_model.name,
-                                                        desc=desc,
-                                                        reactions=cobra_model.reactions,
-                                                        metabolites=cobra_model.metabolites,
-                                                        genes=cobra_model.genes
+                                                        desc=desc
                                                         )
-        shared_model_object.save()
+        shared_model_object.copy_components(cobra_model)
         return shared_model_object
 
     def post(self, request, *args, **kwargs):
@@ -55,14 +51,17 @@ class CreateShareLinkView(View):
 
 
 class ModelShareView(DetailView):
+    reaction_paginate_by = 100
+
     def get_object(self, queryset=None):
         return get_object_or_404(ShareModel, pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context_data = super().get_context_data()
-        context_data['reactions'] = json.loads(self.object.reactions)
-        context_data['metabolites'] = json.loads(self.object.metabolites)
-        context_data['genes'] = json.loads(self.object.genes)
+        reaction_page = Paginator(self.object.get_components('reaction'), self.reaction_paginate_by).get_page(
+            self.request.GET.get('page'))
+        context_data['reaction_page'] = reaction_page
+        context_data['reactions'] = reaction_page.object_list
         context_data['username'] = self.object.owner.username
         context_data["desc"] = self.object.desc
         context_data["id"] = self.object.id